@@ -0,0 +1,3 @@
+# Package entry point for the experiment scripts in src/ (see cli.py).
+# Only the standard library is imported here so that `python -m duckiesim`
+# starts fast; the scripts and their dependencies are imported on demand.
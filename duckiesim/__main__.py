@@ -0,0 +1,3 @@
+from duckiesim.cli import main
+
+main()
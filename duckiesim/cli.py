@@ -0,0 +1,249 @@
+# cli.py
+
+"""
+Command line entry point for the experiment scripts.
+
+    python -m duckiesim run learning [--seed N] [--log FILE]
+    python -m duckiesim run drive [--seed N]
+    python -m duckiesim run replay SESSION [--log FILE]
+    python -m duckiesim run headless [--trials N] [--agents K] [--seed N] [--log FILE]
+    python -m duckiesim analyze LOG.csv [--q]
+
+Add --import-profile before the command to report how long each module took
+to import instead of just running it.
+
+Run from the repository root. Heavy modules (numpy, gym_duckietown, pyglet,
+PIL) are only imported by the commands that need them.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(REPO_DIR, 'src')
+
+
+def use_src():
+    """
+    Makes the modules in src/ importable, the same way running a script from src/ does.
+    """
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+
+
+def run_learning(args):
+    use_src()
+    import learning_test
+    learning_test.main(seed=args.seed, log_file=args.log or learning_test.CSV_LOG_FILE,
+                       render_every=args.render_every, render_rate=args.render_rate, policy=args.policy,
+                       clock_mode=args.clock, speed=args.speed, record=args.record,
+                       record_dir=args.record_dir, replay_path=args.replay,
+                       replay_downsample=args.replay_downsample, camera=args.camera,
+                       profile=args.profile, record_inputs=args.record_inputs, obs_cache_mb=args.obs_cache)
+
+
+def run_replay(args):
+    use_src()
+    import learning_test
+    start = time.perf_counter()
+    trials = learning_test.replay_session(args.session, args.log, profile=args.profile, record=args.record,
+                                          record_dir=args.record_dir, headless=args.headless)
+    print(f"{trials} trials replayed in {time.perf_counter() - start:.2f}s")
+
+
+def run_drive(args):
+    use_src()
+    import drive_test
+    drive_test.main(seed=args.seed, render_every=args.render_every, render_rate=args.render_rate,
+                    policy=args.policy, clock_mode=args.clock, speed=args.speed, camera=args.camera,
+                    obs_cache_mb=args.obs_cache)
+
+
+def run_headless(args):
+    use_src()
+    import numpy as np
+    from headless_task import JunctionTask, trials_to_criterion
+    from participant import SyntheticParticipant
+
+    rng = np.random.default_rng(args.seed)
+    participant = SyntheticParticipant(compliance=args.compliance, misread=args.misread, rng=rng)
+    task = JunctionTask(participant)
+
+    start = time.perf_counter()
+    if args.agents == 1:
+        import random
+        from Q_learning import DenseQAgent
+        learner = DenseQAgent(rng=random.Random(args.seed), np_rng=rng)
+        results = task.run(learner, args.trials, log_path=args.log)
+    else:
+        from q_population import QPopulation
+        learners = QPopulation(alphas=0.5, epsilons=0.1, discount_factors=np.ones(args.agents), rng=rng)
+        results = task.run_population(learners, args.trials)
+    elapsed = time.perf_counter() - start
+
+    rewards = results['reward']
+    print(f"{rewards.size} trials ({args.agents} learners x {args.trials}) in {elapsed:.3f}s")
+    print(f"Success rate over the last trial: {(rewards[-1] > 0).mean():.1%}")
+    needed = trials_to_criterion(rewards)
+    if (needed >= 0).any():
+        print(f"Reached criterion: {(needed >= 0).mean():.1%}, "
+              f"median trials to criterion {np.median(needed[needed >= 0]):.0f}")
+
+
+def analyze(args):
+    # Only the standard library unless the Q history is requested
+    import csv
+
+    with open(args.log, newline='') as f:
+        rows = [row for row in csv.DictReader(f) if row.get('Trial Number')]
+    if not rows:
+        print(f"No trials in {args.log}")
+        return
+
+    rewards = [float(row['Termination Reward']) for row in rows if row['Termination Reward']]
+    types = {}
+    for row in rows:
+        types[row['Type of Action']] = types.get(row['Type of Action'], 0) + 1
+    total_times = [float(row['Total Time']) for row in rows]
+    signal_times = [float(row['Time from Signal to Termination']) for row in rows]
+
+    print(f"Trials: {len(rows)}")
+    if rewards:
+        print(f"Success rate: {sum(r > 0 for r in rewards) / len(rewards):.1%}")
+    print("Action types: " + ", ".join(f"{name} {count}" for name, count in sorted(types.items())))
+    print(f"Mean total time: {sum(total_times) / len(total_times):.2f}s, "
+          f"mean signal to termination: {sum(signal_times) / len(signal_times):.2f}s")
+
+    if args.q:
+        q_path = os.path.splitext(args.log)[0] + '.q.npy'
+        index = rows[-1].get('Q History Index')
+        if not index:
+            print(f"No Q history index in {args.log} (e.g. a headless log); no Q table to show")
+        elif not os.path.exists(q_path):
+            print(f"No Q history file {q_path} next to {args.log}")
+        else:
+            use_src()
+            from q_history import load_q_history
+            history = load_q_history(q_path)
+            print(f"Q table after the last trial (history row {index}):")
+            print(history[int(index)])
+
+
+def import_profile(argv):
+    """
+    Re-runs the command under `python -X importtime` and reports the slowest
+    imports and the total import time.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in [REPO_DIR, env.get('PYTHONPATH')] if p)
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'duckiesim'] + argv,
+                          env=env, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            sys.stderr.write(line + '\n')
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue # Column header line
+        name = fields[2].rstrip()
+        imports.append((cumulative_us, self_us, name.strip(), len(name) - len(name.lstrip())))
+
+    top_level = sum(cumulative for cumulative, _, _, depth in imports if depth == 1)
+    print(f"\nImport profile of: duckiesim {' '.join(argv)}")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for cumulative, self_us, name, _ in sorted(imports, reverse=True)[:25]:
+        print(f"{cumulative / 1000:10.1f}ms {self_us / 1000:8.1f}ms  {name}")
+    print(f"Total import time: {top_level / 1000:.1f}ms of {elapsed * 1000:.1f}ms wall clock "
+          f"({len(imports)} modules)")
+    return proc.returncode
+
+
+def add_frame_arguments(parser):
+    parser.add_argument('--render-every', type=int, default=1,
+                        help='render after every N simulation steps (0: never)')
+    parser.add_argument('--render-rate', type=float, default=None, help='maximum renders per second')
+    parser.add_argument('--policy', choices=['catch_up', 'skip'], default='catch_up',
+                        help='what to do with missed simulation steps when the machine falls behind')
+    parser.add_argument('--clock', choices=['realtime', 'scaled', 'fast'], default='realtime',
+                        help='simulation clock: real time, scaled by --speed, or as fast as possible')
+    parser.add_argument('--speed', type=float, default=None,
+                        help='simulated seconds per real second with --clock scaled '
+                             '(default: SIMULATION_SPEED in config/settings.py)')
+    parser.add_argument('--camera', action='store_true',
+                        help='render the camera on every step (default: only when a frame is recorded)')
+    parser.add_argument('--obs-cache', type=int, default=0, metavar='MIB',
+                        help='cache camera frames by quantized pose, up to MIB mebibytes (default: off)')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='duckiesim', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--import-profile', action='store_true',
+                        help='report per-module import time of the command')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='run an experiment')
+    experiments = run.add_subparsers(dest='experiment', required=True)
+
+    learning = experiments.add_parser('learning', help='junction-signalling trials with a participant')
+    learning.add_argument('--seed', type=int, default=123, help='simulator seed')
+    learning.add_argument('--log', help='trial CSV (default: learning_test.CSV_LOG_FILE)')
+    learning.add_argument('--record', action='store_true', help='record the camera frames of every trial')
+    learning.add_argument('--record-dir', default='recordings', help='directory of the frame recordings')
+    learning.add_argument('--replay', help='directory of a memory-mapped replay buffer to fill with every step')
+    learning.add_argument('--replay-downsample', type=int, default=4,
+                          help='keep every N-th pixel of the frames stored in the replay buffer')
+    learning.add_argument('--profile', action='store_true',
+                          help='time each phase of the frame loop and write per-trial p50/p95/p99 '
+                               'timings next to the trial log')
+    learning.add_argument('--record-inputs', metavar='SESSION',
+                          help='record the driving inputs to a session file for `run replay`')
+    add_frame_arguments(learning)
+    learning.set_defaults(func=run_learning)
+
+    drive = experiments.add_parser('drive', help='free driving with the feedback window')
+    drive.add_argument('--seed', type=int, default=123, help='simulator seed')
+    add_frame_arguments(drive)
+    drive.set_defaults(func=run_drive)
+
+    replay = experiments.add_parser('replay', help='re-run a recorded learning session without the participant')
+    replay.add_argument('session', help='session file written with `run learning --record-inputs`')
+    replay.add_argument('--log', default='replay.csv', help='trial CSV of the replay')
+    replay.add_argument('--profile', action='store_true', help='also write the frame timing metrics')
+    replay.add_argument('--record', action='store_true', help='record a top-down video of every trial')
+    replay.add_argument('--record-dir', default='replay_recordings', help='directory of the recordings')
+    replay.add_argument('--headless', action='store_true',
+                        help='replay on the HeadlessEnv, without a GL context. Its kinematics only '
+                             'approximate the simulator, so trials may end on other tiles')
+    replay.set_defaults(func=run_replay)
+
+    headless = experiments.add_parser('headless', help='simulated trials without simulator or windows')
+    headless.add_argument('--trials', type=int, default=30, help='trials per learner')
+    headless.add_argument('--agents', type=int, default=1, help='number of learner/participant pairs')
+    headless.add_argument('--seed', type=int, default=None, help='random seed')
+    headless.add_argument('--compliance', type=float, default=0.9, help='participant compliance')
+    headless.add_argument('--misread', type=float, default=0.05, help='participant misread probability')
+    headless.add_argument('--log', help='trial CSV (single learner only)')
+    headless.set_defaults(func=run_headless)
+
+    analysis = commands.add_parser('analyze', help='summarize a trial CSV')
+    analysis.add_argument('log', help='trial CSV')
+    analysis.add_argument('--q', action='store_true', help='also show the last Q table from the Q history')
+    analysis.set_defaults(func=analyze)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = build_parser().parse_args(argv)
+    if args.import_profile:
+        sys.exit(import_profile([a for a in argv if a != '--import-profile']))
+    args.func(args)
@@ -7,7 +7,7 @@ import pickle
 from collections import defaultdict
 
 
-def make_epsilon_greedy_policy(Q, epsilon, nA):
+def make_epsilon_greedy_policy(Q, epsilon, nA, rng=None):
     """
     Creates an epsilon-greedy policy based on a given Q-function and epsilon.
     
@@ -16,31 +16,116 @@ def make_epsilon_greedy_policy(Q, epsilon, nA):
             Each value is a numpy array of length nA (see below)
         epsilon: The probability to select a random action. Float between 0 and 1.
         nA: Number of actions in the environment.
+        rng: Random stream used by policy_fn.sample, a numpy.random.Generator or
+            the np.random module (the default).
     
     Returns:
         A function that takes the observation as an argument and returns
         the probabilities for each action in the form of a numpy array of length nA.
+        Its sample(observation) attribute draws an action from those probabilities.
     
     """
+    if rng is None:
+        rng = np.random
+
     def policy_fn(observation):
         A = np.ones(nA, dtype=float) * epsilon / nA
         best_action = np.flatnonzero(Q[observation] == np.max(Q[observation]))
         for action in best_action:
             A[action] += (1.0 - epsilon)/len(best_action)
         return A
+
+    def sample(observation):
+        return rng.choice(nA, p=policy_fn(observation))
+
+    policy_fn.sample = sample
     return policy_fn
 
 
+def next_tag_state(tagid, state):
+    """
+    Returns the state reached from `state` when the robot reaches the tile of `tagid`.
+    """
+    next_state = list(state)
+    if tagid == 0:  # Move forward
+        next_state[1] = min(3, state[1] + 1)
+    elif tagid == 1:  # Move right
+        next_state[1] = min(3, state[1] + 2)
+    elif tagid == 2:  # Move left
+        next_state[1] = min(3, state[1] + 3)
+    else:
+        next_state = [0, 0]
+    return tuple(next_state)
+
+
+# State any unknown tagid leads back to
+RESET_STATE = (0, 0)
+
+# tagid -> {state: next state} for the states of the 3x4 grid, so
+# QAgent.tagid_to_state returns shared tuples instead of building new ones
+TAG_TRANSITIONS = {tagid: {(i, j): next_tag_state(tagid, (i, j)) for i in range(3) for j in range(4)}
+                   for tagid in (0, 1, 2)}
+
+
+def make_state_index(n, m):
+    """
+    Builds the (row, col) -> integer id table used by the dense Q storage.
+
+    Args:
+        n: Number of rows in the state grid.
+        m: Number of columns in the state grid.
+
+    Returns:
+        An (n, m) integer array where state_index[row, col] is the row of that
+        state in a dense (n * m, nA) Q array. Ids are assigned row-major.
+    """
+    return np.arange(n * m).reshape(n, m)
+
+
+def q_table_to_array(Q, state_index, nA):
+    """
+    Packs a dict-of-arrays Q-table (as built by QAgent.reset_Q) into a dense array.
+
+    States missing from Q are left at zero.
+    """
+    Q_array = np.zeros((state_index.size, nA))
+    for state, values in Q.items():
+        Q_array[state_index[state]] = values
+    return Q_array
+
+
+def q_array_to_table(Q_array, state_index):
+    """
+    Unpacks a dense (n_states, nA) array into the defaultdict layout used by QAgent,
+    so it can be written to the existing pickle checkpoints.
+    """
+    Q = defaultdict(list)
+    n, m = state_index.shape
+    for i in range(n):
+        for j in range(m):
+            Q[(i, j)] = np.array(Q_array[state_index[i, j]], dtype=float)
+    return Q
+
+
 class QAgent:
-    def __init__(self, nA = 3, discount_factor=1.0, alpha=0.5, epsilon=0.1, episode = 25, model_path = ""):
+    def __init__(self, nA = 3, discount_factor=1.0, alpha=0.5, epsilon=0.1, episode = 25, model_path = "",
+                 rng=None, np_rng=None):
+        # Random streams: rng draws start states (random.Random API), np_rng draws
+        # actions (numpy.random.Generator API). Default to the global modules.
+        self.rng = rng if rng is not None else random
+        self.np_rng = np_rng if np_rng is not None else np.random
+        self.nA = nA
+
         if model_path == "":
             self.Q = self.reset_Q(3,4)
-            self.policy = make_epsilon_greedy_policy(self.Q, epsilon, nA)
+            self.epsilon = epsilon
             self.prev_episodes = 0
             self.discount_factor = discount_factor
         else:
             self.load_model(model_path)
-            self.policy = make_epsilon_greedy_policy(self.Q, self.discount_factor, nA)
+            # Pickle checkpoints store a single value, used for both epsilon and discount
+            self.epsilon = self.discount_factor
+        self.policy = self.make_policy()
 
         self.grid = np.array([
             [0, 1, -1, -1],  
@@ -50,7 +135,7 @@ class QAgent:
         self.alpha = alpha
         self.episodes = episode
 
-        start_state = random.randint(0, 2)
+        start_state = self.rng.randint(0, 2)
         self.start_state = (start_state, 0)
         self.state = self.start_state
         self.action = None
@@ -74,6 +159,14 @@ class QAgent:
         pickle.dump(checkpoint, f)
 
 
+    def q_value(self, state, action):
+        """Q value of a (row, col) state and action."""
+        return self.Q[state][action]
+
+    def make_policy(self):
+        """Epsilon-greedy policy of the current Q-table and epsilon."""
+        return make_epsilon_greedy_policy(self.Q, self.epsilon, self.nA, rng=self.np_rng)
+
     def reset_Q(self, n, m):
         Q = defaultdict(list)
         for i in range(n):
@@ -83,7 +176,7 @@ class QAgent:
             
 
     def reset(self):
-        start_state = random.randint(0, 2)
+        start_state = self.rng.randint(0, 2)
         self.start_state = (start_state, 0)
         self.state = self.start_state
         return self.start_state
@@ -92,16 +185,12 @@ class QAgent:
         return self.grid[state] == 1 or self.grid[state] == -1
 
     def tagid_to_state(self, tagid, state = (0,0)):
-        next_state = list(state)
-        if tagid == 0:  # Move forward
-            next_state[1] = min(3, state[1] + 1)
-        elif tagid == 1:  # Move right
-            next_state[1] = min(3, state[1] + 2)
-        elif tagid == 2:  # Move left
-            next_state[1] = min(3, state[1] + 3)
-        else:
-            next_state = [0, 0]
-        return tuple(next_state)
+        # Precomputed for the grid states; other states are computed
+        transitions = TAG_TRANSITIONS.get(tagid)
+        if transitions is None:
+            return RESET_STATE
+        next_state = transitions.get(state)
+        return next_state if next_state is not None else next_tag_state(tagid, state)
 
     def step(self, tagid):
         next_state = self.tagid_to_state(tagid, self.state)
@@ -112,7 +201,7 @@ class QAgent:
     
     def select_action(self):
         action_probs = self.policy(self.state)
-        action = np.random.choice(np.arange(len(action_probs)), p=action_probs)
+        action = self.np_rng.choice(np.arange(len(action_probs)), p=action_probs)
         if action_probs[action] != np.max(action_probs):
             self.explore = True
         else:
@@ -129,6 +218,140 @@ class QAgent:
         return reward
 
 
+class DenseQAgent(QAgent):
+    """
+    QAgent with the Q-table stored as one contiguous (n_states, nA) float array.
+
+    States are addressed by integer ids (see make_state_index) and the grid
+    rewards, terminal flags and tagid transitions are precomputed into lookup
+    tables, so step/update/select_action do no tuple hashing per call. The
+    tuple-based API (state, start_state, is_terminal, tagid_to_state) still
+    works, and checkpoints are read and written in the same pickle layout as
+    QAgent.
+    """
+    def __init__(self, nA = 3, discount_factor=1.0, alpha=0.5, epsilon=0.1, episode = 25, model_path = "",
+                 rng=None, np_rng=None):
+        self.nA = nA
+        self.state_index = make_state_index(3, 4)
+        super().__init__(nA, discount_factor, alpha, epsilon, episode, model_path, rng, np_rng)
+
+        # Per-id lookup tables. Transitions have one column per tagid 0-2 and a
+        # last column for any other tagid, which sends the agent back to (0, 0).
+        self.rewards = self.grid.ravel()
+        self.terminals = self.rewards != 0
+        self.transitions = np.array([
+            [self.state_index[self.tagid_to_state(tagid, state)] for tagid in (0, 1, 2, None)]
+            for state in np.ndindex(*self.state_index.shape)
+        ])
+
+        # Plain Python copies of the tables for the scalar per-call paths
+        self._rewards = self.rewards.tolist()
+        self._terminals = self.terminals.tolist()
+        self._transitions = self.transitions.tolist()
+
+    @property
+    def state(self):
+        return divmod(self.state_id, self.state_index.shape[1])
+
+    @state.setter
+    def state(self, state):
+        self.state_id = int(self.state_index[state])
+
+    def encode(self, state):
+        """Returns the integer id of a (row, col) state."""
+        return int(self.state_index[state])
+
+    def decode(self, state_id):
+        """Returns the (row, col) state of an integer id."""
+        return divmod(state_id, self.state_index.shape[1])
+
+    def load_model(self, path):
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        self.Q = q_table_to_array(data["q_table"], self.state_index, self.nA)
+        self.prev_episodes = data["episode"]
+        self.discount_factor = data["epsilon"]
+        print(self.Q)
+
+    def save_model(self, path):
+        checkpoint = {
+            'episode': 25,
+            'epsilon': self.discount_factor,
+            'q_table': q_array_to_table(self.Q, self.state_index)
+        }
+        with open(path, 'wb') as f:
+            pickle.dump(checkpoint, f)
+
+    def reset_Q(self, n, m):
+        return np.zeros((n * m, self.nA))
+
+    def q_value(self, state, action):
+        """Q value of a (row, col) state (or integer state id) and action."""
+        state_id = self.encode(state) if isinstance(state, tuple) else state
+        return self.Q[state_id, action]
+
+    def make_policy(self):
+        """
+        Epsilon-greedy policy over the dense Q array. Like the QAgent policy it
+        takes (row, col) states, and also integer state ids.
+        """
+        policy = make_epsilon_greedy_policy(self.Q, self.epsilon, self.nA, rng=self.np_rng)
+
+        def policy_fn(observation):
+            return policy(self.encode(observation) if isinstance(observation, tuple) else observation)
+
+        def sample(observation):
+            return policy.sample(self.encode(observation) if isinstance(observation, tuple) else observation)
+
+        policy_fn.sample = sample
+        return policy_fn
+
+    def reset(self):
+        start_state = self.rng.randint(0, 2)
+        self.start_state = (start_state, 0)
+        self.state_id = int(self.state_index[start_state, 0])
+        return self.start_state
+
+    def is_terminal_id(self, state_id):
+        return self._terminals[state_id]
+
+    def step(self, tagid):
+        """
+        Same as QAgent.step, but returns the integer id of the next state.
+        """
+        slot = tagid if tagid in (0, 1, 2) else 3
+        next_id = self._transitions[self.state_id][slot]
+        self.state_id = next_id
+        return next_id, self._rewards[next_id], self._terminals[next_id]
+
+    def select_action(self):
+        """
+        Epsilon-greedy action for the current state, with ties between the best
+        actions broken uniformly (same distribution as the QAgent policy).
+        """
+        q = self.Q[self.state_id].tolist()
+        best_q = max(q)
+        best_action = [a for a in range(self.nA) if q[a] == best_q]
+        # One uniform draw picks both the branch and the action within it
+        u = self.np_rng.random()
+        if u < self.epsilon:
+            action = int(u / self.epsilon * self.nA)
+        elif len(best_action) == 1:
+            action = best_action[0]
+        else:
+            action = best_action[int((u - self.epsilon) / (1.0 - self.epsilon) * len(best_action))]
+        self.explore = len(best_action) < self.nA and action not in best_action
+        return action
+
+    def update(self, action, tagid):
+        state_id = self.state_id
+        next_id, reward, done = self.step(tagid)
+        Q = self.Q
+        td_target = reward + self.discount_factor * max(Q[next_id].tolist())
+        Q[state_id, action] += self.alpha * (td_target - Q[state_id, action])
+        return reward
+
+
 if __name__ == "__main__":
     tagid = 3 # this should based on what is reported from the environment
     action = None
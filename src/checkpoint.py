@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+import atexit
+import json
+import os
+import queue
+import struct
+import threading
+import uuid
+import zlib
+
+import numpy as np
+
+from Q_learning import make_state_index, q_array_to_table, q_table_to_array
+
+# Full checkpoint layout:
+#   MAGIC | u16 version | u32 header length | JSON header | padding | raw Q array
+# The Q payload starts at a 64-byte aligned offset (recorded in the header) so it
+# can be memory-mapped directly.
+MAGIC = b'QCKPT'
+VERSION = 1
+PAYLOAD_ALIGNMENT = 64
+
+# Incremental journal layout:
+#   JOURNAL_MAGIC | generation (16 bytes) | records...
+# Each record is a RECORD header followed by int32 row ids and the Q rows.
+JOURNAL_MAGIC = b'QJRNL'
+RECORD = struct.Struct('<IIqdddI')  # crc32, payload length, episode, epsilon, discount, alpha, n_rows
+
+
+def _atomic_write(path, chunks):
+    """
+    Writes chunks to a temporary file next to path, syncs it and renames it
+    over path, so path is either the old or the new file, never a partial one.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def save_checkpoint(path, Q, episode, epsilon, discount_factor, alpha, generation=None):
+    """
+    Atomically writes a full, versioned checkpoint.
+
+    Args:
+        path (str): Checkpoint file.
+        Q (np.ndarray): Dense (n_states, nA) Q array.
+        episode (int): Number of episodes trained so far.
+        epsilon (float): Exploration probability.
+        discount_factor (float): Discount factor.
+        alpha (float): Learning rate.
+        generation (str): 32-digit hex id tying incremental journals to this
+                          checkpoint. A new one is generated if not given.
+
+    Returns:
+        The generation id of the written checkpoint.
+    """
+    Q = np.ascontiguousarray(Q, dtype=np.float64)
+    generation = generation or uuid.uuid4().hex
+    header = {
+        'version': VERSION,
+        'generation': generation,
+        'episode': int(episode),
+        'epsilon': float(epsilon),
+        'discount_factor': float(discount_factor),
+        'alpha': float(alpha),
+        'dtype': np.lib.format.dtype_to_descr(Q.dtype),
+        'shape': list(Q.shape),
+    }
+    # The payload offset is part of the header, so grow it until it fits
+    prefix_size = len(MAGIC) + 2 + 4
+    offset = PAYLOAD_ALIGNMENT
+    while True:
+        header['offset'] = offset
+        header_bytes = json.dumps(header).encode('utf-8')
+        if prefix_size + len(header_bytes) <= offset:
+            break
+        offset += PAYLOAD_ALIGNMENT
+    padding = b'\0' * (offset - prefix_size - len(header_bytes))
+
+    _atomic_write(path, [
+        MAGIC, struct.pack('<HI', VERSION, len(header_bytes)), header_bytes, padding,
+        Q.tobytes(),
+    ])
+    return generation
+
+
+def read_header(path):
+    """
+    Reads the JSON header of a checkpoint file.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a Q checkpoint")
+        version, header_size = struct.unpack('<HI', f.read(6))
+        if version > VERSION:
+            raise ValueError(f"{path} has checkpoint version {version}, newer than supported ({VERSION})")
+        return json.loads(f.read(header_size).decode('utf-8'))
+
+
+def load_checkpoint(path, mmap=True):
+    """
+    Loads a checkpoint and replays its incremental journal, if there is one.
+
+    Args:
+        path (str): Checkpoint file.
+        mmap (bool): Map the Q payload instead of reading it. The map is
+                     copy-on-write, so the returned Q can be trained further
+                     without touching the file.
+
+    Returns:
+        A dict with 'Q', 'episode', 'epsilon', 'discount_factor', 'alpha',
+        'generation' and 'version'.
+    """
+    header = read_header(path)
+    shape = tuple(header['shape'])
+    dtype = np.dtype(header['dtype'])
+    if mmap:
+        Q = np.memmap(path, dtype=dtype, mode='c', offset=header['offset'], shape=shape)
+    else:
+        with open(path, 'rb') as f:
+            f.seek(header['offset'])
+            Q = np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+    state = {
+        'Q': Q,
+        'episode': header['episode'],
+        'epsilon': header['epsilon'],
+        'discount_factor': header['discount_factor'],
+        'alpha': header['alpha'],
+        'generation': header['generation'],
+        'version': header['version'],
+    }
+    for record in read_journal(journal_path(path), header['generation'], shape[1]):
+        episode, epsilon, discount_factor, alpha, rows, values = record
+        Q[rows] = values
+        state.update(episode=episode, epsilon=epsilon, discount_factor=discount_factor, alpha=alpha)
+    return state
+
+
+def journal_path(path):
+    """Path of the incremental journal belonging to a checkpoint."""
+    return path + '.journal'
+
+
+def append_journal(path, generation, rows, values, episode, epsilon, discount_factor, alpha):
+    """
+    Appends one incremental record (the given Q rows) to a checkpoint journal.
+    A new journal is started if it is missing or belongs to another generation.
+    """
+    rows = np.ascontiguousarray(rows, dtype=np.int32)
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    payload = rows.tobytes() + values.tobytes()
+    fields = (len(payload), int(episode), float(epsilon), float(discount_factor), float(alpha), rows.size)
+    crc = zlib.crc32(RECORD.pack(0, *fields)[4:] + payload)
+
+    if _journal_generation(path) != generation:
+        _atomic_write(path, [JOURNAL_MAGIC, bytes.fromhex(generation)])
+    with open(path, 'ab') as f:
+        f.write(RECORD.pack(crc, *fields) + payload)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_journal(path, generation, nA):
+    """
+    Yields (episode, epsilon, discount_factor, alpha, rows, values) for every
+    complete record of a journal. Journals of another generation are ignored,
+    and reading stops at the first truncated or corrupt record (e.g. from an
+    interrupted write).
+    """
+    if _journal_generation(path) != generation:
+        return
+    with open(path, 'rb') as f:
+        data = f.read()
+    pos = len(JOURNAL_MAGIC) + 16
+    while pos + RECORD.size <= len(data):
+        crc, payload_size, episode, epsilon, discount_factor, alpha, n_rows = RECORD.unpack_from(data, pos)
+        start = pos + RECORD.size
+        payload = data[start:start + payload_size]
+        if len(payload) < payload_size or zlib.crc32(data[pos + 4:start] + payload) != crc:
+            break
+        rows = np.frombuffer(payload, dtype=np.int32, count=n_rows)
+        values = np.frombuffer(payload, dtype=np.float64, offset=4 * n_rows).reshape(n_rows, nA)
+        yield episode, epsilon, discount_factor, alpha, rows, values
+        pos = start + payload_size
+
+
+def _journal_generation(path):
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(len(JOURNAL_MAGIC) + 16)
+    except FileNotFoundError:
+        return None
+    if len(head) < len(JOURNAL_MAGIC) + 16 or not head.startswith(JOURNAL_MAGIC):
+        return None
+    return head[len(JOURNAL_MAGIC):].hex()
+
+
+class Checkpointer:
+    """
+    Periodic checkpointing of a QAgent or DenseQAgent.
+
+    save() writes a full checkpoint the first time and then only appends the Q
+    rows that changed since the previous save to a journal next to it, which is
+    cheap enough to do after every trial. Every `compact_every` incremental
+    saves the journal is folded into a new full checkpoint. Full checkpoints
+    are written with an atomic rename and journal records carry a checksum, so
+    an interrupted save never corrupts what was saved before.
+
+    With `background`, save() only copies the Q array and queues it, and a
+    writer thread does the file writes and fsyncs, so checkpointing after
+    every trial never stalls the frame loop. flush() waits for the queued
+    saves; close() (also registered with atexit) writes them and stops the thread.
+    """
+    _STOP = object()
+
+    def __init__(self, path, compact_every=100, background=False):
+        """
+        Args:
+            path (str): Checkpoint file, e.g. 'learner.qckpt'.
+            compact_every (int): Number of incremental saves between full checkpoints.
+            background (bool): Write the checkpoints from a background thread.
+        """
+        self.path = path
+        self.compact_every = compact_every
+        self.generation = None
+        self.incremental_saves = 0
+        self._saved_Q = None
+
+        self._queue = None
+        self._closed = False
+        if background:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name='Checkpointer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def save(self, agent, episode=None, full=False):
+        """
+        Checkpoints the agent (in the background, a snapshot of it).
+
+        Args:
+            agent: QAgent or DenseQAgent.
+            episode (int): Episode count to store. Defaults to agent.prev_episodes.
+            full (bool): Force a full checkpoint instead of an incremental one.
+        """
+        Q = self._dense_Q(agent)
+        episode = agent.prev_episodes if episode is None else episode
+        fields = (episode, agent.epsilon, agent.discount_factor, agent.alpha)
+        if self._queue is None:
+            self._write(Q, fields, full)
+        else:
+            self._queue.put((Q.copy(), fields, full)) # The agent keeps training its Q
+
+    def flush(self):
+        """Blocks until every queued save has been written. No-op without background."""
+        if self._queue is None or self._closed or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        """Writes the queued saves and stops the writer thread. Safe to call more than once."""
+        if self._queue is None or self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            elif isinstance(item, threading.Event):
+                item.set()
+            else:
+                self._write(*item)
+
+    def _write(self, Q, fields, full):
+        if full or self.generation is None or self.incremental_saves >= self.compact_every:
+            self.generation = save_checkpoint(self.path, Q, *fields)
+            jpath = journal_path(self.path)
+            if os.path.exists(jpath):
+                os.remove(jpath)
+            self.incremental_saves = 0
+        else:
+            rows = np.flatnonzero((Q != self._saved_Q).any(axis=1))
+            append_journal(journal_path(self.path), self.generation, rows, Q[rows], *fields)
+            self.incremental_saves += 1
+        self._saved_Q = Q.copy()
+
+    def restore(self, agent, mmap=True):
+        """
+        Loads the checkpoint (and journal) into the agent, restoring its Q-table,
+        episode count (agent.prev_episodes), epsilon, discount factor and alpha.
+        The next save() is a full checkpoint, which also drops any torn record
+        an interrupted run left at the end of the journal.
+
+        Returns:
+            The loaded checkpoint dict (see load_checkpoint).
+        """
+        self.flush() # Queued saves first
+        state = load_checkpoint(self.path, mmap=mmap)
+        if isinstance(agent.Q, dict):
+            agent.Q = q_array_to_table(state['Q'], make_state_index(3, 4))
+        else:
+            agent.Q = state['Q']
+        agent.prev_episodes = state['episode']
+        agent.epsilon = state['epsilon']
+        agent.discount_factor = state['discount_factor']
+        agent.alpha = state['alpha']
+        agent.policy = agent.make_policy()
+
+        self.generation = state['generation']
+        self.incremental_saves = self.compact_every
+        self._saved_Q = np.array(state['Q'])
+        return state
+
+    @staticmethod
+    def _dense_Q(agent):
+        if isinstance(agent.Q, dict):
+            return q_table_to_array(agent.Q, make_state_index(3, 4), agent.nA)
+        return np.asarray(agent.Q)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+import numpy as np
+
+# Bits of the driving keys in a key mask
+UP = 1
+DOWN = 2
+LEFT = 4
+RIGHT = 8
+SPACE = 16
+N_MASKS = 32
+
+# Wheel velocities [left, right] each driving key adds to the action
+KEY_ACTIONS = {
+    UP: (0.3, 0.3),     # Linear velocity forward
+    DOWN: (-0.3, -0.3), # Linear velocity backward
+    LEFT: (-0.2, 0.2),  # Angular velocity
+    RIGHT: (0.2, -0.2), # Angular velocity
+}
+
+# Names of the pyglet key constants of each bit
+KEY_NAMES = {UP: 'UP', DOWN: 'DOWN', LEFT: 'LEFT', RIGHT: 'RIGHT', SPACE: 'SPACE'}
+
+
+def build_action_table():
+    """
+    Returns the (N_MASKS, 2) read-only table of the action of every key mask:
+    the sum of the pressed keys' KEY_ACTIONS, or a stop while SPACE is held.
+    """
+    table = np.zeros((N_MASKS, 2))
+    for mask in range(N_MASKS):
+        if mask & SPACE:
+            continue # Stop
+        for bit, velocities in KEY_ACTIONS.items():
+            if mask & bit:
+                table[mask] += velocities
+    table.flags.writeable = False
+    return table
+
+
+ACTION_TABLE = build_action_table()
+
+# The rows of ACTION_TABLE as separate (read-only) arrays, indexed by mask
+ACTION_ROWS = tuple(ACTION_TABLE[mask] for mask in range(N_MASKS))
+
+
+class KeyControls:
+    """
+    Turns the state of the driving keys into the wheel action of a frame.
+
+    The UP/DOWN/LEFT/RIGHT/SPACE keys held in a pyglet KeyStateHandler are
+    read into a bit mask, which indexes ACTION_TABLE. action() returns one of
+    the table's (read-only) ACTION_ROWS, prepared once up front, so reading
+    the controls every frame allocates nothing.
+    """
+    def __init__(self, key_handler, key):
+        """
+        Args:
+            key_handler: pyglet KeyStateHandler (or any mapping symbol -> pressed).
+            key: Module with the key symbols, i.e. pyglet.window.key.
+        """
+        self.key_handler = key_handler
+        self.keys = tuple((getattr(key, name), bit) for bit, name in KEY_NAMES.items())
+        self.rows = ACTION_ROWS
+
+    def mask(self):
+        """Bit mask of the driving keys held down."""
+        key_handler = self.key_handler
+        mask = 0
+        for symbol, bit in self.keys:
+            if key_handler[symbol]:
+                mask |= bit
+        return mask
+
+    def action(self, mask=None):
+        """
+        Returns the [left, right] wheel velocities of the keys held down (or of
+        `mask`). The array is shared and read-only.
+        """
+        return self.rows[self.mask() if mask is None else mask]
+
+
+if __name__ == "__main__":
+    import time
+    import tracemalloc
+    from types import SimpleNamespace
+
+    from Q_learning import QAgent, next_tag_state
+
+    # Stand-ins for pyglet's key constants and KeyStateHandler
+    key = SimpleNamespace(UP=1, DOWN=2, LEFT=3, RIGHT=4, SPACE=5)
+    key_handler = {key.UP: True, key.DOWN: False, key.LEFT: True, key.RIGHT: False, key.SPACE: False}
+
+    def allocating_action():
+        # The per-frame code KeyControls replaces
+        local_action = np.array([0.0, 0.0])
+        if key_handler[key.UP]:
+            local_action += np.array([0.3, 0.3])
+        if key_handler[key.DOWN]:
+            local_action += np.array([-0.3, -0.3])
+        if key_handler[key.LEFT]:
+            local_action += np.array([-0.2, 0.2])
+        if key_handler[key.RIGHT]:
+            local_action += np.array([0.2, -0.2])
+        if key_handler[key.SPACE]:
+            local_action = np.array([0, 0])
+        return local_action
+
+    def peak_bytes(read, n):
+        """Peak traced memory while calling read() n times, above the starting point."""
+        read() # Warm up
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for _ in range(n):
+            read()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak - before
+
+    controls = KeyControls(key_handler, key)
+    learner = QAgent()
+    assert np.array_equal(controls.action(), allocating_action())
+
+    n = 100000
+    baseline = peak_bytes(lambda: None, n) # What the measuring loop itself allocates
+    for name, read in (('np.array per frame', allocating_action),
+                       ('KeyControls.action', controls.action),
+                       ('next_tag_state', lambda: next_tag_state(0, (1, 2))),
+                       ('QAgent.tagid_to_state', lambda: learner.tagid_to_state(0, (1, 2)))):
+        extra = peak_bytes(read, n) - baseline
+        start = time.perf_counter()
+        for _ in range(n):
+            read()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<22} {elapsed / n * 1e6:6.2f} us/frame, peak {extra} bytes above the bare loop")
@@ -1,20 +1,17 @@
 #!/usr/bin/env python3
-import pyglet # Added to fix NameError for pyglet.clock and pyglet.app
-from gym_duckietown.simulator import Simulator 
 import numpy as np
-import time
-from pyglet.window import key
-from pyglet import app, clock, window 
-import math 
-import os 
-import yaml 
-from PIL import Image # Added for screenshot functionality from the working code
 import sys # Added for sys.exit(0) for clean shutdown
 
-# Import FeedbackWindow from the separate file (assumes feedback_window.py exists)
-from feedback_window import FeedbackWindow 
+from frame_scheduler import CATCH_UP, FrameScheduler
+from sim_clock import FAST, REALTIME, SimClock
+from pose_only_env import PoseOnlyEnv
+from obs_cache import ObservationCache
+from controls import KeyControls
+from frame_recorder import PNG, FrameRecorder
 
-print("Initializing Duckietown Simulator (consolidating reset logic)...")
+# NOTE: gym_duckietown, pyglet and the FeedbackWindow are imported in main(), so
+# this module can be imported without opening windows or paying for the
+# simulator imports.
 
 # ==============================================================================
 # CUSTOM MAP PATH (Assumes 'plus_map.yaml' is in the gym_duckietown/maps directory)
@@ -36,14 +33,19 @@ action = np.array([0.0, 0.0])
 # KEYBOARD EVENT HANDLERS
 # ==============================================================================
 
-# Initialize Pyglet's KeyStateHandler to track continuous key presses.
-key_handler = key.KeyStateHandler()
+# Pyglet's key constants and the KeyStateHandler tracking continuous key presses.
+# Both are created in main(), with the KeyControls reading the driving keys.
+key = None
+key_handler = None
+controls = None
 
 # MODIFIED: on_key_press - Only handles special keys and defers manual reset
 def on_key_press(symbol, modifiers):
     global manual_reset_pending # Declare global to modify the flag
     
     if symbol == key.ESCAPE:
+        recorder.close() # Write pending frames before exiting
+        print(scheduler.report())
         env.close()
         feedback_win.close()
         sys.exit(0) # Changed app.exit() to sys.exit(0) for cleaner shutdown
@@ -58,6 +60,11 @@ def on_key_press(symbol, modifiers):
         print("RESET (manual key press - pending)")
         manual_reset_pending = True # Set the flag to trigger reset in update loop
     
+    # Start/stop recording the camera frames (written in the background)
+    elif symbol == key.RETURN:
+        recorder.toggle()
+        print(f"Recording {'started: ' + recorder.recording if recorder.recording else 'stopped'}")
+    
     # Pass the event to the key_handler for continuous state tracking of all keys
     key_handler.on_key_press(symbol, modifiers)
 
@@ -67,46 +74,16 @@ def on_key_release(symbol, modifiers):
     key_handler.on_key_release(symbol, modifiers)
 
 
-# ==============================================================================
-# ENVIRONMENT SETUP
-# ==============================================================================
-# Instantiate Simulator directly, passing map_name and seed to constructor.
-# Assumes 'plus_map.yaml' is in the gym_duckietown/maps directory.
-env = Simulator( 
-    seed=123, 
-    map_name="plus_map", 
-    camera_width=640,      
-    camera_height=480,     
-    full_transparency=False, 
-    distortion=False,     
-    domain_rand=0,        
-    frame_skip=1,         
-    camera_rand=False,    
-    dynamics_rand=False,  
-)
-
-# Initial reset of the environment.
-env.reset() 
-
-# Call render() first to ensure the window object is created.
-env.render() 
-env.unwrapped.window.flip() 
-
-# REMOVED: Explicit OpenGL clear calls from initial setup
-
-
-# Create an instance of the FeedbackWindow.
-sim_x, sim_y = env.unwrapped.window.get_location()
-feedback_win = FeedbackWindow(width=200, height=100, title='Duckiebot Feedback', 
-                              feedback_duration=0.2, blink_interval=0.2)
-feedback_win.set_location(sim_x + env.unwrapped.window.width + 20, sim_y)
-feedback_win.activate() 
-
-# Activate the main simulation window AFTER the feedback window to ensure it gets focus.
-env.unwrapped.window.activate() 
-
-# Push both the KeyStateHandler and the individual key event handlers to the simulator's window.
-env.unwrapped.window.push_handlers(key_handler, on_key_press, on_key_release)
+# Simulator, feedback window and frame scheduler, created in main()
+env = None
+feedback_win = None
+scheduler = None
+
+# Frame recorder (RETURN key), created in main()
+recorder = None
+
+# The simulator only renders its camera when a frame is needed (see PoseOnlyEnv)
+camera_every_step = False
 
 # ==============================================================================
 # MAIN UPDATE LOOP
@@ -115,31 +92,21 @@ def update(dt):
     global manual_reset_pending # Access the global flag
     
     """
-    This function is called at every frame to handle
-    movement/stepping and redrawing
+    This function is called by the frame scheduler for every fixed simulation
+    step to handle movement/stepping. Rendering is done separately by render().
     """
     # control logic for driving
-    local_action = np.array([0.0, 0.0]) 
-
-    if key_handler[key.UP]:
-        local_action += np.array([0.3, 0.3]) # Linear velocity forward
-    if key_handler[key.DOWN]:
-        local_action += np.array([-0.3, -0.3]) # Linear velocity backward
-    if key_handler[key.LEFT]:
-        local_action += np.array([-0.2, 0.2]) # Angular velocity
-    if key_handler[key.RIGHT]:
-        local_action += np.array([0.2, -0.2]) # Angular velocity
-    if key_handler[key.SPACE]:
-        local_action = np.array([0, 0]) # Stop
+    # (UP/DOWN/LEFT/RIGHT/SPACE mask -> row of a precomputed, read-only action table)
+    local_action = controls.action()
 
     # The 'action' array passed to env.step() is now [left_wheel_velocity, right_wheel_velocity]
     action_to_step = local_action 
 
-    obs, reward, done, info = env.step(action_to_step) # Pass the calculated action
-    
-    if key_handler[key.RETURN]:
-        im = Image.fromarray(obs)
-        im.save("screen.png")
+    # Only the pose and done are needed every step; the camera frame only for recording
+    need_camera = camera_every_step or recorder.recording is not None
+    obs, reward, done, info = env.step(action_to_step, render=need_camera) # Pass the calculated action
+
+    recorder.record(obs) # No-op unless a recording is running
 
     # CONSOLIDATED RESET LOGIC:
     # If episode is finished OR manual reset is pending, perform reset
@@ -150,15 +117,110 @@ def update(dt):
             print("RESET (manual key press - executing deferred reset)")
             
         env.reset()
-        env.render() # Render immediately after reset
         manual_reset_pending = False # Reset the flag after handling
 
-    env.render() # Render at the end of every frame
+def render():
+    """
+    Draws the simulator window. Called by the frame scheduler at the render rate.
+    """
+    env.render()
 
 # ==============================================================================
-# PYGLET APPLICATION LOOP
+# SETUP AND PYGLET APPLICATION LOOP
 # ==============================================================================
-pyglet.clock.schedule_interval(update, 1.0 / env.unwrapped.frame_rate) 
-pyglet.app.run() 
-
-env.close() # To match manual_control.py's cleanup
+def main(seed=123, render_every=1, render_rate=None, policy=CATCH_UP, clock_mode=REALTIME, speed=None,
+         camera=False, obs_cache_mb=0):
+    """
+    Creates the simulator and feedback window and runs the pyglet loop.
+
+    Args:
+        seed (int): Simulator seed.
+        render_every (int): Render after every this many simulation steps (0: never).
+        render_rate (float): Maximum renders per second, or None.
+        policy (str): What the frame scheduler does when it falls behind (CATCH_UP or SKIP).
+        clock_mode (str): Simulation clock mode (REALTIME, SCALED or FAST).
+        speed (float): Simulation speed in SCALED mode (default: SIMULATION_SPEED).
+        camera (bool): Render the camera observation on every step, not only when recording.
+        obs_cache_mb (int): Budget (MiB) of a pose-keyed cache of the camera frames;
+                            0 renders every frame.
+    """
+    global key, key_handler, controls
+    global env, feedback_win, scheduler, recorder, camera_every_step
+
+    import pyglet
+    from pyglet.window import key
+    from gym_duckietown.simulator import Simulator
+
+    # Import FeedbackWindow from the separate file (assumes feedback_window.py exists)
+    from feedback_window import FeedbackWindow
+
+    print("Initializing Duckietown Simulator (consolidating reset logic)...")
+
+    # The frame loop and the blink timing run on simulated time
+    sim_clock = SimClock(clock_mode, speed=speed)
+
+    # Initialize Pyglet's KeyStateHandler to track continuous key presses.
+    key_handler = key.KeyStateHandler()
+    controls = KeyControls(key_handler, key)
+
+    # Instantiate Simulator directly, passing map_name and seed to constructor.
+    # Assumes 'plus_map.yaml' is in the gym_duckietown/maps directory.
+    env = Simulator( 
+        seed=seed, 
+        map_name="plus_map", 
+        camera_width=640,      
+        camera_height=480,     
+        full_transparency=False, 
+        distortion=False,     
+        domain_rand=0,        
+        frame_skip=1,         
+        camera_rand=False,    
+        dynamics_rand=False,  
+    )
+    # Steps without rendering the camera unless a frame is needed. On this static map
+    # (domain_rand=0) frames of poses seen before can come from the observation cache.
+    obs_cache = ObservationCache(max_bytes=obs_cache_mb * 2**20) if obs_cache_mb else None
+    env = PoseOnlyEnv(env, obs_cache=obs_cache)
+    camera_every_step = camera
+
+    # Initial reset of the environment.
+    env.reset() 
+
+    # Call render() first to ensure the window object is created.
+    env.render() 
+    env.unwrapped.window.flip() 
+
+    # REMOVED: Explicit OpenGL clear calls from initial setup
+
+
+    # Create an instance of the FeedbackWindow.
+    sim_x, sim_y = env.unwrapped.window.get_location()
+    feedback_win = FeedbackWindow(width=200, height=100, title='Duckiebot Feedback', 
+                                  feedback_duration=0.2, blink_interval=0.2, clock=sim_clock)
+    feedback_win.set_location(sim_x + env.unwrapped.window.width + 20, sim_y)
+    feedback_win.activate() 
+
+    # Activate the main simulation window AFTER the feedback window to ensure it gets focus.
+    env.unwrapped.window.activate() 
+
+    # Push both the KeyStateHandler and the individual key event handlers to the simulator's window.
+    env.unwrapped.window.push_handlers(key_handler, on_key_press, on_key_release)
+
+    # RETURN records numbered PNG frames, encoded by a background thread
+    recorder = FrameRecorder('recordings', fmt=PNG)
+
+    # Fixed simulation steps at the simulator's frame rate, rendering at its own rate
+    frame_dt = 1.0 / env.unwrapped.frame_rate
+    scheduler = FrameScheduler(update, render, step_dt=frame_dt, render_every=render_every,
+                               render_rate=render_rate, policy=policy, clock=sim_clock)
+    if clock_mode == FAST:
+        pyglet.clock.schedule(scheduler.tick) # Every pass of the event loop
+    else:
+        pyglet.clock.schedule_interval(scheduler.tick, frame_dt)
+    pyglet.app.run() 
+
+    env.close() # To match manual_control.py's cleanup
+
+
+if __name__ == "__main__":
+    main()
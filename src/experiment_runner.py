@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+
+def make_rngs(seed):
+    """
+    Creates the independent random streams of one job.
+
+    Both streams are derived from the same seed through numpy's SeedSequence,
+    so a (config, seed) job gives the same result whichever worker runs it.
+
+    Returns:
+        (random.Random, numpy.random.Generator) for QAgent's rng and np_rng.
+    """
+    seed_seq = np.random.SeedSequence(seed)
+    py_seed, np_seed = seed_seq.spawn(2)
+    return random.Random(int(py_seed.generate_state(1)[0])), np.random.default_rng(np_seed)
+
+
+def junction_job(config, seed):
+    """
+    Default job: trains one DenseQAgent on the headless junction task.
+
+    Args:
+        config (dict): QAgent arguments ('alpha', 'epsilon', 'discount_factor'),
+                       'n_trials' (default 30) and optionally 'participant', a
+                       dict of SyntheticParticipant arguments.
+        seed (int): Seed of this job's random streams.
+
+    Returns:
+        A dict with the per-trial 'reward' and 'explore' arrays and the final 'Q'.
+    """
+    # Imported here so that only the workers pay for them
+    from headless_task import JunctionTask
+    from participant import SyntheticParticipant
+    from Q_learning import DenseQAgent
+
+    py_rng, np_rng = make_rngs(seed)
+    learner = DenseQAgent(
+        discount_factor=config.get('discount_factor', 1.0),
+        alpha=config.get('alpha', 0.5),
+        epsilon=config.get('epsilon', 0.1),
+        rng=py_rng,
+        np_rng=np_rng,
+    )
+    participant = SyntheticParticipant(rng=np_rng, **config.get('participant', {}))
+    results = JunctionTask(participant).run(learner, config.get('n_trials', 30))
+    return {
+        'reward': results['reward'],
+        'explore': results['explore'],
+        'Q': learner.Q,
+    }
+
+
+def run_chunk(job, chunk):
+    """Runs a list of (config, seed) jobs in one worker and returns their results."""
+    return [job(config, seed) for config, seed in chunk]
+
+
+def run_experiments(configs, seeds, job=junction_job, max_workers=None, chunksize=None):
+    """
+    Runs every (config, seed) pair on a process pool.
+
+    Jobs are sent to the workers in chunks, so the pickling and IPC of a
+    submission is shared by `chunksize` jobs instead of paid for every small
+    job. Results are yielded as soon as each chunk finishes, so their order is
+    not the submission order. Each job builds its own random streams from its
+    seed (see make_rngs), which makes the runs independent of each other and
+    reproducible.
+
+    Args:
+        configs: Iterable of job configurations (passed to job unchanged).
+        seeds: Iterable of integer seeds. Every config is run once per seed.
+        job: Picklable top-level function job(config, seed) -> result.
+        max_workers: Number of worker processes. Defaults to os.cpu_count().
+        chunksize (int): Jobs per submission. Defaults to about four chunks per
+                         worker, which keeps the workers balanced.
+
+    Yields:
+        (config, seed, result) tuples.
+    """
+    jobs = list(itertools.product(configs, seeds))
+    max_workers = max_workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, math.ceil(len(jobs) / (4 * max_workers)))
+    chunks = [jobs[i:i + chunksize] for i in range(0, len(jobs), chunksize)]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(run_chunk, job, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            for (config, seed), result in zip(futures[future], future.result()):
+                yield config, seed, result
+
+
+if __name__ == "__main__":
+    configs = [
+        {'alpha': alpha, 'epsilon': epsilon, 'discount_factor': 1.0, 'n_trials': 30}
+        for alpha in (0.1, 0.3, 0.5, 0.9)
+        for epsilon in (0.0, 0.1, 0.2, 0.3)
+    ]
+    seeds = range(100)
+
+    print(f"Running {len(configs) * len(seeds)} jobs on {os.cpu_count()} cores...")
+    start = time.perf_counter()
+    mean_reward = {}
+    for config, seed, result in run_experiments(configs, seeds):
+        key = (config['alpha'], config['epsilon'])
+        mean_reward.setdefault(key, []).append(result['reward'].mean())
+    elapsed = time.perf_counter() - start
+
+    for (alpha, epsilon), rewards in sorted(mean_reward.items()):
+        print(f"alpha={alpha:.1f} epsilon={epsilon:.1f}: mean reward {np.mean(rewards):.3f}")
+    print(f"Done in {elapsed:.2f}s")
+
+    # Scaling: jobs per second by number of workers, one job per submission vs chunked
+    n_jobs = len(configs) * len(seeds)
+    workers = sorted({1, 2, 4, os.cpu_count() or 1})
+    for chunksize in (1, None):
+        for max_workers in workers:
+            start = time.perf_counter()
+            for _ in run_experiments(configs, seeds, max_workers=max_workers, chunksize=chunksize):
+                pass
+            elapsed = time.perf_counter() - start
+            print(f"{max_workers} workers, chunksize {chunksize or 'auto'}: {n_jobs / elapsed:.0f} jobs/s")
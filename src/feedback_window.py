@@ -1,18 +1,215 @@
 # feedback_window.py
 
+import math
+
 import pyglet
 from pyglet import gl
-import time
 
-class FeedbackWindow(pyglet.window.Window):
+OFF_COLOR = (0.0, 0.0, 0.0, 0.0) # Vertex colour of a light that is off
+
+class BlinkIndicator:
+    """
+    One feedback light: a quad in a pyglet.graphics.Batch plus its blink state machine.
+
+    The ON/OFF transitions of a blink sequence are scheduled with
+    pyglet.clock.schedule_once (or on a SimClock, so blinks last simulated
+    seconds), so blink timing does not depend on how often anything is drawn. The quad's vertex colours are only rewritten when the
+    light changes, and on_change (if given) is called so the owner can redraw.
+
+    - activate_feedback(0, color) shows a solid color continuously.
+    - activate_feedback(None) turns off any active feedback.
+    - activate_feedback(N, color) where N > 0 blinks N times (light turns ON N times).
+    """
+    def __init__(self, batch, x, y, width, height, feedback_duration=0.2, blink_interval=0.2,
+                 on_change=None, group=None, clock=None):
+        """
+        Args:
+            batch (pyglet.graphics.Batch): Batch the light's quad is added to.
+            x, y, width, height (float): Rectangle of the light in window coordinates.
+            feedback_duration (float): Seconds the light stays ON during a blink.
+            blink_interval (float): Seconds the light stays OFF between blinks.
+            on_change (callable): Called without arguments whenever the light changes.
+            group (pyglet.graphics.Group): Optional group of the quad.
+            clock (SimClock): Clock the blink transitions are scheduled on.
+                              Defaults to pyglet's clock (real time).
+        """
+        self.clock = clock if clock is not None else pyglet.clock
+        self.feedback_duration = feedback_duration
+        self.blink_interval = blink_interval
+        self.on_change = on_change
+
+        self.feedback_active = False        # True if any feedback is active (solid or blinking)
+        self.is_solid_on_mode = False       # True if solid color mode is active (num_blinks = 0)
+        self.is_blinking_on_state = False   # True if the light is currently ON
+        self.current_blink_number = 0       # Counts how many times the light has turned ON
+        self.total_blinks_requested = 0     # The target number of ON states for blinking
+        self.feedback_color = (1.0, 1.0, 1.0, 1.0)
+        self._shown_color = OFF_COLOR       # Colour currently in the vertex list
+
+        self.vertex_list = batch.add(4, gl.GL_QUADS, group,
+                                     ('v2f', (x, y, x + width, y, x + width, y + height, x, y + height)),
+                                     ('c4f', OFF_COLOR * 4))
+
+    @property
+    def lit(self):
+        """True if the light is currently showing its colour."""
+        return self.feedback_active and self.is_blinking_on_state
+
+    def activate_feedback(self, num_blinks, color=(1.0, 1.0, 1.0, 1.0)):
+        """
+        Activates or deactivates the light.
+
+        Args:
+            num_blinks (int or None):
+                - None: Deactivates any active feedback (turns off).
+                - 0: Activates a continuous solid color.
+                - > 0: Activates blinking for this many "ON" cycles. Requesting the
+                       count of the sequence that is already running continues it.
+            color (tuple): RGBA tuple (0.0-1.0) for the feedback color.
+        """
+        if num_blinks is None:
+            self._stop()
+        elif num_blinks == 0:
+            self._unschedule()
+            self.is_solid_on_mode = True
+            self.total_blinks_requested = 0
+            self.current_blink_number = 0
+            self._set_light(True, color)
+        elif (not self.feedback_active or self.is_solid_on_mode
+              or num_blinks != self.total_blinks_requested):
+            self._unschedule()
+            self.is_solid_on_mode = False
+            self.total_blinks_requested = num_blinks
+            self.current_blink_number = 0
+            self._set_light(True, color) # Always start a new blink sequence with light ON
+            self.clock.schedule_once(self._end_on_phase, self.feedback_duration)
+        else:
+            self._set_light(self.is_blinking_on_state, color)
+
+    def _end_on_phase(self, dt):
+        self.current_blink_number += 1 # The light just completed an ON cycle
+        if self.current_blink_number < self.total_blinks_requested:
+            self._set_light(False, self.feedback_color)
+            self.clock.schedule_once(self._end_off_phase, self.blink_interval)
+        else:
+            self._stop() # All blinks completed
+
+    def _end_off_phase(self, dt):
+        self._set_light(True, self.feedback_color)
+        self.clock.schedule_once(self._end_on_phase, self.feedback_duration)
+
+    def _stop(self):
+        self._unschedule()
+        self.is_solid_on_mode = False
+        self.current_blink_number = 0
+        self.feedback_active = False
+        self.is_blinking_on_state = False
+        self._update_vertices()
+
+    def _unschedule(self):
+        self.clock.unschedule(self._end_on_phase)
+        self.clock.unschedule(self._end_off_phase)
+
+    def _set_light(self, on, color):
+        self.feedback_active = True
+        self.is_blinking_on_state = on
+        self.feedback_color = tuple(color)
+        self._update_vertices()
+
+    def _update_vertices(self):
+        color = tuple(self.feedback_color) if self.lit else OFF_COLOR
+        if color != self._shown_color:
+            self._shown_color = color
+            self.vertex_list.colors[:] = color * 4
+            if self.on_change is not None:
+                self.on_change()
+
+    def delete(self):
+        """Stops the blink schedule and removes the quad from its batch."""
+        self._unschedule()
+        self.vertex_list.delete()
+
+
+class IndicatorWindow(pyglet.window.Window):
+    """
+    Base class of windows that show BlinkIndicator lights from one Batch.
+
+    The window only clears, draws and swaps its buffers when a light actually
+    changes (or the window is exposed), instead of on every frame. Subclasses
+    add their lights to self.batch with on_change=self.invalidate and list
+    them in self.indicators.
+    """
+    needs_redraw = True    # Set whenever a light changes; cleared by on_draw
+    _swap_pending = False  # True between a real on_draw and its flip
+
+    def __init__(self, width, height, title):
+        self.batch = pyglet.graphics.Batch()
+        self.indicators = []
+        super().__init__(width, height, caption=title, resizable=False)
+
+    def invalidate(self):
+        """
+        Requests a redraw on the next pass of pyglet's event loop.
+        """
+        self.needs_redraw = True
+
+    def on_expose(self):
+        self.needs_redraw = True # The window was uncovered, its contents must be redrawn
+
+    def on_draw(self):
+        """
+        Pyglet's drawing event handler for this window.
+        Draws all lights with one batch draw. When nothing changed since the
+        last draw, both the draw and the buffer swap (see flip) are skipped.
+        """
+        # pyglet's event loop redraws every window after any scheduled function
+        # runs (e.g. the 30 Hz update), so the window keeps its own dirty flag
+        if not self.needs_redraw:
+            return
+
+        self.clear() # Clear the window content
+
+        if any(indicator.lit for indicator in self.indicators):
+            self.batch.draw()
+
+        # OpenGL state cleanup (important if other drawing happens)
+        gl.glDisable(gl.GL_BLEND)
+        gl.glEnable(gl.GL_DEPTH_TEST)
+
+        self.needs_redraw = False
+        self._swap_pending = True
+
+    def flip(self):
+        """
+        Swaps the buffers only if on_draw drew a new frame, so the unchanged
+        front buffer stays on screen otherwise.
+        """
+        if self._swap_pending:
+            self._swap_pending = False
+            super().flip()
+
+    def close(self):
+        """
+        Closes the feedback window.
+        """
+        for indicator in self.indicators:
+            indicator.delete()
+        super().close()
+
+
+class FeedbackWindow(IndicatorWindow):
     """
     A Pyglet window dedicated to displaying blinking or solid visual feedback.
 
     - If activate_feedback(0, color) is called, it displays a solid color continuously.
     - If activate_feedback(None) is called, it turns off any active feedback.
     - If activate_feedback(N, color) where N > 0, it blinks N times (light turns ON N times).
+
+    The light is a BlinkIndicator; the window is only redrawn when it changes
+    (see IndicatorWindow).
     """
-    def __init__(self, width, height, title='Feedback', feedback_duration=0.2, blink_interval=0.2):
+    def __init__(self, width, height, title='Feedback', feedback_duration=0.2, blink_interval=0.2,
+                 clock=None):
         """
         Initializes the FeedbackWindow.
 
@@ -24,28 +221,23 @@ class FeedbackWindow(pyglet.window.Window):
                                        during a single blink cycle. (0.2s as per your original).
             blink_interval (float): The duration (in seconds) for which the light stays OFF
                                     during a single blink cycle. (0.2s as per your original).
+            clock (SimClock): Clock timing the blinks. Defaults to pyglet's clock (real time).
         """
-        super().__init__(width, height, caption=title, resizable=False)
-        
-        self.feedback_active = False        # Overall flag: True if any feedback is active (solid or blinking)
-        self.feedback_duration = feedback_duration # Duration light is ON for a blink
-        self.blink_interval = blink_interval     # Duration light is OFF for a blink
-
-        self.current_blink_number = 0       # Counts how many times the light has turned ON
-        self.total_blinks_requested = 0     # The target number of ON states for blinking
-        self.last_state_change_time = 0.0   # Timestamp of the last ON/OFF state change
-        self.is_blinking_on_state = False   # True if the light should currently be ON (for blinking)
+        super().__init__(width, height, title)
 
-        self.is_solid_on_mode = False       # NEW: True if solid color mode is active (num_blinks = 0)
-        
         self.set_location(100, 100) # Default window position
 
         self.rect_width = self.width * 0.8
         self.rect_height = self.height * 0.8
         self.rect_x = (self.width - self.rect_width) / 2
         self.rect_y = (self.height - self.rect_height) / 2
-        
-        self.feedback_color = (1.0, 1.0, 1.0, 1.0) # Default color (white)
+
+        self.indicator = BlinkIndicator(self.batch, self.rect_x, self.rect_y,
+                                        self.rect_width, self.rect_height,
+                                        feedback_duration=feedback_duration,
+                                        blink_interval=blink_interval,
+                                        on_change=self.invalidate, clock=clock)
+        self.indicators.append(self.indicator)
 
     def activate_feedback(self, num_blinks, color=(1.0, 1.0, 1.0, 1.0)):
         """
@@ -58,102 +250,81 @@ class FeedbackWindow(pyglet.window.Window):
                 - > 0: Activates blinking for this many "ON" cycles.
             color (tuple): RGBA tuple (0.0-1.0) for the feedback color.
         """
-        if num_blinks is None:
-            # Case 1: Deactivate all feedback
-            self.feedback_active = False
-            self.is_solid_on_mode = False
-            self.current_blink_number = 0
-            self.is_blinking_on_state = False # Ensure light is off
-            return
+        self.indicator.activate_feedback(num_blinks, color)
 
-        # Common setup for activating any feedback
-        self.feedback_active = True
-        self.feedback_color = color
-        
-        if num_blinks == 0:
-            # Case 2: Activate solid color mode
-            self.is_solid_on_mode = True
-            self.total_blinks_requested = 0 # Not relevant for solid mode
-            self.current_blink_number = 0
-            self.is_blinking_on_state = True # Solid color is always "on"
-        else:
-            # Case 3: Activate blinking mode (num_blinks > 0)
-            self.is_solid_on_mode = False
-            # If a new blinking sequence is requested, reset blink counter and state
-            if num_blinks != self.total_blinks_requested: # Only reset if different blink count requested
-                self.current_blink_number = 0 # Reset count for new sequence
-                self.is_blinking_on_state = True # Always start a new blink sequence with light ON
-                self.last_state_change_time = time.time() # Reset timer for new sequence
-            
-            self.total_blinks_requested = num_blinks
+    # Read-only views of the indicator state, as the window used to expose them
+    @property
+    def feedback_active(self):
+        return self.indicator.feedback_active
 
+    @property
+    def feedback_color(self):
+        return self.indicator.feedback_color
 
-    def on_draw(self):
+
+class FeedbackDashboard(IndicatorWindow):
+    """
+    One window showing the feedback lights of many learners or vehicles.
+
+    Light i sits in cell i of a grid filled row by row from the top left, and
+    has its own blink sequence and colour with the same semantics as
+    FeedbackWindow.activate_feedback. All lights are quads in a single Batch,
+    drawn with one call, so monitoring a fleet costs one window and one draw
+    instead of one window per agent.
+    """
+    def __init__(self, n_agents, columns=None, cell_size=60, title='Feedback Dashboard',
+                 feedback_duration=0.2, blink_interval=0.2, clock=None):
         """
-        Pyglet's drawing event handler for this window.
-        Handles drawing the rectangle based on the active feedback mode.
+        Args:
+            n_agents (int): Number of lights.
+            columns (int): Lights per row. Defaults to a roughly square grid.
+            cell_size (int): Width and height (in pixels) of one grid cell.
+            title (str): The title of the window.
+            feedback_duration (float): Seconds a light stays ON during a blink.
+            blink_interval (float): Seconds a light stays OFF between blinks.
+            clock (SimClock): Clock timing the blinks. Defaults to pyglet's clock (real time).
         """
-        self.clear() # Clear the window content
+        self.columns = columns or int(math.ceil(math.sqrt(n_agents)))
+        self.rows = int(math.ceil(n_agents / self.columns))
+        super().__init__(self.columns * cell_size, self.rows * cell_size, title)
 
-        if not self.feedback_active:
-            return # Nothing to draw if feedback is not active
+        self.set_location(100, 100) # Default window position
 
-        current_time = time.time()
+        margin = cell_size * 0.1
+        for i in range(n_agents):
+            row, col = divmod(i, self.columns)
+            x = col * cell_size + margin
+            y = (self.rows - 1 - row) * cell_size + margin # pyglet's y axis points up
+            self.indicators.append(BlinkIndicator(self.batch, x, y, cell_size - 2 * margin,
+                                                  cell_size - 2 * margin,
+                                                  feedback_duration=feedback_duration,
+                                                  blink_interval=blink_interval,
+                                                  on_change=self.invalidate, clock=clock))
 
-        if self.is_solid_on_mode:
-            # Draw solid color if in solid mode
-            gl.glColor4f(*self.feedback_color)
-            gl.glBegin(gl.GL_QUADS)
-            gl.glVertex2f(self.rect_x, self.rect_y)
-            gl.glVertex2f(self.rect_x + self.rect_width, self.rect_y)
-            gl.glVertex2f(self.rect_x + self.rect_width, self.rect_y + self.rect_height)
-            gl.glVertex2f(self.rect_x, self.rect_y + self.rect_height)
-            gl.glEnd()
-        else:
-            # Blinking logic for num_blinks > 0
-            time_since_last_change = current_time - self.last_state_change_time
-
-            if self.is_blinking_on_state:
-                # Light is currently ON
-                if time_since_last_change < self.feedback_duration:
-                    # Still in the ON phase, so draw it
-                    gl.glColor4f(*self.feedback_color)
-                    gl.glBegin(gl.GL_QUADS)
-                    gl.glVertex2f(self.rect_x, self.rect_y)
-                    gl.glVertex2f(self.rect_x + self.rect_width, self.rect_y)
-                    gl.glVertex2f(self.rect_x + self.rect_width, self.rect_y + self.rect_height)
-                    gl.glVertex2f(self.rect_x, self.rect_y + self.rect_height)
-                    gl.glEnd()
-                else:
-                    # ON phase ended. Check if more blinks are needed.
-                    self.current_blink_number += 1 # Increment blink count (light just completed an ON cycle)
-                    if self.current_blink_number < self.total_blinks_requested:
-                        # More blinks needed, switch to OFF state
-                        self.is_blinking_on_state = False
-                        self.last_state_change_time = current_time
-                    else:
-                        # All blinks completed, deactivate feedback
-                        self.feedback_active = False
-                        self.current_blink_number = 0 # Reset count
-                        self.is_blinking_on_state = False # Ensure it's off
-            else:
-                # Light is currently OFF
-                if time_since_last_change < self.blink_interval:
-                    # Still in the OFF phase, do nothing (don't draw)
-                    pass
-                else:
-                    # OFF phase ended, switch back to ON state for the next blink
-                    self.is_blinking_on_state = True
-                    self.last_state_change_time = current_time
+    def __len__(self):
+        return len(self.indicators)
 
-        # OpenGL state cleanup (important if other drawing happens)
-        gl.glDisable(gl.GL_BLEND)
-        gl.glEnable(gl.GL_DEPTH_TEST)
+    def activate_feedback(self, index, num_blinks, color=(1.0, 1.0, 1.0, 1.0)):
+        """
+        Activates or deactivates the light of one agent.
 
+        Args:
+            index (int): Agent (grid cell) index.
+            num_blinks (int or None): As in FeedbackWindow.activate_feedback.
+            color (tuple): RGBA tuple (0.0-1.0) for the feedback color.
+        """
+        self.indicators[index].activate_feedback(num_blinks, color)
 
-    def close(self):
+    def activate_all(self, num_blinks, colors=(1.0, 1.0, 1.0, 1.0)):
         """
-        Closes the feedback window.
+        Activates the lights of all agents at once, e.g. with the actions + 1 of
+        a QPopulation.
+
+        Args:
+            num_blinks (sequence): One entry (int or None) per agent.
+            colors: One RGBA tuple for all agents, or one per agent.
         """
-        super().close()
-        
\ No newline at end of file
+        if len(colors) == 4 and not isinstance(colors[0], (tuple, list)):
+            colors = [colors] * len(self.indicators)
+        for indicator, n, color in zip(self.indicators, num_blinks, colors):
+            indicator.activate_feedback(None if n is None else int(n), color)
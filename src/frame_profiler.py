@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+from time import perf_counter_ns
+
+import numpy as np
+
+# Phases of learning_test.update (and render), in the order they run
+INPUT = 'input'        # Reading the keys into a wheel action
+STEP = 'step'          # env.step
+LOOKUP = 'lookup'      # Tile / tag / role lookup of the new pose
+AGENT = 'agent'        # QAgent select_action / update
+FEEDBACK = 'feedback'  # FeedbackWindow activation
+RESET = 'reset'        # env.reset, tile events and feedback reset at the end of a trial
+LOG = 'log'            # Trial CSV row, Q history and checkpoint
+RENDER = 'render'      # env.render
+FRAME = 'frame'        # Whole update, from begin() to the last mark()
+PHASES = (INPUT, STEP, LOOKUP, AGENT, FEEDBACK, RESET, LOG, RENDER, FRAME)
+
+# Header of the per-trial metrics CSV, one row per phase
+METRICS_HEADER = ['Trial Number', 'Phase', 'Samples', 'Mean (us)', 'p50 (us)', 'p95 (us)',
+                  'p99 (us)', 'Max (us)', 'Over Budget']
+
+
+def _off(*args):
+    pass # Stands in for begin/mark when profiling is disabled
+
+
+def _untimed(render):
+    render() # Stands in for time_render when profiling is disabled: still renders
+
+
+class FrameProfiler:
+    """
+    Times the phases of the frame loop with perf_counter_ns.
+
+    begin() starts a frame; each mark(phase) records the time since the
+    previous mark (or begin) as a sample of `phase`, so the phases of update()
+    are timed back to back with one clock read each. Samples go into a
+    preallocated ring of the last `window` samples per phase, from which
+    percentiles() computes rolling p50/p95/p99.
+
+    dump(trial) summarizes the samples since the previous dump (up to
+    `window` of them) into rows of METRICS_HEADER, e.g. for a TrialLogger next
+    to the trial CSV. FRAME samples longer than `budget_ns` (the frame period)
+    are counted as over budget.
+
+    A disabled profiler replaces begin() and mark() with an empty function,
+    and time_render() with one that just calls render(), so the instrumented
+    loop only pays for a no-op call.
+    """
+    def __init__(self, phases=PHASES, window=4096, budget_ns=None, enabled=True):
+        """
+        Args:
+            phases (tuple): Phase names.
+            window (int): Samples kept per phase for the rolling percentiles.
+            budget_ns (int): Frame time budget in nanoseconds, e.g. the simulation step.
+            enabled (bool): Record samples. When False every call is a no-op.
+        """
+        self.phases = tuple(phases)
+        self.index = {phase: i for i, phase in enumerate(self.phases)}
+        self.window = window
+        self.budget_ns = budget_ns
+        self.enabled = enabled
+
+        self.samples = np.zeros((len(self.phases), window), dtype=np.int64)
+        self.counts = [0] * len(self.phases)        # Samples recorded per phase
+        self.dumped = [0] * len(self.phases)        # counts at the previous dump
+        self._frame_start = 0
+        self._last = 0
+        if not enabled:
+            self.begin = self.mark = _off
+            self.time_render = _untimed
+
+    def begin(self):
+        """Starts timing a frame."""
+        self._frame_start = self._last = perf_counter_ns()
+
+    def mark(self, phase):
+        """Records the time since the previous mark (or begin) as a sample of `phase`."""
+        now = perf_counter_ns()
+        self._add(self.index[phase], now - self._last)
+        self._last = now
+
+    def end(self):
+        """Records the time since begin() as a FRAME sample."""
+        if self.enabled:
+            self._add(self.index[FRAME], perf_counter_ns() - self._frame_start)
+
+    def time_render(self, render):
+        """Calls render() and records its duration as a RENDER sample."""
+        start = perf_counter_ns()
+        render()
+        self._add(self.index[RENDER], perf_counter_ns() - start)
+
+    def _add(self, i, elapsed):
+        self.samples[i, self.counts[i] % self.window] = elapsed
+        self.counts[i] += 1
+
+    def _window(self, i, since=0):
+        """The samples of phase i recorded after the first `since`, up to `window` of them."""
+        n = min(self.counts[i] - since, self.window)
+        if n <= 0:
+            return self.samples[i, :0]
+        end = self.counts[i] % self.window
+        if n == self.window:
+            return self.samples[i]
+        if end >= n:
+            return self.samples[i, end - n:end]
+        return np.concatenate((self.samples[i, end - n:], self.samples[i, :end]))
+
+    def percentiles(self, phase, q=(50, 95, 99)):
+        """
+        Rolling percentiles of the last `window` samples of `phase`, in microseconds.
+        """
+        window = self._window(self.index[phase])
+        if not len(window):
+            return [0.0] * len(q)
+        return (np.percentile(window, q) / 1000).tolist()
+
+    def dump(self, trial):
+        """
+        Summarizes the samples recorded since the previous dump.
+
+        Returns:
+            A list of METRICS_HEADER rows, one per phase with samples (empty when disabled).
+        """
+        rows = []
+        if not self.enabled:
+            return rows
+        for i, phase in enumerate(self.phases):
+            window = self._window(i, self.dumped[i])
+            self.dumped[i] = self.counts[i]
+            if not len(window):
+                continue
+            p50, p95, p99 = np.percentile(window, (50, 95, 99)) / 1000
+            over = int((window > self.budget_ns).sum()) if phase == FRAME and self.budget_ns else ''
+            rows.append([trial, phase, len(window), f"{window.mean() / 1000:.1f}", f"{p50:.1f}",
+                         f"{p95:.1f}", f"{p99:.1f}", f"{window.max() / 1000:.1f}", over])
+        return rows
+
+    def report(self):
+        """Rolling p50/p95/p99 of every phase, as text."""
+        lines = ["Frame timing (us)   p50      p95      p99"]
+        for phase in self.phases:
+            if self.counts[self.index[phase]]:
+                p50, p95, p99 = self.percentiles(phase)
+                lines.append(f"  {phase:<10} {p50:8.1f} {p95:8.1f} {p99:8.1f}")
+        return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    import time
+
+    # Cost of the instrumentation itself, per instrumented frame (8 marks)
+    for enabled in (False, True):
+        renders = [0]
+
+        def render():
+            renders[0] += 1
+
+        profiler = FrameProfiler(enabled=enabled, budget_ns=33_333_333)
+        n = 100000
+        start = time.perf_counter()
+        for _ in range(n):
+            profiler.begin()
+            for phase in PHASES[:-2]:
+                profiler.mark(phase)
+            profiler.time_render(render)
+            profiler.end()
+        elapsed = time.perf_counter() - start
+        assert renders[0] == n, "time_render must always call render"
+        print(f"enabled={enabled}: {elapsed / n * 1e6:.2f} us per frame")
+    print(profiler.report())
+    for row in profiler.dump(0):
+        print(row)
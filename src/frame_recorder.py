@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+import atexit
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+# Output formats
+PNG = 'png' # One numbered PNG per frame
+NPY = 'npy' # Chunks of chunk_size frames as (n, height, width, 3) uint8 .npy files
+FORMATS = (PNG, NPY)
+
+
+class FrameRecorder:
+    """
+    Records simulator frames (the `obs` returned by env.step) without blocking
+    the frame loop.
+
+    record() only copies the frame into a free slot of a preallocated ring
+    buffer and queues the slot; a background thread encodes it (PNG) or packs
+    it into chunks (NPY) and then frees the slot. If the writer falls so far
+    behind that the ring is full, the frame is dropped and counted rather than
+    stalling the caller.
+
+    Frames are grouped into recordings started and stopped with start()/stop(),
+    e.g. one per trial. Each recording goes to its own directory under
+    `directory`, with frames numbered from 0. Pending frames are always written
+    on close(), which is also registered with atexit.
+    """
+    _STOP = object()
+
+    def __init__(self, directory='recordings', fmt=PNG, capacity=32, chunk_size=100):
+        """
+        Args:
+            directory (str): Directory the recordings are written to.
+            fmt (str): PNG or NPY.
+            capacity (int): Number of frames in the ring buffer.
+            chunk_size (int): Frames per .npy chunk (NPY format only).
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}', expected one of {FORMATS}")
+        self.directory = directory
+        self.fmt = fmt
+        self.capacity = capacity
+        self.chunk_size = chunk_size
+
+        self.recording = None  # Directory of the current recording, or None
+        self.frame_number = 0  # Next frame number in the current recording
+        self.recordings = 0
+
+        self.frames_recorded = 0
+        self.frames_dropped = 0
+        self.frames_written = 0
+        self.max_write_latency = 0.0 # Longest time from record() to the frame being written
+
+        self._ring = None      # (capacity, height, width, 3) uint8, allocated on the first frame
+        self._free = queue.Queue()
+        for slot in range(capacity):
+            self._free.put(slot)
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='FrameRecorder', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def start(self, name=None):
+        """
+        Starts a new recording (stopping the current one, if any).
+
+        Args:
+            name (str): Name of the recording directory. Defaults to a timestamp.
+
+        Returns:
+            The directory the frames are written to.
+        """
+        self.stop()
+        name = name or time.strftime('%Y%m%d-%H%M%S') + f"-{self.recordings:03d}"
+        self.recording = os.path.join(self.directory, name)
+        os.makedirs(self.recording, exist_ok=True)
+        self.frame_number = 0
+        self.recordings += 1
+        return self.recording
+
+    def stop(self):
+        """
+        Ends the current recording. Its frames are still written in the background.
+        """
+        if self.recording is not None:
+            self._queue.put((None, self.recording, None, None)) # Ends the recording's last chunk
+            self.recording = None
+
+    def toggle(self, name=None):
+        """Starts a recording if none is running, otherwise stops it."""
+        if self.recording is None:
+            self.start(name)
+        else:
+            self.stop()
+
+    def record(self, obs):
+        """
+        Queues one frame of the current recording. Does nothing if no recording
+        is running (or obs is None).
+
+        Returns:
+            True if the frame was queued, False if it was skipped or dropped.
+        """
+        if self.recording is None or obs is None:
+            return False
+        if self._ring is None:
+            self._ring = np.empty((self.capacity,) + obs.shape, dtype=np.uint8)
+        try:
+            slot = self._free.get_nowait()
+        except queue.Empty:
+            self.frames_dropped += 1
+            return False
+        np.copyto(self._ring[slot], obs, casting='unsafe')
+        self._queue.put((slot, self.recording, self.frame_number, time.perf_counter()))
+        self.frame_number += 1
+        self.frames_recorded += 1
+        return True
+
+    def flush(self):
+        """
+        Blocks until every frame queued so far has been processed. In the NPY
+        format a partial chunk is only saved when its recording stops. Returns
+        immediately after close(), which already wrote every frame.
+        """
+        if self._closed or not self._thread.is_alive():
+            return # No writer thread left to wait for
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        """
+        Stops the current recording, writes all pending frames and stops the
+        writer thread. Safe to call more than once.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self.stop()
+        self._queue.put(self._STOP)
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def stats(self):
+        """
+        Returns the frame counters, the number of queued frames and the
+        maximum write latency as a dict.
+        """
+        return {
+            'frames_recorded': self.frames_recorded,
+            'frames_dropped': self.frames_dropped,
+            'frames_written': self.frames_written,
+            'queue_depth': self._queue.qsize(),
+            'max_write_latency': self.max_write_latency,
+        }
+
+    def _run(self):
+        chunk = None       # Frames of the current .npy chunk
+        chunk_len = 0
+        chunk_dir = None
+        chunk_number = 0
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+
+            slot, recording, frame_number, queued = item
+            if self.fmt == NPY and chunk_len and (slot is None or recording != chunk_dir
+                                                  or chunk_len == self.chunk_size):
+                np.save(os.path.join(chunk_dir, f"chunk_{chunk_number:04d}.npy"), chunk[:chunk_len])
+                chunk_len = 0
+                chunk_number += 1
+            if slot is None:
+                continue # End of a recording
+            if recording != chunk_dir:
+                chunk_dir, chunk_number = recording, 0
+
+            frame = self._ring[slot]
+            if self.fmt == PNG:
+                from PIL import Image # Only needed by the writer thread
+                Image.fromarray(frame).save(os.path.join(recording, f"frame_{frame_number:06d}.png"))
+            else:
+                if chunk is None:
+                    chunk = np.empty((self.chunk_size,) + frame.shape, dtype=np.uint8)
+                chunk[chunk_len] = frame
+                chunk_len += 1
+            self._free.put(slot)
+
+            self.frames_written += 1
+            self.max_write_latency = max(self.max_write_latency, time.perf_counter() - queued)
+
+
+def load_recording(path):
+    """
+    Loads the frames of an NPY recording directory as one (n, height, width, 3) array.
+    """
+    chunks = sorted(name for name in os.listdir(path) if name.startswith('chunk_'))
+    return np.concatenate([np.load(os.path.join(path, name)) for name in chunks])
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+import math
+import time
+
+from sim_clock import FAST, SCALED
+
+# What to do when a tick finds more than one simulation step due
+CATCH_UP = 'catch_up' # Run the missed steps (up to max_catch_up per tick)
+SKIP = 'skip'         # Run one step and drop the rest
+POLICIES = (CATCH_UP, SKIP)
+
+
+class FrameScheduler:
+    """
+    Fixed-timestep frame loop that decouples simulation steps from rendering.
+
+    tick() is scheduled with the pyglet clock (or called by any loop) and
+    accumulates the real time that passed. The simulation advances in steps of
+    exactly step_dt, so physics and learning see the same dt however slow the
+    machine or the renderer is; rendering happens at most once per tick, after
+    every `render_every` steps and no faster than `render_rate`.
+
+    Ticks are expected every step_dt of real time, each running
+    `steps_per_tick` steps: one, or ceil(speed) with a SCALED SimClock. When a
+    tick finds more steps due than that (the machine fell behind), it is
+    counted as late. With the CATCH_UP policy the missed steps are run, up to
+    max_catch_up times steps_per_tick per tick; with SKIP only steps_per_tick
+    steps run. Steps that are not run are counted as dropped, and their time
+    is discarded rather than carried over.
+
+    With a SimClock, every step advances the clock by step_dt and real time is
+    converted to simulated time at the clock's speed. In FAST mode each tick
+    simply runs `fast_steps` steps, without looking at real time.
+    """
+    def __init__(self, step, render=None, step_dt=1.0 / 30, render_every=1, render_rate=None,
+                 policy=CATCH_UP, max_catch_up=5, clock=None, fast_steps=10, timer=time.perf_counter):
+        """
+        Args:
+            step (callable): step(dt) advances the simulation by dt = step_dt seconds.
+            render (callable): render() draws the current state. None never renders.
+            step_dt (float): Fixed simulation step, in seconds.
+            render_every (int): Render after every this many steps; 0 never renders.
+            render_rate (float): Maximum renders per second (wall clock), or None.
+            policy (str): CATCH_UP or SKIP.
+            max_catch_up (int): Maximum steps run in one tick under CATCH_UP, in
+                                multiples of steps_per_tick.
+            clock (SimClock): Simulated time source to advance, or None.
+            fast_steps (int): Steps per tick when the clock is in FAST mode.
+            timer (callable): Wall clock used to time steps and renders.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy '{policy}', expected one of {POLICIES}")
+        self.step = step
+        self.render = render
+        self.step_dt = step_dt
+        self.render_every = render_every if render is not None else 0
+        self.render_interval = 1.0 / render_rate if render_rate else 0.0
+        self.policy = policy
+        self.clock = clock
+        speed = clock.speed if clock is not None and clock.mode == SCALED else 1.0
+        self.steps_per_tick = max(1, math.ceil(speed - 1e-9)) # Steps of a tick on time
+        self.max_catch_up = (max_catch_up if policy == CATCH_UP else 1) * self.steps_per_tick
+        self.fast_steps = fast_steps
+        self.timer = timer
+
+        self.accumulator = 0.0      # Real time not yet simulated
+        self.steps_since_render = 0
+        self.last_render = None
+
+        self.ticks = 0
+        self.steps = 0
+        self.sim_time = 0.0         # Simulated seconds so far
+        self.renders = 0
+        self.late_ticks = 0         # Ticks that found more than steps_per_tick steps due
+        self.dropped_steps = 0      # Steps that were due but never run
+        self.max_lag = 0.0          # Largest backlog seen at a tick, in seconds
+        self.step_time = 0.0        # Total time spent in step()
+        self.render_time = 0.0      # Total time spent in render()
+
+    def tick(self, dt):
+        """
+        Runs the simulation steps (and render) due after dt seconds of real time.
+        Has the signature of a pyglet.clock callback.
+        """
+        self.ticks += 1
+        if self.clock is not None and self.clock.mode == FAST:
+            return self.run(self.fast_steps)
+
+        self.accumulator += self.clock.real_to_sim(dt) if self.clock is not None else dt
+        due = int(self.accumulator / self.step_dt + 1e-9) # Tolerate float error in the sum
+        if due > self.steps_per_tick:
+            self.late_ticks += 1
+            self.max_lag = max(self.max_lag, self.accumulator - self.steps_per_tick * self.step_dt)
+
+        n_steps = min(due, self.max_catch_up)
+        if due > n_steps:
+            self.dropped_steps += due - n_steps
+        self.accumulator -= due * self.step_dt
+        return self.run(n_steps)
+
+    def run(self, n_steps, dt=None):
+        """
+        Runs n_steps simulation steps back to back, then renders if a render is due.
+
+        Args:
+            n_steps (int): Steps to run.
+            dt (float): Length of each step, e.g. the recorded dt of a replayed
+                        step. Defaults to step_dt.
+        """
+        dt = self.step_dt if dt is None else dt
+        start = self.timer()
+        for _ in range(n_steps):
+            if self.clock is not None:
+                self.clock.advance(dt)
+            self.step(dt)
+        now = self.timer()
+        self.step_time += now - start
+        self.steps += n_steps
+        self.sim_time += n_steps * dt
+        self.steps_since_render += n_steps
+
+        if (self.render_every and self.steps_since_render >= self.render_every
+                and (self.last_render is None or now - self.last_render >= self.render_interval)):
+            self.render()
+            self.render_time += self.timer() - now
+            self.renders += 1
+            self.steps_since_render = 0
+            self.last_render = now
+        return n_steps
+
+    def stats(self):
+        """
+        Returns a dict of the counters: ticks, steps, sim_time, renders,
+        late_ticks, dropped_steps, max_lag and mean step/render times in seconds.
+        """
+        return {
+            'ticks': self.ticks,
+            'steps': self.steps,
+            'sim_time': self.sim_time,
+            'renders': self.renders,
+            'late_ticks': self.late_ticks,
+            'dropped_steps': self.dropped_steps,
+            'max_lag': self.max_lag,
+            'mean_step_time': self.step_time / self.steps if self.steps else 0.0,
+            'mean_render_time': self.render_time / self.renders if self.renders else 0.0,
+        }
+
+    def report(self):
+        """One-line summary of stats() for printing."""
+        stats = self.stats()
+        return (f"Frames: {stats['steps']} steps ({stats['sim_time']:.1f}s simulated), "
+                f"{stats['renders']} renders, {stats['late_ticks']} late ticks, "
+                f"{stats['dropped_steps']} dropped steps, max lag {stats['max_lag'] * 1000:.1f} ms, "
+                f"step {stats['mean_step_time'] * 1000:.2f} ms, render {stats['mean_render_time'] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    # Simulated weak machine: 2 ms steps, 40 ms renders, ticks every 1/30 s
+    sim_clock = [0.0]
+
+    def step(dt):
+        sim_clock[0] += 0.002
+
+    def render():
+        sim_clock[0] += 0.040
+
+    for policy in POLICIES:
+        for render_every in (1, 3, 0):
+            sim_clock[0] = 0.0
+            scheduler = FrameScheduler(step, render, step_dt=1.0 / 30, render_every=render_every,
+                                       policy=policy, timer=lambda: sim_clock[0])
+            last = 0.0
+            while scheduler.sim_time < 60.0 and scheduler.ticks < 100000:
+                now = max(sim_clock[0], last + 1.0 / 30)
+                sim_clock[0] = now
+                scheduler.tick(now - last)
+                last = now
+            print(f"{policy:>8}, render every {render_every}: {scheduler.report()}")
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from map_cache import load_map
+from tile_map import ROLE_JUNCTION
+
+# Reward of leaving the road, as in gym_duckietown
+REWARD_INVALID_POSE = -1000
+
+# Result of _compute_done_reward, with the fields of gym_duckietown's DoneRewardInfo
+DoneRewardInfo = namedtuple('DoneRewardInfo', ['done', 'done_why', 'done_code', 'reward'])
+
+
+class HeadlessEnv:
+    """
+    Headless stand-in for the gym_duckietown Simulator, for runs without a GL
+    context (worker processes, replays, servers).
+
+    It has the parts of the Simulator interface our scripts use: step(action)
+    with [left, right] wheel velocities returning (obs, reward, done, info),
+    reset(), cur_pos / cur_angle, frame_rate, max_steps and unwrapped. The
+    robot moves with the simulator's differential-drive kinematics on the
+    compiled map, and the episode ends when it leaves the drivable tiles or
+    after max_steps. There is no camera: obs is a constant black frame unless
+    a `renderer` callable (env -> uint8 frame) is given.
+    """
+    def __init__(self, tile_map=None, seed=None, max_steps=10000, frame_rate=30, robot_speed=1.2,
+                 wheel_dist=0.102, obs_shape=(480, 640, 3), start_pose=None, renderer=None):
+        """
+        Args:
+            tile_map (TileMap): Map to drive on. Defaults to the (cached) plus map.
+            seed (int): Seed of the start position noise.
+            max_steps (int): Steps before an episode ends.
+            frame_rate (int): Steps per simulated second.
+            robot_speed (float): Wheel velocity (m/s) of a wheel action of 1.
+            wheel_dist (float): Distance between the wheels (m).
+            obs_shape (tuple): Shape of the observations.
+            start_pose (tuple): ((x, z), angle) to start from. Defaults to the map's
+                                start pose, as the Simulator places the robot.
+            renderer (callable): renderer(env) -> obs frame, or None for black frames.
+        """
+        self.tile_map = tile_map if tile_map is not None else load_map(verbose=False)
+        self.rng = np.random.default_rng(seed)
+        self.max_steps = max_steps
+        self.frame_rate = frame_rate
+        self.delta_time = 1.0 / frame_rate
+        self.frame_skip = 1
+        self.robot_speed = robot_speed
+        self.wheel_dist = wheel_dist
+        self.start_pose = start_pose if start_pose is not None else self._default_start_pose()
+        self.renderer = renderer
+        self.obs = np.zeros(obs_shape, dtype=np.uint8)
+
+        self.cur_pos = np.zeros(3)
+        self.cur_angle = 0.0
+        self.step_count = 0
+
+    @property
+    def unwrapped(self):
+        return self
+
+    def _default_start_pose(self):
+        """
+        The Simulator's start pose on this map: the map's `start_pose` relative to
+        the corner of `start_tile`, which is given as [col, row]. Maps without a
+        start_pose start in the right lane of the start tile, facing the junction.
+        """
+        tile_size = self.tile_map.tile_size
+        col, row = self.tile_map.start_tile
+        if self.tile_map.start_pose is not None:
+            (dx, _, dz), angle = self.tile_map.start_pose
+            return (col * tile_size + dx, row * tile_size + dz), angle
+        junction_row, junction_col = self.tile_map.tiles_with_role(ROLE_JUNCTION)[0]
+        # Direction vector (cos a, -sin a) in (x, z), see get_dir_vec
+        angle = math.atan2(-(junction_row - row), junction_col - col)
+        # Drive on the right: offset a quarter tile to the right of the heading
+        x = (col + 0.5) * tile_size + math.sin(angle) * tile_size / 4
+        z = (row + 0.5) * tile_size + math.cos(angle) * tile_size / 4
+        return (x, z), angle
+
+    def reset(self):
+        """
+        Puts the robot back at the start pose (with a little position and angle
+        noise) and returns the first observation.
+        """
+        (x, z), angle = self.start_pose
+        noise = self.rng.uniform(-0.02, 0.02, 3)
+        self.cur_pos = np.array([x + noise[0], 0.0, z + noise[1]])
+        self.cur_angle = angle + noise[2]
+        self.step_count = 0
+        return self.render_obs()
+
+    def render_obs(self):
+        """The camera observation (a black frame without renderer)."""
+        return self.renderer(self) if self.renderer is not None else self.obs
+
+    def update_physics(self, action):
+        """
+        Advances the robot one step with [left, right] wheel velocities in [-1, 1].
+        """
+        left, right = (min(max(float(v), -1.0), 1.0) * self.robot_speed for v in action)
+        x, _, z = self.cur_pos
+        angle = self.cur_angle
+        dt = self.delta_time
+        if left == right:
+            x += dt * left * math.cos(angle)
+            z -= dt * left * math.sin(angle)
+        else:
+            # Rotate about the instantaneous centre of curvature
+            rotation = (right - left) / self.wheel_dist * dt
+            radius = self.wheel_dist * (left + right) / (2 * (left - right))
+            cx = x + radius * math.sin(angle)
+            cz = z + radius * math.cos(angle)
+            dx, dz = x - cx, z - cz
+            cos_r, sin_r = math.cos(rotation), math.sin(rotation)
+            x = cx + dx * cos_r + dz * sin_r
+            z = cz + dz * cos_r - dx * sin_r
+            angle += rotation
+        self.cur_pos[0] = x
+        self.cur_pos[2] = z
+        self.cur_angle = angle
+        self.step_count += 1
+
+    def _compute_done_reward(self):
+        """
+        Returns the DoneRewardInfo of the current pose: done with
+        REWARD_INVALID_POSE off the road, done with reward 0 after max_steps.
+        """
+        row, col, _, _ = self.tile_map.lookup_one(self.cur_pos[0], self.cur_pos[2])
+        on_road = (0 <= row < self.tile_map.shape[0] and 0 <= col < self.tile_map.shape[1]
+                   and self.tile_map.drivable[row, col])
+        if not on_road:
+            return DoneRewardInfo(True, 'invalid-pose', 'invalid-pose', REWARD_INVALID_POSE)
+        if self.step_count >= self.max_steps:
+            return DoneRewardInfo(True, 'max-steps-reached', 'max-steps-reached', 0.0)
+        return DoneRewardInfo(False, '', 'in-progress', 0.0)
+
+    def get_agent_info(self):
+        """Pose and step count, in the layout of Simulator.get_agent_info."""
+        return {'Simulator': {'cur_pos': [float(self.cur_pos[0]), 0.0, float(self.cur_pos[2])],
+                              'cur_angle': float(self.cur_angle), 'timestamp': self.step_count * self.delta_time}}
+
+    def step(self, action):
+        """
+        Returns:
+            (obs, reward, done, info) like Simulator.step.
+        """
+        self.update_physics(action)
+        d = self._compute_done_reward()
+        info = self.get_agent_info()
+        info['Simulator']['msg'] = d.done_why
+        if d.done:
+            info['reason'] = d.done_why
+        return self.render_obs(), d.reward, d.done, info
+
+    def render(self, mode='human'):
+        pass # Nothing to draw
+
+    def close(self):
+        pass
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+import time
+
+import numpy as np
+
+from map_cache import load_map
+from trial_log import CSV_HEADER, log_single_row
+
+
+def follow_signal(num_blinks):
+    """
+    Default participant: drives to the terminal whose tagid is num_blinks - 1.
+    Works on a single blink count or on an array of them.
+    """
+    return num_blinks - 1
+
+
+class JunctionTask:
+    """
+    Headless stand-in for the junction-signalling trials in learning_test.py.
+
+    Each trial follows the same structure as learning_test.update: the robot
+    reaches the junction tile, the learner is reset and picks an action, the
+    action is signalled as (action + 1) blinks, the participant drives to one of
+    the left/straight/right terminal tiles and the learner is updated with the
+    tagid of that tile. No simulator, window or rendering is involved.
+
+    The participant is any callable taking the number of blinks and returning
+    the tagid of the terminal it drives to (see participant.SyntheticParticipant).
+    For population runs it is called with an array of blink counts and must
+    return an array of tagids. If it also has a sample_times(size) method, the
+    trial timings it returns are recorded; otherwise they are zero.
+    """
+    def __init__(self, participant=follow_signal, learning_trial=True, tile_map=None):
+        """
+        Args:
+            participant: Callable num_blinks -> terminal tagid (0, 1 or 2).
+            learning_trial: If False the learner signals its start state instead of
+                            selecting an action, like a 'Fixed' trial in learning_test.py.
+            tile_map: TileMap giving the terminal tile of each tagid for the log.
+                      Defaults to the (cached) compiled plus map.
+        """
+        self.participant = participant
+        self.learning_trial = learning_trial
+        self.tile_map = tile_map if tile_map is not None else load_map(verbose=False)
+        self.terminal_tiles = self.tile_map.terminal_tiles()
+
+    def trial(self, agent):
+        """
+        Runs one trial for a QAgent (or DenseQAgent).
+
+        Returns:
+            (action, tagid, reward) of the trial.
+        """
+        agent.reset()
+        if self.learning_trial:
+            action = agent.select_action()
+        else:
+            action = agent.start_state[0]
+        tagid = self.participant(action + 1)
+        reward = agent.update(action, tagid)
+        return action, tagid, reward
+
+    def run(self, agent, n_trials, log_path=None, q_history=None):
+        """
+        Runs n_trials trials back to back on one agent.
+
+        Args:
+            agent: QAgent or DenseQAgent. DenseQAgent is several times faster.
+            n_trials: Number of trials to run.
+            log_path: Optional CSV path. Every trial is then also written with the
+                      same columns as learning_test.py, which is much slower.
+            q_history: Optional QHistory. The Q-table is then snapshotted after every
+                       trial and the snapshot index goes in the CSV.
+
+        Returns:
+            A dict of per-trial arrays: 'start_state', 'action', 'explore',
+            'tagid', 'reward', 'total_time' and 'signal_time'.
+        """
+        start_states = np.empty(n_trials, dtype=np.int64)
+        actions = np.empty(n_trials, dtype=np.int64)
+        explore = np.empty(n_trials, dtype=bool)
+        tagids = np.empty(n_trials, dtype=np.int64)
+        rewards = np.empty(n_trials, dtype=np.int64)
+        total_times, signal_times = self.sample_times(n_trials)
+
+        if log_path is not None:
+            log_single_row(log_path, [], header=CSV_HEADER)
+
+        # Hoist attribute lookups out of the hot loop
+        reset = agent.reset
+        select_action = agent.select_action
+        update = agent.update
+        participant = self.participant
+        learning_trial = self.learning_trial
+
+        for i in range(n_trials):
+            start_state = reset()[0]
+            if learning_trial:
+                action = select_action()
+            else:
+                action = start_state
+            tagid = participant(action + 1)
+            reward = update(action, tagid)
+
+            start_states[i] = start_state
+            actions[i] = action
+            explore[i] = agent.explore
+            tagids[i] = tagid
+            rewards[i] = reward
+
+            q_index = q_history.append(agent.Q) if q_history is not None else None
+
+            if log_path is not None:
+                if not learning_trial:
+                    trial_type = 'Fixed'
+                elif agent.explore:
+                    trial_type = 'Explore'
+                else:
+                    trial_type = 'Exploit'
+                data_to_log = [i, f"{total_times[i]:.2f}", f"{signal_times[i]:.2f}", action,
+                               trial_type, self.terminal_tiles.get(tagid), reward, q_index]
+                log_single_row(log_path, data_to_log)
+
+        return {
+            'start_state': start_states,
+            'action': actions,
+            'explore': explore,
+            'tagid': tagids,
+            'reward': rewards,
+            'total_time': total_times,
+            'signal_time': signal_times,
+        }
+
+    def run_population(self, population, n_trials):
+        """
+        Runs n_trials trials for every agent of a QPopulation at once.
+
+        Returns:
+            A dict of (n_trials, K) arrays with the same keys as run().
+        """
+        K = population.K
+        start_states = np.empty((n_trials, K), dtype=np.int64)
+        actions = np.empty((n_trials, K), dtype=np.int64)
+        explore = np.empty((n_trials, K), dtype=bool)
+        tagids = np.empty((n_trials, K), dtype=np.int64)
+        rewards = np.empty((n_trials, K), dtype=np.int64)
+
+        for i in range(n_trials):
+            start_states[i] = population.reset()
+            if self.learning_trial:
+                actions[i] = population.select_actions()
+                explore[i] = population.explore
+            else:
+                actions[i] = start_states[i]
+                explore[i] = False
+            tagids[i] = self.participant(actions[i] + 1)
+            rewards[i] = population.update(actions[i], tagids[i])
+        total_times, signal_times = self.sample_times((n_trials, K))
+
+        return {
+            'start_state': start_states,
+            'action': actions,
+            'explore': explore,
+            'tagid': tagids,
+            'reward': rewards,
+            'total_time': total_times,
+            'signal_time': signal_times,
+        }
+
+    def sample_times(self, size):
+        """
+        Trial timings from the participant, or zeros if it does not model time.
+        """
+        sample_times = getattr(self.participant, 'sample_times', None)
+        if sample_times is None:
+            return np.zeros(size), np.zeros(size)
+        total_times, signal_times = sample_times(size)
+        return np.broadcast_to(total_times, size), np.broadcast_to(signal_times, size)
+
+
+def trials_to_criterion(rewards, threshold=0.8, window=5):
+    """
+    Number of trials each learner needed before its rolling success rate
+    first reached `threshold`.
+
+    Args:
+        rewards: (n_trials,) or (n_trials, K) rewards, e.g. from JunctionTask.run_population.
+        threshold: Required fraction of rewarded (reward > 0) trials in the window.
+        window: Number of consecutive trials the success rate is taken over.
+
+    Returns:
+        The trial count per learner, or -1 where the criterion was never met.
+    """
+    success = (np.asarray(rewards) > 0).astype(float)
+    if success.ndim == 1:
+        success = success[:, None]
+    csum = np.cumsum(np.vstack([np.zeros((1, success.shape[1])), success]), axis=0)
+    rate = (csum[window:] - csum[:-window]) / window
+    reached = rate >= threshold
+    return np.where(reached.any(axis=0), reached.argmax(axis=0) + window, -1)
+
+
+if __name__ == "__main__":
+    import Q_learning
+
+    task = JunctionTask()
+    learner = Q_learning.DenseQAgent()
+
+    n_trials = 200000
+    start = time.perf_counter()
+    results = task.run(learner, n_trials)
+    elapsed = time.perf_counter() - start
+
+    print(f"{n_trials} trials in {elapsed:.2f}s ({n_trials / elapsed:.0f} trials/sec)")
+    print(f"Mean reward over the last 1000 trials: {results['reward'][-1000:].mean():.3f}")
+    print(learner.Q)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+import atexit
+import os
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from controls import ACTION_ROWS, KeyControls
+
+# Session file layout (version 2):
+#   HEADER | FRAME_DTYPE records (n_frames)
+# One 5-byte record per simulation step: the key mask, with RESET_BIT set on
+# the frames at which a manual reset took effect, and the step's dt. All
+# little-endian. A 30-trial session of ~10 minutes at 30 fps is about 90 KB.
+# Version 1 files (HEADER | uint8 masks | float32 dts | uint32 reset frames)
+# can still be loaded.
+MAGIC = b'DKIN'
+VERSION = 2
+HEADER = struct.Struct('<4sHqqdII') # magic, version, seed, learner seed, step_dt, n_frames, n_resets
+FRAME_DTYPE = np.dtype([('mask', 'u1'), ('dt', '<f4')])
+RESET_BIT = 0x80 # Above every key bit of controls
+
+# A loaded session
+InputSession = namedtuple('InputSession', ['seed', 'learner_seed', 'step_dt', 'masks', 'dts', 'resets'])
+
+
+class InputRecorder:
+    """
+    Records the inputs of a driving session so it can be re-run without the
+    participant: per simulation step the driving key mask (see controls) and
+    the dt the step ran with, the frames at which a manual reset took effect,
+    and the simulator and learner seeds.
+
+    The file is written as the session runs: frames are collected in a
+    preallocated block of `flush_every` records (so record() does not
+    allocate per frame), which is appended to the file when full, and the
+    frame count in the header is updated after every append. A crash or kill
+    loses at most the last block. close(), also registered with atexit,
+    appends the rest.
+    """
+    def __init__(self, path, seed, learner_seed=0, step_dt=1.0 / 30, flush_every=30):
+        """
+        Args:
+            path (str): Session file to write.
+            seed (int): Simulator seed of the session.
+            learner_seed (int): Seed of the learner's random streams.
+            step_dt (float): Simulation step of the session's frame loop.
+            flush_every (int): Frames per append to the file (30: once a second at 30 fps).
+        """
+        self.path = path
+        self.seed = seed
+        self.learner_seed = learner_seed
+        self.step_dt = step_dt
+        self.frames = np.zeros(max(1, flush_every), dtype=FRAME_DTYPE)
+        self.pending = 0     # Frames in self.frames not yet in the file
+        self.n_frames = 0    # Frames recorded, written or pending
+        self.n_resets = 0
+        self._file = open(path, 'wb')
+        self._write_header(0)
+        self._closed = False
+        atexit.register(self.close)
+
+    def _write_header(self, n_frames):
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, self.seed, self.learner_seed, self.step_dt,
+                                     n_frames, self.n_resets))
+        self._file.seek(0, os.SEEK_END)
+        self._file.flush()
+
+    def _append_pending(self):
+        if self.pending:
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(self.frames[:self.pending].tobytes())
+            self.pending = 0
+            self._write_header(self.n_frames)
+
+    def record(self, mask, dt):
+        """Records the key mask and dt of one simulation step."""
+        if self.pending == len(self.frames):
+            self._append_pending()
+        frame = self.frames[self.pending]
+        frame['mask'] = mask
+        frame['dt'] = dt
+        self.pending += 1
+        self.n_frames += 1
+
+    def mark_reset(self):
+        """Records that a manual reset took effect in the most recently recorded step."""
+        # record() only appends a full block before adding a frame, so the most
+        # recent frame is always still pending
+        self.frames[self.pending - 1]['mask'] |= RESET_BIT
+        self.n_resets += 1
+
+    def close(self):
+        """Appends the pending frames and closes the file. Safe to call more than once."""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self._append_pending()
+        self._write_header(self.n_frames)
+        self._file.close()
+        print(f"Input session saved to {self.path}: {self.n_frames} frames, {self.n_resets} manual resets")
+
+
+def save_session(path, seed, learner_seed, step_dt, masks, dts, resets):
+    """Writes a whole session file (written to a temporary file and renamed into place)."""
+    frames = np.zeros(len(masks), dtype=FRAME_DTYPE)
+    frames['mask'] = masks
+    frames['dt'] = dts
+    frames['mask'][np.asarray(resets, dtype=np.intp)] |= RESET_BIT
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, seed, learner_seed, step_dt, len(frames), len(resets)))
+        f.write(frames.tobytes())
+    os.replace(tmp_path, path)
+
+
+def load_session(path):
+    """
+    Reads a session file. Frames after the header's frame count (e.g. a
+    block being appended when the recording process was killed) are ignored.
+
+    Returns:
+        An InputSession.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, seed, learner_seed, step_dt, n_frames, n_resets = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not an input session file")
+    offset = HEADER.size
+    if version == 1:
+        masks = np.frombuffer(data, dtype=np.uint8, count=n_frames, offset=offset)
+        offset += n_frames
+        dts = np.frombuffer(data, dtype='<f4', count=n_frames, offset=offset)
+        offset += 4 * n_frames
+        resets = np.frombuffer(data, dtype='<u4', count=n_resets, offset=offset)
+    elif version == VERSION:
+        frames = np.frombuffer(data, dtype=FRAME_DTYPE, count=n_frames, offset=offset)
+        masks = frames['mask'] & ~np.uint8(RESET_BIT)
+        dts = frames['dt'].copy()
+        resets = np.flatnonzero(frames['mask'] & RESET_BIT).astype(np.uint32)
+    else:
+        raise ValueError(f"Unsupported input session version {version} in {path}")
+    return InputSession(seed, learner_seed, step_dt, masks, dts, resets)
+
+
+class ReplayControls(KeyControls):
+    """
+    KeyControls that plays back the key masks of a recorded session, one per
+    call to mask() (i.e. one per simulation step), instead of reading keys.
+    """
+    def __init__(self, masks):
+        self.rows = ACTION_ROWS
+        self.masks = masks.tolist()
+        self.frame = 0 # Index of the next mask
+
+    def mask(self):
+        mask = self.masks[self.frame]
+        self.frame += 1
+        return mask
@@ -1,39 +1,32 @@
 #!/usr/bin/env python3
-import pyglet # Added to fix NameError for pyglet.clock and pyglet.app
-from gym_duckietown.simulator import Simulator 
 import numpy as np
-import time
-from pyglet.window import key
-from pyglet import app, clock, window 
-import math 
-import csv
 import os
-import time
-import yaml 
-from PIL import Image # Added for screenshot functionality from the working code
+import random
 import sys # Added for sys.exit(0) for clean shutdown
 
 import Q_learning
 
-# Import FeedbackWindow from the separate file (assumes feedback_window.py exists)
-from feedback_window import FeedbackWindow 
-
-print("Initializing Duckietown Simulator (consolidating reset logic)...")
-
-def log_single_row(filepath, data_row, header=None):
-    """
-    Logs a single row of data to a CSV file.
-    If the file doesn't exist, it creates it and writes the header (if provided).
-    """
-    file_exists = os.path.exists(filepath)
-    
-    with open(filepath, 'a', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        
-        if not file_exists and header:
-            writer.writerow(header) # Write header only if file is new
-        
-        writer.writerow(data_row)
+from trial_log import CSV_HEADER, TrialLogger
+from q_history import QHistory
+from checkpoint import Checkpointer
+from tile_map import PLUS_MAP
+from tile_events import TileEvents
+from map_cache import load_map
+from frame_scheduler import CATCH_UP, FrameScheduler
+from sim_clock import FAST, REALTIME, SimClock
+from pose_only_env import PoseOnlyEnv
+from obs_cache import ObservationCache
+from controls import KeyControls
+from input_session import InputRecorder, ReplayControls, load_session
+from frame_recorder import NPY, FrameRecorder
+from topdown_renderer import JUNCTION_COLOR, REWARD_COLORS
+from replay_buffer import ReplayBuffer
+from frame_profiler import (AGENT, FEEDBACK, INPUT, LOG, LOOKUP, METRICS_HEADER, RESET,
+                            STEP, FrameProfiler)
+
+# NOTE: gym_duckietown, pyglet and the FeedbackWindow are imported in main(), so
+# this module can be imported (e.g. by tests or analysis code) without opening
+# windows or paying for the simulator imports.
 
 # ==============================================================================
 # CONFIGURATION AND GLOBAL VARIABLES
@@ -50,14 +43,26 @@ action = np.array([0.0, 0.0])
 # KEYBOARD EVENT HANDLERS
 # ==============================================================================
 
-# Initialize Pyglet's KeyStateHandler to track continuous key presses.
-key_handler = key.KeyStateHandler()
+# Pyglet's key constants and the KeyStateHandler tracking continuous key presses.
+# Both are created in main(), with the KeyControls reading the driving keys.
+key = None
+key_handler = None
+controls = None
 
 # MODIFIED: on_key_press - Only handles special keys and defers manual reset
 def on_key_press(symbol, modifiers):
     global manual_reset_pending # Declare global to modify the flag
     
     if symbol == key.ESCAPE:
+        close_trial_log() # Flush pending trial rows before exiting
+        if input_recorder is not None:
+            input_recorder.close()
+        if profiler.enabled:
+            print(profiler.report())
+        recorder.close()
+        if replay is not None:
+            replay.flush()
+        print(scheduler.report())
         env.close()
         feedback_win.close()
         sys.exit(0) # Changed app.exit() to sys.exit(0) for cleaner shutdown
@@ -71,6 +76,11 @@ def on_key_press(symbol, modifiers):
     elif symbol == key.BACKSPACE or symbol == key.SLASH:
         print("RESET (manual key press - pending)")
         manual_reset_pending = True # Set the flag to trigger reset in update loop
+
+    # Start/stop recording the camera frames (written in the background)
+    elif symbol == key.RETURN:
+        recorder.toggle()
+        print(f"Recording {'started: ' + recorder.recording if recorder.recording else 'stopped'}")
     
     # Pass the event to the key_handler for continuous state tracking of all keys
     key_handler.on_key_press(symbol, modifiers)
@@ -81,59 +91,30 @@ def on_key_release(symbol, modifiers):
     key_handler.on_key_release(symbol, modifiers)
 
 
-# ==============================================================================
-# ENVIRONMENT SETUP
-# ==============================================================================
-# Instantiate Simulator directly, passing map_name and seed to constructor.
-# Assumes 'plus_map.yaml' is in the gym_duckietown/maps directory.
-env = Simulator( 
-    seed=123, 
-    map_name="plus_map", 
-    max_steps=10000,
-    camera_width=640,      
-    camera_height=480,     
-    full_transparency=False, 
-    distortion=False,     
-    domain_rand=0,        
-    frame_skip=1,         
-    camera_rand=False,    
-    dynamics_rand=False,  
-    #display_debug=False
-)
-
-# Initial reset of the environment.
-env.reset() 
-
-# Call render() first to ensure the window object is created.
-env.render() 
-env.unwrapped.window.flip() 
-
-# REMOVED: Explicit OpenGL clear calls from initial setup
-
-
-# Create an instance of the FeedbackWindow.
-sim_x, sim_y = env.unwrapped.window.get_location()
-feedback_win = FeedbackWindow(width=200, height=100, title='learner Feedback', 
-                              feedback_duration=0.2, blink_interval=0.2)
-feedback_win.set_location(sim_x + env.unwrapped.window.width + 20, sim_y)
-feedback_win.activate() 
-
-# Activate the main simulation window AFTER the feedback window to ensure it gets focus.
-env.unwrapped.window.activate() 
-
-# Push both the KeyStateHandler and the individual key event handlers to the simulator's window.
-env.unwrapped.window.push_handlers(key_handler, on_key_press, on_key_release)
-
-learner = Q_learning.QAgent()
-
-# defince tiles by name
-junction = (3, 3)
-left = (5, 3)
-straight = (3, 1)
-right = (1, 3)
+# Simulator, feedback window, learner, map, tile events, frame scheduler and
+# simulation clock, all created in main()
+env = None
+feedback_win = None
+learner = None
+tile_map = None
+tile_events = None
+scheduler = None
+sim_clock = None
+
+# Frame recorder (RETURN key, or every trial with record_trials), created in main()
+recorder = None
+record_trials = False
+
+# Replay buffer of (obs, action, reward, done, tile, tag) steps, created in main() if requested
+replay = None
+
+# The simulator only renders its camera when a frame is needed (see PoseOnlyEnv)
+camera_every_step = False
+
+# Recorder of the key masks, dts and manual resets of the session, created in main() if requested
+input_recorder = None
 
 # Global variables for trial management
-signalled = False # Flag to track if a signal has been sent
 action = None
 learning_trial = True # Flag to indicate if this is a learning trial
 
@@ -142,7 +123,7 @@ total_trials = 30 # Total number of trials to run
 
 q_reward = None
 
-# Global variables for trial timing
+# Global variables for trial timing, in simulated seconds (sim_clock.time())
 episode_start_time = 0.0 # To store the timestamp when the current episode/trial began
 signal_start_time = 0.0  # To store the timestamp when the Q-learner activated a signal (blinking)
 episide_end_time = 0.0   # To store the timestamp when the current episode/trial ended
@@ -150,29 +131,31 @@ episide_end_time = 0.0   # To store the timestamp when the current episode/trial
 # Define your CSV log file path
 CSV_LOG_FILE = '2201-A-0721.csv'
 
-# Define the header for your CSV file
-# Make sure these strings exactly match your desired column names
-csv_header = [
-    'Trial Number',
-    'Total Time',
-    'Time from Signal to Termination',
-    'Action Taken',
-    'Type of Action', # This might be 'Explore', 'Exploit' or 'Fixed'
-    'Termination Location',
-    'Termination Reward',
-    'Q Table'
-]
-
-#if os.path.exists(CSV_LOG_FILE):
-#    os.remove(CSV_LOG_FILE) # Optional: Remove old log file to start fresh each run
-#    print(f"Removed existing log file: {CSV_LOG_FILE}")
-
-# Log the header row. Pass an empty list for data_row if you only want the header initially.
-# Or, if your first trial data is ready immediately, you can log it with the header.
-# For simplicity, let's just write the header.
-log_single_row(CSV_LOG_FILE, [], header=csv_header) # Pass an empty data_row, header will be written
-
-print(f"CSV logging initialized to {CSV_LOG_FILE} with header.")
+# Header for your CSV file (shared with the headless trial engine)
+csv_header = CSV_HEADER
+
+# Trial log, Q history and checkpointer, all created in main()
+trial_logger = None
+q_history = None
+checkpointer = None
+
+# Per-phase frame timing (disabled unless main(profile=True)) and its per-trial
+# metrics CSV, created in main()
+profiler = FrameProfiler(enabled=False)
+metrics_logger = None
+
+def close_trial_log():
+    """
+    Flushes and closes the trial log, metrics log, Q history and checkpointer, and reports how the writer thread kept up.
+    """
+    q_history.close()
+    checkpointer.close()
+    trial_logger.close()
+    if metrics_logger is not None:
+        metrics_logger.close()
+    stats = trial_logger.stats()
+    print(f"Trial log closed: {stats['rows_written']} rows in {stats['flushes']} flushes, "
+          f"max flush latency {stats['max_flush_latency'] * 1000:.1f} ms")
 
 # ==============================================================================
 # MAIN UPDATE LOOP
@@ -183,112 +166,62 @@ def update(dt):
     global q_reward
 
     global manual_reset_pending # Access the global flag
-    global signalled # Access the global signalled flag
-    global action # Access the global action variable
 
     global episode_start_time
-    global signal_start_time
     global episide_end_time
     
     """
-    This function is called at every frame to handle
-    movement/stepping and redrawing
+    This function is called by the frame scheduler for every fixed simulation
+    step to handle movement/stepping. Rendering is done separately by render().
     """
+    profiler.begin()
+
     # Control logic for driving
-    local_action = np.array([0.0, 0.0]) 
-
-    if key_handler[key.UP]:
-        local_action += np.array([0.3, 0.3]) # Linear velocity forward
-    if key_handler[key.DOWN]:
-        local_action += np.array([-0.3, -0.3]) # Linear velocity backward
-    if key_handler[key.LEFT]:
-        local_action += np.array([-0.2, 0.2]) # Angular velocity
-    if key_handler[key.RIGHT]:
-        local_action += np.array([0.2, -0.2]) # Angular velocity
-    if key_handler[key.SPACE]:
-        local_action = np.array([0, 0]) # Stop
+    # (UP/DOWN/LEFT/RIGHT/SPACE mask -> row of a precomputed, read-only action table)
+    mask = controls.mask()
+    local_action = controls.action(mask)
+    if input_recorder is not None:
+        input_recorder.record(mask, dt)
 
     # The 'action' array passed to env.step() is now [left_wheel_velocity, right_wheel_velocity]
     action_to_step = local_action 
+    profiler.mark(INPUT)
 
-    obs, reward, done, info = env.step(action_to_step) # Pass the calculated action
+    # Only the pose and done are needed every step; the camera frame only for recording
+    need_camera = camera_every_step or recorder.recording is not None or replay is not None
+    obs, reward, done, info = env.step(action_to_step, render=need_camera) # Pass the calculated action
+    profiler.mark(STEP)
 
+    # Track the tile from the compiled map. Only crossing a tile boundary costs more
+    # than a comparison; entering the junction or a terminal calls the JunctionSignal
+    # handlers (learner, feedback) below.
     current_x, _, current_z = env.unwrapped.cur_pos
-    tile_col = int(current_x / env.unwrapped.road_tile_size)
-    tile_row = int(current_z / env.unwrapped.road_tile_size)
-
-    # Calculate position relative to the tile's bottom-left corner
-    relative_x = current_x - (tile_col * env.unwrapped.road_tile_size)
-    relative_z = current_z - (tile_row * env.unwrapped.road_tile_size)
-
-    #print(f"Current Tile: [{tile_row}, {tile_col}], Position within Tile: [{relative_x:.3f}, {relative_z:.3f}]")
-
-    # Put learning stuff here? We have the postion by now
-    # Determine the tagid based on the current tile
-    current_tile = (tile_row, tile_col)
-    tagid = None
-    if current_tile == junction:
-        tagid = 3
-    elif current_tile == left:
-        tagid = 0
-    elif current_tile == straight:
-        tagid = 1
-    elif current_tile == right:
-        tagid = 2
-    
-    state = learner.tagid_to_state(tagid)
-    #print(f"Current Tile: {current_tile}, Tag ID: {tagid}, State: {state}")
-
-    # use function is_terminal to check if it is a terminal state
-    if current_tile == junction and signalled == False:
-      # if the tagid shows that the learner is at the intersection point, reset everything to start an episode, and choose an action
-      learner.reset()
-      if learning_trial:
-        action = learner.select_action()
-      else:
-          action = learner.start_state[0]
-      #print(f"Learner at state: {learner.state}, selected action: {action}")
-      print(f"Junction reached on trial {trial+1}, {29-trial} remaining! Keep going!")
-
-    elif learner.is_terminal(state) and signalled == True:
-      # if the tagid shows that the learner is at the terminal state, update the Q-table, and this should return you an rewar
-      q_reward = learner.update(action, tagid)
-
-    #if in the junction, signal using the action
-    if current_tile == junction and signalled == False:
-        signalled = True
-        signal_start_time = time.time() # Record the time the signal was activated
-        feedback_win.activate_feedback((action + 1), color=(1.0, 1.0, 1.0, 1.0))
-    
-    if learner.is_terminal(state) and signalled == True:
-        signalled = False
-        if q_reward > 0:
-            feedback_win.activate_feedback(0, color=(0.0, 1.0, 0.0, 1.0))
-        elif q_reward < 0:
-            feedback_win.activate_feedback(0, color=(1.0, 0.0, 0.0, 1.0))
-        else:
-            feedback_win.activate_feedback(None)
+    tile_events.update(current_x, current_z)
+    current_tile, tagid = tile_events.tile, tile_events.tag
+    #print(f"Current Tile: {current_tile}, Tag ID: {tagid}")
+    profiler.mark(LOOKUP)
 
-    # if in a terminal state, show solid colour depending on the reward
+    if replay is not None:
+        replay.add(obs, action_to_step, reward, done, current_tile, tagid)
 
-    
-    if key_handler[key.RETURN]:
-        im = Image.fromarray(obs)
-        im.save("screen.png")
+    recorder.record(obs) # No-op unless a recording is running
 
     # CONSOLIDATED RESET LOGIC:
     # If episode is finished OR manual reset is pending, perform reset
     if done or manual_reset_pending:
-        episide_end_time = time.time() # Capture the end time of the episode
+        episide_end_time = sim_clock.time() # Capture the end time of the episode
         if done:
             print(f"Episode finished. Reason: {info.get('reason', 'Unknown')}. Resetting environment randomly...")
         elif manual_reset_pending:
             print("RESET (manual key press - executing deferred reset)")
+        if manual_reset_pending and input_recorder is not None:
+            input_recorder.mark_reset()
             
         env.reset()
-        env.render() # Render immediately after reset
+        tile_events.reset() # The robot moved; the next update enters its new tile
         manual_reset_pending = False # Reset the flag after handling
         feedback_win.activate_feedback(None)
+        profiler.mark(RESET)
 
         trial_time = episide_end_time - episode_start_time
         signal_time = episide_end_time - signal_start_time
@@ -308,30 +241,440 @@ def update(dt):
         trial_type,                                     # 'Type of Action' (using your new wording)
         current_tile,                                   # 'Termination Location'
         q_reward,                                       # 'Termination Reward'
-        learner.Q,                                      # 'Q Table'
+        q_history.append(learner.Q),                    # 'Q History Index'
         ]   
 
-        log_single_row(CSV_LOG_FILE, data_to_log)
+        trial_logger.log(data_to_log)
+        checkpointer.save(learner, episode=learner.prev_episodes + trial + 1)
+        profiler.mark(LOG)
+        for row in profiler.dump(trial): # Phase timings of the trial just logged
+            metrics_logger.log(row)
 
-        signalled = False
+        junction_signal.reset()
 
-        episode_start_time = time.time() # Capture the end time of the episode
+        episode_start_time = sim_clock.time() # Capture the end time of the episode
 
         trial += 1
+        if record_trials:
+            recorder.start(f"trial_{trial:03d}") # Also ends the previous trial's recording
         if trial == total_trials:
             print("All trials completed. Exiting. Thank you for participating!")
+            close_trial_log()
+            if input_recorder is not None:
+                input_recorder.close()
+            if profiler.enabled:
+                print(profiler.report())
+            recorder.close()
+            if replay is not None:
+                replay.flush()
+            print(scheduler.report())
             env.close()
             feedback_win.close()
             sys.exit(0)
+    profiler.end()
+
+class JunctionSignal:
+    """
+    Tile event handlers of a trial. On entering the junction the learner picks
+    an action and the feedback window signals it; on entering a terminal
+    after that, the learner is updated with the terminal's tagid and the
+    feedback shows the reward. Each happens once per trial.
+
+    With `highlights` set to a TopDownRenderer's highlights list, the tile
+    of the active signal (the junction, then the terminal in the colour of
+    its reward) is highlighted in the rendered frames.
+    """
+    def __init__(self):
+        self.signalled = False # The junction signal of this trial was sent
+        self.highlights = None # (tile, color) list of a TopDownRenderer, or None
+
+    def reset(self):
+        """Starts a new trial."""
+        self.signalled = False
+        if self.highlights is not None:
+            self.highlights.clear()
+
+    def on_junction(self, tile, tagid):
+        global action, signal_start_time
+        if self.signalled:
+            return
+        profiler.mark(LOOKUP)
+
+        # the learner is at the intersection point: reset everything to start an episode, and choose an action
+        learner.reset()
+        if learning_trial:
+            action = learner.select_action()
+        else:
+            action = learner.start_state[0]
+        #print(f"Learner at state: {learner.state}, selected action: {action}")
+        print(f"Junction reached on trial {trial+1}, {29-trial} remaining! Keep going!")
+        profiler.mark(AGENT)
+
+        # signal using the action
+        self.signalled = True
+        signal_start_time = sim_clock.time() # Record the time the signal was activated
+        feedback_win.activate_feedback((action + 1), color=(1.0, 1.0, 1.0, 1.0))
+        if self.highlights is not None:
+            self.highlights[:] = [(tile, JUNCTION_COLOR)]
+        profiler.mark(FEEDBACK)
+
+    def on_terminal(self, tile, tagid):
+        global q_reward
+        if not self.signalled:
+            return
+        profiler.mark(LOOKUP)
+
+        # the tagid of the terminal updates the Q-table, and this returns the reward
+        q_state = learner.state
+        q_reward = learner.update(action, tagid)
+        q_history.record_update(trial, q_state, action, learner.q_value(q_state, action))
+        profiler.mark(AGENT)
+
+        # show solid colour depending on the reward
+        self.signalled = False
+        if q_reward > 0:
+            feedback_win.activate_feedback(0, color=(0.0, 1.0, 0.0, 1.0))
+        elif q_reward < 0:
+            feedback_win.activate_feedback(0, color=(1.0, 0.0, 0.0, 1.0))
+        else:
+            feedback_win.activate_feedback(None)
+        if self.highlights is not None:
+            self.highlights[:] = [(tile, REWARD_COLORS[int(np.sign(q_reward))])]
+        profiler.mark(FEEDBACK)
+
+
+# Handlers of the junction and terminal tile events
+junction_signal = JunctionSignal()
+
+def watch_tiles(max_step=None):
+    """
+    Creates the TileEvents of the map, with the JunctionSignal handlers.
+
+    Args:
+        max_step (float): Largest distance the robot moves per step, to skip tile
+                          checks while no boundary is in reach (see TileEvents).
+    """
+    global tile_events
+    tile_events = TileEvents(tile_map, max_step=max_step)
+    tile_events.push_handlers(junction_signal)
+
+def reset_session():
+    """
+    Resets the per-session state (trial counter, pending reset, last action and
+    reward, trial timing, junction signal, recorders and profiler), so several
+    sessions can run in one process, e.g. replay_session() against changed agents.
+    """
+    global trial, manual_reset_pending, action, q_reward
+    global episode_start_time, signal_start_time, episide_end_time
+    global input_recorder, replay, profiler, metrics_logger
+    trial = 0
+    manual_reset_pending = False
+    action = None
+    q_reward = None
+    episode_start_time = signal_start_time = episide_end_time = 0.0
+    junction_signal.reset()
+    input_recorder = None
+    replay = None
+    profiler = FrameProfiler(enabled=False)
+    metrics_logger = None
+
+def make_simulator(seed):
+    """
+    Creates the gym_duckietown Simulator of the experiment on the plus map.
+    """
+    from gym_duckietown.simulator import Simulator
+
+    # Instantiate Simulator directly, passing map_name and seed to constructor.
+    # Assumes 'plus_map.yaml' is in the gym_duckietown/maps directory.
+    return Simulator( 
+        seed=seed, 
+        map_name="plus_map", 
+        max_steps=10000,
+        camera_width=640,      
+        camera_height=480,     
+        full_transparency=False, 
+        distortion=False,     
+        domain_rand=0,        
+        frame_skip=1,         
+        camera_rand=False,    
+        dynamics_rand=False,  
+        #display_debug=False
+    )
+
+def render():
+    """
+    Draws the simulator window. Called by the frame scheduler at the render rate.
+    """
+    profiler.time_render(env.render)
+
+def make_learner(seed):
+    """
+    Creates the QAgent with its random streams (start states and actions) seeded from `seed`.
+    """
+    return Q_learning.QAgent(rng=random.Random(seed), np_rng=np.random.default_rng(seed))
+
+def open_logs(log_file, frame_dt, profile=False):
+    """
+    Opens the trial log, Q history and checkpointer next to `log_file`, and the
+    frame timing metrics if `profile` is set.
+    """
+    global trial_logger, q_history, checkpointer, profiler, metrics_logger
+
+    # Open the trial log. The header is written if the file is new; rows are written
+    # in batches by a background thread so logging never stalls the frame loop.
+    trial_logger = TrialLogger(log_file, header=csv_header, batch_size=16, flush_interval=1.0)
+
+    print(f"CSV logging initialized to {log_file} with header.")
+
+    # Q-table snapshots go to a memory-mapped history file; the CSV only records the
+    # snapshot index. Every single Q update is also kept in the delta log.
+    q_history = QHistory(os.path.splitext(log_file)[0] + '.q.npy', deltas=True)
+
+    # The learner is checkpointed after every trial; only the changed Q rows are
+    # written, with a full checkpoint every 100 trials, by a background thread.
+    checkpointer = Checkpointer(os.path.splitext(log_file)[0] + '.qckpt', compact_every=100, background=True)
+
+    # Phase timings of every trial, written like the trial log by a background thread
+    if profile:
+        profiler = FrameProfiler(budget_ns=int(frame_dt * 1e9))
+        metrics_file = os.path.splitext(log_file)[0] + '.metrics.csv'
+        metrics_logger = TrialLogger(metrics_file, header=METRICS_HEADER, batch_size=64, flush_interval=5.0)
+        print(f"Frame timing metrics written to {metrics_file}")
 
-    env.render() # Render at the end of every frame
 
 # ==============================================================================
-# PYGLET APPLICATION LOOP
+# SETUP AND PYGLET APPLICATION LOOP
 # ==============================================================================
-episode_start_time = time.time() # Initialize the start time for the first episode
+def main(seed=123, log_file=CSV_LOG_FILE, render_every=1, render_rate=None, policy=CATCH_UP,
+         clock_mode=REALTIME, speed=None, record=False, record_dir='recordings',
+         replay_path=None, replay_downsample=4, camera=False, profile=False, record_inputs=None,
+         obs_cache_mb=0):
+    """
+    Creates the simulator, windows, learner and logs, and runs the pyglet loop.
+
+    Args:
+        seed (int): Simulator seed.
+        log_file (str): Trial CSV. The Q history and checkpoint are written next to it.
+        render_every (int): Render after every this many simulation steps (0: never).
+        render_rate (float): Maximum renders per second, or None.
+        policy (str): What the frame scheduler does when it falls behind (CATCH_UP or SKIP).
+        clock_mode (str): Simulation clock mode (REALTIME, SCALED or FAST).
+        speed (float): Simulation speed in SCALED mode (default: SIMULATION_SPEED).
+        record (bool): Record the camera frames of every trial.
+        record_dir (str): Directory of the frame recordings.
+        replay_path (str): Directory of a memory-mapped replay buffer to fill with
+                           every simulation step, or None.
+        replay_downsample (int): Keep every this many pixels of the frames in the replay buffer.
+        camera (bool): Render the camera observation on every step, not only when
+                       recording or filling the replay buffer.
+        profile (bool): Time every phase of the frame loop and write per-trial
+                        p50/p95/p99 timings to a .metrics.csv next to the log.
+        record_inputs (str): Session file to record the driving inputs to, for
+                             replay_session(), or None.
+        obs_cache_mb (int): Budget (MiB) of a pose-keyed cache of the camera frames;
+                            0 renders every frame.
+    """
+    global key, key_handler, controls
+    global env, feedback_win, learner, tile_map, scheduler, sim_clock
+    global recorder, record_trials, replay, camera_every_step
+    global input_recorder
+    global episode_start_time
+
+    import pyglet
+    from pyglet.window import key
+
+    # Import FeedbackWindow from the separate file (assumes feedback_window.py exists)
+    from feedback_window import FeedbackWindow
+
+    print("Initializing Duckietown Simulator (consolidating reset logic)...")
+
+    # Trial durations, blink timing and the frame loop all run on simulated time
+    sim_clock = SimClock(clock_mode, speed=speed)
+
+    # Initialize Pyglet's KeyStateHandler to track continuous key presses.
+    key_handler = key.KeyStateHandler()
+    controls = KeyControls(key_handler, key)
+
+    env = make_simulator(seed)
+    # Steps without rendering the camera unless a frame is needed. On this static map
+    # (domain_rand=0) frames of poses seen before can come from the observation cache.
+    obs_cache = ObservationCache(max_bytes=obs_cache_mb * 2**20) if obs_cache_mb else None
+    env = PoseOnlyEnv(env, obs_cache=obs_cache)
+    camera_every_step = camera
+
+    # Initial reset of the environment.
+    env.reset() 
+
+    # Call render() first to ensure the window object is created.
+    env.render() 
+    env.unwrapped.window.flip() 
+
+    # REMOVED: Explicit OpenGL clear calls from initial setup
 
-pyglet.clock.schedule_interval(update, 1.0 / env.unwrapped.frame_rate) 
-pyglet.app.run() 
 
-env.close() # To match manual_control.py's cleanup
+    # Create an instance of the FeedbackWindow.
+    sim_x, sim_y = env.unwrapped.window.get_location()
+    feedback_win = FeedbackWindow(width=200, height=100, title='learner Feedback', 
+                                  feedback_duration=0.2, blink_interval=0.2, clock=sim_clock)
+    feedback_win.set_location(sim_x + env.unwrapped.window.width + 20, sim_y)
+    feedback_win.activate() 
+
+    # Activate the main simulation window AFTER the feedback window to ensure it gets focus.
+    env.unwrapped.window.activate() 
+
+    # Push both the KeyStateHandler and the individual key event handlers to the simulator's window.
+    env.unwrapped.window.push_handlers(key_handler, on_key_press, on_key_release)
+
+    # The learner's random streams get their own seed, kept with the recorded inputs
+    learner_seed = random.randrange(2**63)
+    learner = make_learner(learner_seed)
+
+    # Load the compiled tile grids (cached across runs). Tag ids and the
+    # junction/terminal tiles come from the signal_tags section of the map file.
+    tile_map = load_map(PLUS_MAP)
+
+    #if os.path.exists(log_file):
+    #    os.remove(log_file) # Optional: Remove old log file to start fresh each run
+    #    print(f"Removed existing log file: {log_file}")
+
+    frame_dt = 1.0 / env.unwrapped.frame_rate
+    open_logs(log_file, frame_dt, profile)
+
+    # Wheel velocities are clipped to robot_speed, which bounds the distance per step
+    watch_tiles(max_step=env.unwrapped.robot_speed * frame_dt * env.unwrapped.frame_skip)
+
+    episode_start_time = sim_clock.time() # Initialize the start time for the first episode
+
+    # Key masks, dts and manual resets of every step, with the seeds, so the session
+    # can be re-run headlessly by replay_session()
+    if record_inputs is not None:
+        input_recorder = InputRecorder(record_inputs, seed, learner_seed, step_dt=frame_dt)
+        print(f"Recording the driving inputs to {record_inputs}")
+
+    # Frames are copied into a ring buffer and saved as .npy chunks by a background
+    # thread, one directory per recording
+    recorder = FrameRecorder(record_dir, fmt=NPY)
+    record_trials = record
+    if record_trials:
+        recorder.start(f"trial_{trial:03d}")
+
+    # One slot per simulator step (max_steps), allocated up front
+    if replay_path is not None:
+        obs_shape = (env.unwrapped.camera_height, env.unwrapped.camera_width, 3)
+        replay = ReplayBuffer(capacity=10000, obs_shape=obs_shape, downsample=replay_downsample,
+                              path=replay_path)
+        print(f"Replay buffer at {replay_path}: {replay.nbytes / 2**20:.0f} MiB")
+
+    # Simulation steps run at the simulator's frame rate with a fixed dt; rendering
+    # runs at its own rate, so a slow render cannot slow down physics or trial timing.
+    scheduler = FrameScheduler(update, render, step_dt=frame_dt, render_every=render_every,
+                               render_rate=render_rate, policy=policy, clock=sim_clock)
+    if clock_mode == FAST:
+        pyglet.clock.schedule(scheduler.tick) # Every pass of the event loop
+    else:
+        pyglet.clock.schedule_interval(scheduler.tick, frame_dt)
+    pyglet.app.run() 
+
+    env.close() # To match manual_control.py's cleanup
+
+
+class HeadlessFeedback:
+    """Stand-in for the FeedbackWindow in headless replays; counts the activations."""
+    def __init__(self):
+        self.activations = 0
+
+    def activate_feedback(self, n, color=(1.0, 1.0, 1.0, 1.0)):
+        if n is not None:
+            self.activations += 1
+
+    def close(self):
+        pass
+
+
+def replay_session(session_path, log_file, replay_env=None, agent=None, profile=False, record=False,
+                   record_dir='replay_recordings', headless=False):
+    """
+    Re-runs a session recorded with main(record_inputs=...) without the
+    participant, as fast as the simulation runs.
+
+    The recorded key masks are fed to update() step by step through
+    ReplayControls, with the recorded dt of every step and the manual resets
+    at the frames they happened, on a FAST SimClock so the trial times are the
+    simulated ones. Trials are logged to `log_file` (and its Q history and
+    checkpoint) like a live session. The per-session state is reset first, so
+    a session can be replayed several times in one process.
+
+    By default the session is replayed on the Simulator it was recorded on
+    (same seed, pose-only stepping), which reproduces its trials. The
+    HeadlessEnv (headless=True) needs no GL context, but its kinematics only
+    approximate the Simulator's, so trials may end on other tiles.
+
+    Args:
+        session_path (str): Session file written by InputRecorder.
+        log_file (str): Trial CSV of the replay.
+        replay_env: Environment to drive, instead of the default one.
+        agent (QAgent): Learner to run the session against (e.g. a changed
+                        QAgent). Defaults to a QAgent with the session's learner seed.
+        profile (bool): Also write the frame timing metrics (see main()).
+        record (bool): Record a top-down video of every trial (TopDownRenderer
+                       frames, highlighting the junction while the signal is
+                       active and the terminal in the colour of its reward) to `record_dir`.
+        record_dir (str): Directory of the recordings.
+        headless (bool): Replay on a HeadlessEnv instead of the Simulator.
+
+    Returns:
+        The number of trials completed.
+    """
+    global controls, manual_reset_pending
+    global env, feedback_win, learner, tile_map, scheduler, sim_clock, recorder, record_trials
+    global episode_start_time
+
+    from headless_env import HeadlessEnv
+    from topdown_renderer import TopDownRenderer
+
+    reset_session()
+    session = load_session(session_path)
+    sim_clock = SimClock(FAST)
+    env = replay_env
+    if env is None:
+        if headless:
+            sim = HeadlessEnv(seed=session.seed, frame_rate=round(1.0 / session.step_dt))
+        else:
+            sim = make_simulator(session.seed)
+        # Recorded frames are top-down views instead of camera frames
+        env = PoseOnlyEnv(sim, renderer=TopDownRenderer() if record else None)
+    env.reset()
+    # The junction signal updates the highlights of a top-down renderer
+    renderer = getattr(env, 'renderer', None)
+    junction_signal.highlights = renderer.highlights if hasattr(renderer, 'highlights') else None
+    feedback_win = HeadlessFeedback()
+    controls = ReplayControls(session.masks)
+    learner = agent if agent is not None else make_learner(session.learner_seed)
+    tile_map = load_map(PLUS_MAP)
+    watch_tiles(max_step=env.unwrapped.robot_speed * session.step_dt * env.unwrapped.frame_skip)
+    open_logs(log_file, session.step_dt, profile)
+    recorder = FrameRecorder(record_dir, fmt=NPY)
+    record_trials = record
+    if record_trials:
+        recorder.start(f"trial_{trial:03d}")
+    episode_start_time = sim_clock.time()
+
+    scheduler = FrameScheduler(update, step_dt=session.step_dt, clock=sim_clock)
+    resets = set(session.resets.tolist())
+    print(f"Replaying {len(session.masks)} frames of {session_path}")
+    try:
+        for frame, dt in enumerate(session.dts.tolist()):
+            if frame in resets:
+                manual_reset_pending = True
+            scheduler.run(1, dt)
+    except SystemExit:
+        pass # update() exits after the last trial, having closed the logs
+    else:
+        close_trial_log()
+        recorder.close()
+        print(scheduler.report())
+    return trial
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from tile_map import PLUS_MAP, TileMap, compile_map
+
+# Bump when the compiled layout changes, so stale caches are rebuilt
+CACHE_FORMAT = 2
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.map_cache')
+
+# Grids stored as one .npy file each
+GRIDS = ['kind', 'orientation', 'tag', 'role']
+
+
+def map_hash(path):
+    """
+    Content hash of a map file (and of the cache format), used as the cache key.
+    """
+    digest = hashlib.sha256(b'map-cache-%d\0' % CACHE_FORMAT)
+    with open(path, 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def load_map(path=PLUS_MAP, cache_dir=DEFAULT_CACHE_DIR, verbose=True):
+    """
+    Returns the compiled TileMap of a map file, from the cache when possible.
+
+    Cache entries live in `<cache_dir>/<map name>-<content hash>/`, one .npy per
+    grid plus the map objects and a small meta.json. On a hit the grids are
+    memory-mapped instead of read. When the map file changes its hash changes,
+    so the map is recompiled and older entries for the same map are removed.
+
+    Args:
+        path (str): Map YAML file.
+        cache_dir (str): Directory holding the cache entries.
+        verbose (bool): Print whether the cache was hit and a timing breakdown.
+    """
+    start = time.perf_counter()
+    name = os.path.splitext(os.path.basename(path))[0]
+    key = map_hash(path)
+    entry = os.path.join(cache_dir, f"{name}-{key}")
+    hashed = time.perf_counter()
+
+    if os.path.isdir(entry):
+        tile_map = _read_entry(entry)
+        loaded = time.perf_counter()
+        if verbose:
+            print(f"[map cache] hit {name} ({key}): hash {(hashed - start) * 1000:.2f} ms, "
+                  f"load {(loaded - hashed) * 1000:.2f} ms")
+        return tile_map
+
+    tile_map = compile_map(path)
+    compiled = time.perf_counter()
+    _write_entry(cache_dir, entry, tile_map)
+    _remove_stale(cache_dir, name, entry)
+    written = time.perf_counter()
+    if verbose:
+        print(f"[map cache] miss {name} ({key}): hash {(hashed - start) * 1000:.2f} ms, "
+              f"compile {(compiled - hashed) * 1000:.2f} ms, write {(written - compiled) * 1000:.2f} ms")
+    return tile_map
+
+
+def _read_entry(entry):
+    with open(os.path.join(entry, 'meta.json')) as f:
+        meta = json.load(f)
+    grids = {grid: np.load(os.path.join(entry, grid + '.npy'), mmap_mode='r') for grid in GRIDS}
+    objects = np.load(os.path.join(entry, 'objects.npy'), mmap_mode='r')
+    return TileMap(grids['kind'], grids['orientation'], grids['tag'], grids['role'],
+                   meta['tile_size'], start_tile=meta['start_tile'], objects=objects,
+                   start_pose=meta.get('start_pose'))
+
+
+def _write_entry(cache_dir, entry, tile_map):
+    # Build the entry in a temporary directory and rename it into place, so a
+    # concurrent reader never sees a half-written entry
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_entry = f"{entry}.tmp{os.getpid()}"
+    os.makedirs(tmp_entry, exist_ok=True)
+    for grid in GRIDS:
+        np.save(os.path.join(tmp_entry, grid + '.npy'), getattr(tile_map, grid))
+    np.save(os.path.join(tmp_entry, 'objects.npy'), tile_map.objects)
+    with open(os.path.join(tmp_entry, 'meta.json'), 'w') as f:
+        json.dump({'tile_size': tile_map.tile_size, 'start_tile': tile_map.start_tile,
+                   'start_pose': tile_map.start_pose}, f)
+    try:
+        os.rename(tmp_entry, entry)
+    except OSError:
+        # Another process created the entry first
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+
+
+def _remove_stale(cache_dir, name, entry):
+    for other in os.listdir(cache_dir):
+        other_path = os.path.join(cache_dir, other)
+        if other.rsplit('-', 1)[0] == name and other_path != entry and '.tmp' not in other:
+            shutil.rmtree(other_path, ignore_errors=True)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import numpy as np
+
+
+class SyntheticParticipant:
+    """
+    Simulated participant for the junction-signalling task.
+
+    Stands in for the person reading the FeedbackWindow blinks and driving to a
+    terminal tile. Given the number of blinks it returns the tagid of the
+    terminal it drives to, so it can be passed as the participant of a
+    JunctionTask. On each trial it:
+
+    - misreads the blink count by +/- 1 with probability `misread`,
+    - with probability `compliance` drives to the terminal its reading maps to
+      (through `blink_map`), otherwise to a uniformly random terminal,
+    - takes a lognormally distributed time from the signal to the terminal.
+
+    All parameters may be scalars or arrays of length K, in which case element k
+    describes participant k of a population run (see JunctionTask.run_population).
+    """
+    def __init__(self, compliance=0.9, misread=0.05, blink_map=(0, 1, 2),
+                 reaction_time=2.0, reaction_sigma=0.3, approach_time=5.0, rng=None):
+        """
+        Args:
+            compliance (float or array): Probability of following the signal as read.
+            misread (float or array): Probability of reading one blink more or less.
+            blink_map (sequence): blink_map[n - 1] is the terminal tagid the participant
+                                  associates with n blinks (0 = left, 1 = straight, 2 = right).
+            reaction_time (float or array): Median time (in seconds) from the signal to
+                                            reaching the terminal tile.
+            reaction_sigma (float or array): Log-space standard deviation of that time.
+            approach_time (float or array): Time (in seconds) from the trial start to the
+                                            signal, i.e. driving up to the junction.
+            rng: numpy.random.Generator. A fresh default_rng() is created if not given.
+        """
+        self.compliance = np.asarray(compliance, dtype=float)
+        self.misread = np.asarray(misread, dtype=float)
+        self.blink_map = np.asarray(blink_map, dtype=np.int64)
+        self.reaction_time = np.asarray(reaction_time, dtype=float)
+        self.reaction_sigma = np.asarray(reaction_sigma, dtype=float)
+        self.approach_time = np.asarray(approach_time, dtype=float)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.nA = len(self.blink_map)
+
+    def __call__(self, num_blinks):
+        """
+        Picks the terminal to drive to after seeing num_blinks blinks.
+
+        Args:
+            num_blinks (int or array): Blinks signalled (action + 1).
+
+        Returns:
+            The tagid of the chosen terminal, as an int for a scalar input or an
+            array of the same shape as num_blinks.
+        """
+        num_blinks = np.asarray(num_blinks)
+        shape = num_blinks.shape
+
+        # Misread by one blink in either direction, staying within 1..nA
+        misread = self.rng.random(shape) < self.misread
+        offset = np.where(self.rng.random(shape) < 0.5, -1, 1)
+        seen = np.clip(np.where(misread, num_blinks + offset, num_blinks), 1, self.nA)
+
+        comply = self.rng.random(shape) < self.compliance
+        random_terminal = self.rng.integers(0, self.nA, size=shape)
+        tagid = np.where(comply, self.blink_map[seen - 1], random_terminal)
+
+        if shape == ():
+            return int(tagid)
+        return tagid
+
+    def sample_times(self, size=None):
+        """
+        Draws trial timings, matching the 'Total Time' and
+        'Time from Signal to Termination' columns of the trial log.
+
+        Returns:
+            (total_time, signal_time) in seconds, scalars or arrays of `size`.
+        """
+        signal_time = self.reaction_time * np.exp(self.reaction_sigma * self.rng.standard_normal(size))
+        return self.approach_time + signal_time, signal_time
+
+
+if __name__ == "__main__":
+    from headless_task import JunctionTask, trials_to_criterion
+    from q_population import QPopulation
+
+    n_participants = 5000
+    total_trials = 30
+
+    rng = np.random.default_rng()
+    participant = SyntheticParticipant(
+        compliance=rng.uniform(0.7, 1.0, n_participants),
+        misread=rng.uniform(0.0, 0.2, n_participants),
+        rng=rng,
+    )
+    learners = QPopulation(alphas=0.5, epsilons=0.1, discount_factors=np.ones(n_participants), rng=rng)
+    results = JunctionTask(participant).run_population(learners, total_trials)
+
+    curve = (results['reward'] > 0).mean(axis=1)
+    print("Success rate per trial:", np.round(curve, 2))
+    needed = trials_to_criterion(results['reward'])
+    print(f"Reached criterion within {total_trials} trials: {(needed >= 0).mean():.1%} of participants")
+    print(f"Median trials to criterion: {np.median(needed[needed >= 0]):.0f}")
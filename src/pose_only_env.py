@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+import numpy as np
+
+
+class PoseOnlyEnv:
+    """
+    Wraps a gym_duckietown Simulator (or HeadlessEnv) so step() advances the
+    dynamics and the done/reward checks without rendering a camera frame.
+
+    Simulator.step always renders the 640x480 camera observation, even when
+    the caller only needs cur_pos and done. This wrapper runs the same steps
+    (update_physics frame_skip times, get_agent_info, _compute_done_reward)
+    and only calls render_obs() when asked to, e.g. while recording. With an
+    ObservationCache, frames of poses rendered before come from the cache.
+    With a `renderer`, its frames replace the camera's (e.g. a top-down view).
+    Every other attribute (reset, render, unwrapped, window, ...) is passed
+    through to the wrapped environment.
+    """
+    def __init__(self, env, obs_cache=None, renderer=None):
+        """
+        Args:
+            env: Simulator or HeadlessEnv.
+            obs_cache (ObservationCache): Cache of the camera frames by pose, or None.
+            renderer (callable): renderer(env) -> frame to use instead of the camera,
+                                 e.g. a TopDownRenderer, or None.
+        """
+        self.env = env
+        self.sim = env.unwrapped
+        self.obs_cache = obs_cache
+        self.renderer = renderer
+        self.camera_frames = 0 # Camera observations rendered by step() and render_obs()
+        self._action = np.zeros(2) # Clipped action, reused every step
+
+    def __getattr__(self, name):
+        return getattr(self.env, name)
+
+    def step(self, action, render=False):
+        """
+        Advances the simulation like Simulator.step.
+
+        Args:
+            action: [left, right] wheel velocities.
+            render (bool): Also render the camera observation.
+
+        Returns:
+            (obs, reward, done, info), with obs None unless render is True.
+        """
+        sim = self.sim
+        action = np.clip(action, -1, 1, out=self._action)
+        for _ in range(sim.frame_skip):
+            sim.update_physics(action)
+
+        misc = sim.get_agent_info()
+        d = sim._compute_done_reward()
+        misc['Simulator']['msg'] = d.done_why
+
+        obs = self.render_obs() if render else None
+        return obs, d.reward, d.done, misc
+
+    def render_obs(self):
+        """
+        Renders the camera observation of the current pose, or takes it from
+        the observation cache. Cached frames are read-only.
+        """
+        if self.obs_cache is not None:
+            return self.obs_cache.render(self.sim, self._render_camera)
+        return self._render_camera()
+
+    def _render_camera(self):
+        self.camera_frames += 1
+        return self.renderer(self.sim) if self.renderer is not None else self.sim.render_obs()
+
+    def close(self):
+        if self.obs_cache is not None:
+            print(self.obs_cache.report())
+        self.env.close()
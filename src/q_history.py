@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+import atexit
+import os
+
+import numpy as np
+
+from Q_learning import make_state_index, q_table_to_array
+
+# Fixed size of the .npy header we write, so it can be rewritten in place as
+# the number of rows grows. Must be a multiple of 64.
+HEADER_SIZE = 256
+
+# Row layout of the optional per-update delta log
+DELTA_DTYPE = np.dtype([
+    ('trial', np.int32),
+    ('state', np.int32),
+    ('action', np.int32),
+    ('value', np.float64),
+])
+
+
+def _npy_header(dtype, shape):
+    """
+    Builds a version 1.0 .npy header of exactly HEADER_SIZE bytes.
+    """
+    header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (
+        np.lib.format.dtype_to_descr(dtype), tuple(shape))
+    if len(header) >= HEADER_SIZE - 10:
+        raise ValueError(f"dtype {dtype} needs a larger .npy header than {HEADER_SIZE} bytes")
+    header = header.ljust(HEADER_SIZE - 10 - 1) + '\n'
+    return b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') + header.encode('latin1')
+
+
+class AppendableArray:
+    """
+    A .npy file that grows one row at a time through a memory map.
+
+    Rows are written straight into a preallocated np.memmap; when it is full
+    the file is extended and remapped. The header is rewritten in place after
+    every append (one small write to the file kept open), so it always records
+    the rows appended so far and the file can be opened at any time with
+    np.load(path, mmap_mode='r'), also after a crash. An existing file is
+    appended to. close() is registered with atexit.
+    """
+    def __init__(self, path, row_shape, dtype=np.float64, capacity=1024):
+        """
+        Args:
+            path (str): The .npy file.
+            row_shape (tuple): Shape of one row.
+            dtype: Data type of the array.
+            capacity (int): Number of rows to preallocate (at least 1).
+        """
+        self.path = path
+        self.row_shape = tuple(row_shape)
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+
+        if os.path.exists(path):
+            existing = np.load(path, mmap_mode='r')
+            if existing.shape[1:] != self.row_shape or existing.dtype != self.dtype:
+                raise ValueError(f"{path} holds {existing.dtype} rows of shape {existing.shape[1:]}, "
+                                 f"expected {self.dtype} rows of shape {self.row_shape}")
+            if existing.offset != HEADER_SIZE:
+                raise ValueError(f"{path} was not written by AppendableArray")
+            self.count = existing.shape[0]
+            del existing
+        else:
+            with open(path, 'wb') as f:
+                f.write(_npy_header(self.dtype, (0,) + self.row_shape))
+
+        self.capacity = 0
+        self._map = None
+        self._file = open(path, 'r+b') # Kept open for the header updates
+        self._remap(max(capacity, self.count, 1))
+        atexit.register(self.close)
+
+    def _remap(self, capacity):
+        if self._map is not None:
+            self._map.flush()
+            del self._map
+        row_bytes = self.dtype.itemsize * int(np.prod(self.row_shape))
+        self._file.truncate(HEADER_SIZE + capacity * row_bytes)
+        self._map = np.memmap(self.path, dtype=self.dtype, mode='r+', offset=HEADER_SIZE,
+                              shape=(capacity,) + self.row_shape)
+        self.capacity = capacity
+
+    def append(self, row):
+        """
+        Appends one row and returns its index.
+        """
+        if self.count == self.capacity:
+            self._remap(2 * self.capacity)
+        index = self.count
+        self._map[index] = row
+        self.count += 1
+        self._write_header()
+        return index
+
+    def _write_header(self):
+        self._file.seek(0)
+        self._file.write(_npy_header(self.dtype, (self.count,) + self.row_shape))
+        self._file.flush()
+
+    def flush(self):
+        """
+        Writes mapped data to disk and updates the row count in the header.
+        """
+        self._map.flush()
+        self._write_header()
+
+    def close(self):
+        """
+        Flushes and trims the unused preallocated rows from the file. Safe to
+        call more than once.
+        """
+        if self._map is None:
+            return
+        self.flush()
+        del self._map
+        self._map = None
+        row_bytes = self.dtype.itemsize * int(np.prod(self.row_shape))
+        self._file.truncate(HEADER_SIZE + self.count * row_bytes)
+        self._file.close()
+        atexit.unregister(self.close)
+
+
+class QHistory:
+    """
+    Columnar store of Q-table snapshots, one (n_states, nA) slab per trial.
+
+    Snapshots go to `path` as a (trials, n_states, nA) .npy file, so a whole
+    history loads as a single zero-copy memory map with load_q_history(). The
+    index returned by append() is what the trial log records in place of the
+    Q-table text. With deltas=True every QAgent.update can additionally be
+    recorded as a (trial, state, action, value) row in a delta log next to it
+    (see delta_path).
+    """
+    def __init__(self, path, n_states=12, nA=3, capacity=1024, deltas=False):
+        """
+        Args:
+            path (str): Snapshot file, e.g. '2201-A-0721.q.npy'. Appended to if it exists.
+            n_states (int): Number of states (rows of the dense Q array).
+            nA (int): Number of actions.
+            capacity (int): Number of trials to preallocate.
+            deltas (bool): Also open the delta log for record_update().
+        """
+        self.state_index = make_state_index(3, 4)
+        self.nA = nA
+        self.snapshots = AppendableArray(path, (n_states, nA), capacity=capacity)
+        self.deltas = None
+        if deltas:
+            self.deltas = AppendableArray(delta_path(path), (), dtype=DELTA_DTYPE, capacity=capacity)
+
+    def append(self, Q):
+        """
+        Stores a snapshot of Q (a dense array or a QAgent dict Q-table).
+
+        Returns:
+            The history index of the snapshot.
+        """
+        if isinstance(Q, dict):
+            Q = q_table_to_array(Q, self.state_index, self.nA)
+        return self.snapshots.append(Q)
+
+    def record_update(self, trial, state, action, value):
+        """
+        Records the new value of a single Q cell in the delta log.
+
+        Args:
+            trial (int): Trial the update happened in.
+            state: Integer state id, or a (row, col) state tuple.
+            action (int): Updated action.
+            value (float): New Q value.
+        """
+        if not isinstance(state, (int, np.integer)):
+            state = self.state_index[state]
+        self.deltas.append((trial, state, action, value))
+
+    def flush(self):
+        self.snapshots.flush()
+        if self.deltas is not None:
+            self.deltas.flush()
+
+    def close(self):
+        self.snapshots.close()
+        if self.deltas is not None:
+            self.deltas.close()
+
+
+def delta_path(path):
+    """Path of the delta log belonging to a snapshot file."""
+    return os.path.splitext(path)[0] + '.deltas.npy'
+
+
+def load_q_history(path):
+    """
+    Maps a snapshot file read-only. history[i] is the Q array logged with index i.
+    """
+    return np.load(path, mmap_mode='r')
+
+
+def load_q_deltas(path):
+    """
+    Maps the delta log of a snapshot file read-only, as a structured array
+    with 'trial', 'state', 'action' and 'value' fields.
+    """
+    return np.load(delta_path(path), mmap_mode='r')
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+import itertools
+
+import numpy as np
+
+from Q_learning import DenseQAgent
+
+
+class QPopulation:
+    """
+    K independent Q-learners held as one (K, n_states, nA) tensor.
+
+    Every agent has its own alpha, epsilon and discount factor, and all K agents
+    select actions and apply TD updates in a single vectorized call. The grid
+    rewards, terminal states and tagid transitions are taken from DenseQAgent, so
+    each agent behaves like a QAgent run on its own.
+    """
+    def __init__(self, alphas, epsilons, discount_factors, nA = 3, rng=None):
+        """
+        Args:
+            alphas: Learning rate per agent (array-like of length K, or a scalar).
+            epsilons: Exploration probability per agent (length K, or a scalar).
+            discount_factors: Discount factor per agent (length K, or a scalar).
+            nA: Number of actions.
+            rng: numpy.random.Generator used for all random draws. A fresh
+                 default_rng() is created if not given.
+        """
+        alphas, epsilons, discount_factors = np.broadcast_arrays(
+            np.asarray(alphas, dtype=float),
+            np.asarray(epsilons, dtype=float),
+            np.asarray(discount_factors, dtype=float),
+        )
+        self.alpha = alphas.ravel().copy()
+        self.epsilon = epsilons.ravel().copy()
+        self.discount_factor = discount_factors.ravel().copy()
+        self.K = self.alpha.size
+        self.nA = nA
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        template = DenseQAgent(nA)
+        self.state_index = template.state_index
+        self.rewards = template.rewards
+        self.terminals = template.terminals
+        self.transitions = template.transitions
+        n_states = self.state_index.size
+
+        self.Q = np.zeros((self.K, n_states, nA))
+        self.agents = np.arange(self.K)
+        self.start_states = np.zeros(self.K, dtype=int)
+        self.state_ids = np.zeros(self.K, dtype=int)
+        self.explore = np.zeros(self.K, dtype=bool)
+
+    @classmethod
+    def sweep(cls, alphas, epsilons, discount_factors, repeats=1, nA = 3, rng=None):
+        """
+        Builds a population covering every (alpha, epsilon, discount_factor)
+        combination, each repeated `repeats` times.
+
+        Returns:
+            The population. Its alpha/epsilon/discount_factor vectors give the
+            configuration of each agent.
+        """
+        grid = list(itertools.product(alphas, epsilons, discount_factors)) * repeats
+        a, e, g = zip(*grid)
+        return cls(a, e, g, nA=nA, rng=rng)
+
+    def reset(self):
+        """
+        Starts a new episode for every agent.
+
+        Returns:
+            The start row of each agent, same meaning as QAgent.start_state[0].
+        """
+        self.start_states = self.rng.integers(0, 3, size=self.K)
+        self.state_ids = self.state_index[self.start_states, 0]
+        return self.start_states
+
+    def select_actions(self):
+        """
+        Epsilon-greedy action for every agent, ties between best actions broken
+        uniformly. Sets self.explore to True for agents that took a non-best action.
+        """
+        q = self.Q[self.agents, self.state_ids]
+        best = q == q.max(axis=1, keepdims=True)
+
+        # Random tie-break among the best actions of each agent
+        tie_break = self.rng.random((self.K, self.nA))
+        tie_break[~best] = -1.0
+        greedy = tie_break.argmax(axis=1)
+
+        random_action = self.rng.integers(0, self.nA, size=self.K)
+        actions = np.where(self.rng.random(self.K) < self.epsilon, random_action, greedy)
+        self.explore = ~best[self.agents, actions]
+        return actions
+
+    def step(self, tagids):
+        """
+        Moves every agent according to its tagid.
+
+        Args:
+            tagids: Integer tagid per agent. Anything other than 0-2 behaves like
+                    an unknown tag in QAgent.tagid_to_state.
+
+        Returns:
+            next state ids, rewards and done flags, one per agent.
+        """
+        tagids = np.asarray(tagids)
+        slots = np.where((tagids >= 0) & (tagids <= 2), tagids, 3)
+        next_ids = self.transitions[self.state_ids, slots]
+        self.state_ids = next_ids
+        return next_ids, self.rewards[next_ids], self.terminals[next_ids]
+
+    def update(self, actions, tagids):
+        """
+        One TD update for every agent, same rule as QAgent.update.
+
+        Returns:
+            The reward of each agent.
+        """
+        state_ids = self.state_ids
+        next_ids, rewards, done = self.step(tagids)
+        best_next = self.Q[self.agents, next_ids].max(axis=1)
+        td_target = rewards + self.discount_factor * best_next
+        idx = (self.agents, state_ids, actions)
+        self.Q[idx] += self.alpha * (td_target - self.Q[idx])
+        return rewards
+
+    def agent(self, k):
+        """
+        Returns agent k as a stand-alone DenseQAgent with a copy of its Q-table.
+        """
+        agent = DenseQAgent(self.nA, discount_factor=self.discount_factor[k],
+                            alpha=self.alpha[k], epsilon=self.epsilon[k])
+        agent.Q[:] = self.Q[k]
+        return agent
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+import os
+
+import numpy as np
+
+# Per-step fields besides the observation: name -> (dtype, shape of one entry)
+FIELDS = {
+    'action': (np.float32, (2,)), # Wheel velocities passed to env.step
+    'reward': (np.float32, ()),
+    'done': (np.bool_, ()),
+    'tile': (np.int16, (2,)),     # (row, col) of the robot after the step
+    'tag': (np.int8, ()),         # Signalling tag id of that tile, or NO_TAG
+}
+
+
+def downsampled_shape(obs_shape, downsample):
+    """Shape of an observation after keeping every `downsample`-th row and column."""
+    height, width = obs_shape[:2]
+    return (-(-height // downsample), -(-width // downsample)) + tuple(obs_shape[2:])
+
+
+class ReplayBuffer:
+    """
+    Fixed-size circular buffer of simulator steps (obs, action, reward, done,
+    tile, tag), for training vision-based agents from the frames env.step
+    returns.
+
+    All storage is allocated once, up front: one uint8 array for the
+    observations and one small array per field. add() writes into the next
+    slot in place, so adding a step never allocates, and once `capacity` steps
+    are stored the oldest ones are overwritten. Observations can be
+    downsampled on insert (every `downsample`-th pixel) to bound the memory
+    footprint, see footprint().
+
+    With a `path`, the arrays are .npy files in that directory mapped with
+    np.memmap, so another process can map the same buffer read-only with
+    ReplayBuffer.open(path) while it is being filled.
+    """
+    def __init__(self, capacity=10000, obs_shape=(480, 640, 3), downsample=1, path=None):
+        """
+        Args:
+            capacity (int): Number of steps stored before the oldest are overwritten.
+            obs_shape (tuple): Shape of the observations passed to add().
+            downsample (int): Keep every this many rows and columns of each observation.
+            path (str): Directory for memory-mapped storage, or None for RAM.
+        """
+        self.capacity = capacity
+        self.obs_shape = tuple(obs_shape)
+        self.downsample = downsample
+        self.path = path
+
+        shapes = {'obs': (np.uint8, downsampled_shape(obs_shape, downsample))}
+        shapes.update(FIELDS)
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        self.arrays = {}
+        for name, (dtype, shape) in shapes.items():
+            self.arrays[name] = self._allocate(name, dtype, (capacity,) + shape)
+        # [number of steps stored, next slot to write], shared with readers
+        self.cursor = self._allocate('cursor', np.int64, (2,))
+        self.cursor[:] = 0
+
+    def _allocate(self, name, dtype, shape):
+        if self.path is None:
+            return np.zeros(shape, dtype=dtype)
+        return np.lib.format.open_memmap(os.path.join(self.path, name + '.npy'), mode='w+',
+                                         dtype=dtype, shape=shape)
+
+    @classmethod
+    def open(cls, path, writable=False):
+        """
+        Maps an existing buffer directory (e.g. one being filled by another
+        process) without copying it.
+        """
+        buffer = cls.__new__(cls)
+        mode = 'r+' if writable else 'r'
+        buffer.path = path
+        buffer.cursor = np.load(os.path.join(path, 'cursor.npy'), mmap_mode=mode)
+        buffer.arrays = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode=mode)
+                         for name in ['obs'] + list(FIELDS)}
+        buffer.capacity = len(buffer.arrays['obs'])
+        buffer.obs_shape = buffer.arrays['obs'].shape[1:]
+        buffer.downsample = 1
+        return buffer
+
+    @staticmethod
+    def footprint(capacity=10000, obs_shape=(480, 640, 3), downsample=1):
+        """
+        Bytes of storage a buffer with these parameters allocates.
+        """
+        obs_bytes = int(np.prod(downsampled_shape(obs_shape, downsample)))
+        field_bytes = sum(np.dtype(dtype).itemsize * int(np.prod(shape)) for dtype, shape in FIELDS.values())
+        return capacity * (obs_bytes + field_bytes) + 2 * 8
+
+    @property
+    def nbytes(self):
+        """Bytes of storage allocated by this buffer."""
+        return sum(array.nbytes for array in self.arrays.values()) + self.cursor.nbytes
+
+    def __len__(self):
+        return int(self.cursor[0])
+
+    def add(self, obs, action, reward, done, tile=(-1, -1), tag=-1):
+        """
+        Stores one step in the next slot, overwriting the oldest step when full.
+
+        Returns:
+            The slot index the step was written to.
+        """
+        index = int(self.cursor[1])
+        arrays = self.arrays
+        if self.downsample > 1:
+            obs = obs[::self.downsample, ::self.downsample]
+        arrays['obs'][index] = obs
+        arrays['action'][index] = action
+        arrays['reward'][index] = reward
+        arrays['done'][index] = done
+        arrays['tile'][index] = tile
+        arrays['tag'][index] = tag
+        self.cursor[1] = (index + 1) % self.capacity
+        if self.cursor[0] < self.capacity:
+            self.cursor[0] += 1
+        return index
+
+    def sample_indices(self, batch_size, rng=None):
+        """
+        Draws slot indices of steps that have a stored successor (the most
+        recently written step has none yet).
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        size = len(self)
+        if size < 2:
+            raise ValueError("Need at least two stored steps to sample transitions")
+        # Offsets from the oldest stored step, excluding the newest one
+        oldest = (int(self.cursor[1]) - size) % self.capacity
+        return (oldest + rng.integers(0, size - 1, batch_size)) % self.capacity
+
+    def get(self, indices, out=None):
+        """
+        Gathers the steps at `indices` and their next observations.
+
+        Args:
+            indices (np.ndarray): Slot indices, e.g. from sample_indices().
+            out (dict): Optional preallocated batch arrays (see make_batch()),
+                        filled in place to avoid allocating per batch.
+
+        Returns:
+            A dict with 'obs', 'next_obs' and the FIELDS arrays. 'done' marks
+            steps whose next_obs belongs to a new episode.
+        """
+        if out is None:
+            out = self.make_batch(len(indices))
+        # mode='clip' lets np.take write straight into out; with the default
+        # mode='raise' it goes through a temporary buffer. Indices are valid anyway.
+        for name, array in self.arrays.items():
+            np.take(array, indices, axis=0, out=out[name], mode='clip')
+        np.take(self.arrays['obs'], (indices + 1) % self.capacity, axis=0, out=out['next_obs'], mode='clip')
+        return out
+
+    def sample(self, batch_size, rng=None, out=None):
+        """Samples a random batch of transitions, see get()."""
+        return self.get(self.sample_indices(batch_size, rng), out=out)
+
+    def make_batch(self, batch_size):
+        """Allocates batch arrays for get(out=...) / sample(out=...)."""
+        batch = {name: np.empty((batch_size,) + array.shape[1:], dtype=array.dtype)
+                 for name, array in self.arrays.items()}
+        batch['next_obs'] = np.empty_like(batch['obs'])
+        return batch
+
+    def flush(self):
+        """Writes memory-mapped storage to disk."""
+        for array in list(self.arrays.values()) + [self.cursor]:
+            if isinstance(array, np.memmap):
+                array.flush()
+
+
+if __name__ == "__main__":
+    import time
+
+    for downsample in (1, 2, 4, 8):
+        print(f"10000 steps of 640x480 frames, downsample {downsample}: "
+              f"{ReplayBuffer.footprint(10000, downsample=downsample) / 2**20:.0f} MiB")
+
+    buffer = ReplayBuffer(capacity=2000, downsample=4)
+    obs = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+    start = time.perf_counter()
+    for i in range(5000):
+        buffer.add(obs, (0.3, 0.3), 0.0, i % 500 == 499, (3, 3), 3)
+    added = time.perf_counter()
+    batch = buffer.make_batch(64)
+    for _ in range(1000):
+        buffer.sample(64, out=batch)
+    sampled = time.perf_counter()
+    print(f"add: {(added - start) / 5000 * 1e6:.1f} us/step, "
+          f"sample(64): {(sampled - added) / 1000 * 1e6:.1f} us/batch, {buffer.nbytes / 2**20:.1f} MiB")
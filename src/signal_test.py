@@ -8,11 +8,12 @@ from pyglet import app, clock, window
 import math 
 import os 
 import yaml 
-from PIL import Image # Added for screenshot functionality from the working code
 import sys # Added for sys.exit(0) for clean shutdown
 
 # Import FeedbackWindow from the separate file (assumes feedback_window.py exists)
 from feedback_window import FeedbackWindow 
+from frame_recorder import PNG, FrameRecorder
+from controls import KeyControls
 
 print("Initializing Duckietown Simulator (consolidating reset logic)...")
 
@@ -38,12 +39,14 @@ action = np.array([0.0, 0.0])
 
 # Initialize Pyglet's KeyStateHandler to track continuous key presses.
 key_handler = key.KeyStateHandler()
+controls = KeyControls(key_handler, key) # Driving keys -> wheel action
 
 # MODIFIED: on_key_press - Only handles special keys and defers manual reset
 def on_key_press(symbol, modifiers):
     global manual_reset_pending # Declare global to modify the flag
     
     if symbol == key.ESCAPE:
+        recorder.close() # Write pending frames before exiting
         env.close()
         feedback_win.close()
         sys.exit(0) # Changed app.exit() to sys.exit(0) for cleaner shutdown
@@ -58,6 +61,11 @@ def on_key_press(symbol, modifiers):
         print("RESET (manual key press - pending)")
         manual_reset_pending = True # Set the flag to trigger reset in update loop
     
+    # Start/stop recording the camera frames (written in the background)
+    elif symbol == key.RETURN:
+        recorder.toggle()
+        print(f"Recording {'started: ' + recorder.recording if recorder.recording else 'stopped'}")
+    
     # Pass the event to the key_handler for continuous state tracking of all keys
     key_handler.on_key_press(symbol, modifiers)
 
@@ -108,6 +116,9 @@ env.unwrapped.window.activate()
 # Push both the KeyStateHandler and the individual key event handlers to the simulator's window.
 env.unwrapped.window.push_handlers(key_handler, on_key_press, on_key_release)
 
+# RETURN records numbered PNG frames, encoded by a background thread
+recorder = FrameRecorder('recordings', fmt=PNG)
+
 # ==============================================================================
 # MAIN UPDATE LOOP
 # ==============================================================================
@@ -119,27 +130,15 @@ def update(dt):
     movement/stepping and redrawing
     """
     # control logic for driving
-    local_action = np.array([0.0, 0.0]) 
-
-    if key_handler[key.UP]:
-        local_action += np.array([0.3, 0.3]) # Linear velocity forward
-    if key_handler[key.DOWN]:
-        local_action += np.array([-0.3, -0.3]) # Linear velocity backward
-    if key_handler[key.LEFT]:
-        local_action += np.array([-0.2, 0.2]) # Angular velocity
-    if key_handler[key.RIGHT]:
-        local_action += np.array([0.2, -0.2]) # Angular velocity
-    if key_handler[key.SPACE]:
-        local_action = np.array([0, 0]) # Stop
+    # (UP/DOWN/LEFT/RIGHT/SPACE mask -> row of a precomputed, read-only action table)
+    local_action = controls.action()
 
     # The 'action' array passed to env.step() is now [left_wheel_velocity, right_wheel_velocity]
     action_to_step = local_action 
 
     obs, reward, done, info = env.step(action_to_step) # Pass the calculated action
-    
-    if key_handler[key.RETURN]:
-        im = Image.fromarray(obs)
-        im.save("screen.png")
+
+    recorder.record(obs) # No-op unless a recording is running
 
     # CONSOLIDATED RESET LOGIC:
     # If episode is finished OR manual reset is pending, perform reset
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import heapq
+import os
+import runpy
+
+# Global simulation settings (SIMULATION_SPEED etc.)
+SETTINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'settings.py')
+
+# Clock modes
+REALTIME = 'realtime' # One simulated second per real second
+SCALED = 'scaled'     # `speed` simulated seconds per real second (SIMULATION_SPEED by default)
+FAST = 'fast'         # As fast as possible: simulation steps run back to back
+MODES = (REALTIME, SCALED, FAST)
+
+
+def load_settings(path=SETTINGS_FILE):
+    """
+    Returns the upper-case names defined in config/settings.py as a dict.
+    """
+    return {name: value for name, value in runpy.run_path(path).items() if name.isupper()}
+
+
+class SimClock:
+    """
+    Source of simulated time for the frame loop, the feedback lights and the trial log.
+
+    Simulated time only moves when the simulation steps (advance() is called
+    by the FrameScheduler once per fixed step), so durations measured with
+    time() are in simulated seconds whatever the mode: in REALTIME they match
+    the wall clock, in SCALED they run `speed` times faster, and in FAST the
+    loop does not wait for real time at all.
+
+    Callbacks scheduled with schedule_once() fire when simulated time reaches
+    them, which keeps e.g. the blink length in step with the simulation.
+    """
+    def __init__(self, mode=REALTIME, speed=None):
+        """
+        Args:
+            mode (str): REALTIME, SCALED or FAST.
+            speed (float): Simulated seconds per real second in SCALED mode.
+                           Defaults to SIMULATION_SPEED from config/settings.py.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown clock mode '{mode}', expected one of {MODES}")
+        self.mode = mode
+        if mode == SCALED:
+            self.speed = speed if speed is not None else load_settings()['SIMULATION_SPEED']
+        elif mode == FAST:
+            self.speed = float('inf')
+        else:
+            self.speed = 1.0
+
+        self._now = 0.0
+        self._timers = []   # Heap of (due time, sequence number, func, scheduled time)
+        self._sequence = 0  # Keeps callbacks due at the same time in scheduling order
+
+    def time(self):
+        """Current simulated time, in seconds."""
+        return self._now
+
+    def real_to_sim(self, real_dt):
+        """
+        Converts real seconds into simulated seconds to run. Not meaningful in FAST mode.
+        """
+        return real_dt * self.speed
+
+    def advance(self, dt):
+        """
+        Moves simulated time forward by dt and runs the callbacks that became due,
+        each with the simulated time since it was scheduled (like pyglet.clock).
+        """
+        self._now += dt
+        while self._timers and self._timers[0][0] <= self._now:
+            _, _, func, scheduled = heapq.heappop(self._timers)
+            func(self._now - scheduled)
+
+    def schedule_once(self, func, delay):
+        """Calls func(dt) once, after `delay` simulated seconds."""
+        self._sequence += 1
+        heapq.heappush(self._timers, (self._now + delay, self._sequence, func, self._now))
+
+    def unschedule(self, func):
+        """Removes all pending calls of func."""
+        timers = [timer for timer in self._timers if timer[2] != func]
+        if len(timers) != len(self._timers):
+            heapq.heapify(timers)
+            self._timers = timers
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+import math
+
+from tile_map import NO_TAG, ROLE_JUNCTION, ROLE_NONE, ROLE_TERMINAL
+
+# Events dispatched on tile transitions, with their arguments
+EVENTS = (
+    'on_exit_tile',   # (tile, tag, role) of the tile left
+    'on_enter_tile',  # (tile, tag, role) of the tile entered
+    'on_junction',    # (tile, tag) after on_enter_tile, when the tile is a junction
+    'on_terminal',    # (tile, tag) after on_enter_tile, when the tile is a terminal
+)
+
+
+class TileEvents:
+    """
+    Tracks the tile the robot is on and calls handlers only when it changes.
+
+    update(x, z) is called every frame with the robot position. While the
+    position stays within the bounds of the current tile that is a single
+    chained comparison; on a transition the tile, tag and role are looked up
+    in the TileMap and on_exit_tile, on_enter_tile and (for junction and
+    terminal tiles) on_junction / on_terminal are dispatched, in that order.
+
+    With `max_step`, the largest distance the robot can move in one frame,
+    update() also predicts how many frames the robot needs at least to reach
+    the nearest tile boundary and skips the checks until then.
+
+    Handlers are registered like pyglet event handlers: push_handlers(obj)
+    uses obj's methods named after EVENTS, push_handlers(on_junction=f) a
+    single function.
+    """
+    def __init__(self, tile_map, max_step=None):
+        """
+        Args:
+            tile_map (TileMap): Map to look the tiles up in.
+            max_step (float): Largest distance (m) the robot moves per update(),
+                              or None to check every frame.
+        """
+        self.tile_map = tile_map
+        self.max_step = max_step
+        self.handlers = {name: [] for name in EVENTS}
+
+        self.checks = 0       # update() calls that compared the position
+        self.skipped = 0      # update() calls skipped by the boundary prediction
+        self.transitions = 0
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the current tile (e.g. after the robot was reset), so the next
+        update() enters whatever tile it is on.
+        """
+        self.tile = None
+        self.tag = NO_TAG
+        self.role = ROLE_NONE
+        self._bounds = (math.inf, -math.inf, math.inf, -math.inf) # x0, x1, z0, z1: contains nothing
+        self._skip = 0
+
+    def push_handlers(self, *objects, **handlers):
+        """
+        Adds handlers: the EVENTS methods of each object, and name=function pairs.
+        """
+        for obj in objects:
+            for name in EVENTS:
+                if hasattr(obj, name):
+                    self.handlers[name].append(getattr(obj, name))
+        for name, handler in handlers.items():
+            if name not in self.handlers:
+                raise ValueError(f"Unknown event '{name}', expected one of {EVENTS}")
+            self.handlers[name].append(handler)
+
+    def remove_handlers(self, *objects):
+        """Removes the handlers of objects added with push_handlers()."""
+        for obj in objects:
+            for name in EVENTS:
+                if hasattr(obj, name):
+                    self.handlers[name].remove(getattr(obj, name))
+
+    def update(self, x, z):
+        """
+        Dispatches the events of moving to (x, z), if it is on another tile.
+
+        Returns:
+            True if the robot changed tiles.
+        """
+        if self._skip:
+            self._skip -= 1
+            self.skipped += 1
+            return False
+        self.checks += 1
+        x0, x1, z0, z1 = self._bounds
+        if x0 <= x < x1 and z0 <= z < z1:
+            self._predict(x, z)
+            return False
+
+        row, col, tag, role = self.tile_map.lookup_one(x, z)
+        size = self.tile_map.tile_size
+        self._bounds = (col * size, (col + 1) * size, row * size, (row + 1) * size)
+        if self.tile is not None:
+            self._dispatch('on_exit_tile', self.tile, self.tag, self.role)
+        self.tile, self.tag, self.role = (row, col), tag, role
+        self.transitions += 1
+        self._dispatch('on_enter_tile', self.tile, tag, role)
+        if role == ROLE_JUNCTION:
+            self._dispatch('on_junction', self.tile, tag)
+        elif role == ROLE_TERMINAL:
+            self._dispatch('on_terminal', self.tile, tag)
+        self._predict(x, z)
+        return True
+
+    def _predict(self, x, z):
+        """Sets how many updates can be skipped before the robot can reach a boundary."""
+        if self.max_step:
+            x0, x1, z0, z1 = self._bounds
+            margin = min(x - x0, x1 - x, z - z0, z1 - z)
+            self._skip = max(0, int(margin / self.max_step - 1e-9))
+
+    def _dispatch(self, name, *args):
+        for handler in self.handlers[name]:
+            handler(*args)
+
+    def stats(self):
+        """Returns the check, skip and transition counters as a dict."""
+        return {'checks': self.checks, 'skipped': self.skipped, 'transitions': self.transitions}
+
+
+if __name__ == "__main__":
+    import time
+
+    from headless_env import HeadlessEnv
+    from map_cache import load_map
+
+    tile_map = load_map(verbose=False)
+    for max_step in (None, 1.2 / 30):
+        env = HeadlessEnv(tile_map=tile_map, seed=0)
+        env.reset()
+        events = TileEvents(tile_map, max_step=max_step)
+        events.push_handlers(on_junction=lambda tile, tag: print(f"  junction {tile}"),
+                             on_terminal=lambda tile, tag: print(f"  terminal {tile}, tag {tag}"))
+        n = 0
+        elapsed = 0.0
+        done = False
+        while not done:
+            _, _, done, _ = env.step((0.5, 0.5))
+            x, _, z = env.cur_pos
+            start = time.perf_counter()
+            events.update(x, z)
+            elapsed += time.perf_counter() - start
+            n += 1
+        print(f"max_step {max_step}: {elapsed / n * 1e6:.2f} us/frame over {n} frames, {events.stats()}")
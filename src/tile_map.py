@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+import os
+
+import numpy as np
+
+# Default map of the signalling experiments
+PLUS_MAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maps', 'plus_map.yaml')
+
+# Integer codes of the tile kinds in a Duckietown map
+TILE_KINDS = ['empty', 'grass', 'floor', 'asphalt', 'straight', 'curve_left', 'curve_right',
+              '3way_left', '3way_right', '4way']
+
+# Integer codes of the tile orientations ('straight/S' etc.), -1 for none
+ORIENTATIONS = ['N', 'E', 'S', 'W']
+
+# Tile kinds a robot can drive on
+ROAD_KINDS = ['straight', 'curve_left', 'curve_right', '3way_left', '3way_right', '4way']
+
+# Integer codes of the object kinds in a Duckietown map. Other kinds (e.g. the
+# many sign_* kinds) are compiled to OBJECT_OTHER.
+OBJECT_KINDS = ['tree', 'house', 'duckie', 'duckiebot', 'cone', 'barrier', 'building', 'bus',
+                'truck', 'sign_stop', 'sign_yield', 'trafficlight', 'other']
+OBJECT_OTHER = OBJECT_KINDS.index('other')
+
+# One row per map object, positions in tile units as in the map file
+OBJECT_DTYPE = np.dtype([
+    ('kind', np.int8),
+    ('x', np.float32),
+    ('z', np.float32),
+    ('rotate', np.float32),
+    ('height', np.float32),
+])
+
+# Roles of tiles in the signalling task
+ROLE_NONE = 0
+ROLE_JUNCTION = 1
+ROLE_TERMINAL = 2
+ROLES = {'junction': ROLE_JUNCTION, 'terminal': ROLE_TERMINAL}
+
+NO_TAG = -1
+
+
+class TileMap:
+    """
+    A map YAML compiled into integer NumPy grids.
+
+    Grids are indexed [row, col], with row = int(z / tile_size) and
+    col = int(x / tile_size) as in learning_test.py:
+
+    - kind: index into TILE_KINDS
+    - orientation: index into ORIENTATIONS, or -1
+    - tag: signalling tag id of the tile, or NO_TAG
+    - role: ROLE_NONE, ROLE_JUNCTION or ROLE_TERMINAL
+    - drivable: True for road tiles (ROAD_KINDS)
+
+    Tags and roles come from the `signal_tags` section of the map file. Map
+    objects are kept as an OBJECT_DTYPE structured array (`objects`).
+
+    `start_tile` and `start_pose` are kept as in the map file, i.e. in the
+    simulator's conventions: start_tile is [col, row] (gym_duckietown's
+    (i, j) tile coordinates) and start_pose is [[x, y, z], angle] with x and
+    z relative to the corner of the start tile.
+    """
+    def __init__(self, kind, orientation, tag, role, tile_size, start_tile=None, objects=None,
+                 start_pose=None):
+        self.kind = kind
+        self.orientation = orientation
+        self.tag = tag
+        self.role = role
+        self.tile_size = tile_size
+        self.start_tile = start_tile
+        self.start_pose = start_pose
+        self.objects = objects if objects is not None else np.zeros(0, dtype=OBJECT_DTYPE)
+        self.shape = kind.shape
+        self.drivable = np.isin(kind, [TILE_KINDS.index(k) for k in ROAD_KINDS])
+
+        # Nested-list copies for the scalar lookup_one path
+        self._tag_rows = tag.tolist()
+        self._role_rows = role.tolist()
+
+    def lookup(self, x, z):
+        """
+        Resolves world positions to tiles.
+
+        Args:
+            x, z: Position(s) in world coordinates, scalars or arrays of the same
+                  shape (e.g. the cur_pos of thousands of robots).
+
+        Returns:
+            (row, col, tag, role), each with the shape of x. Positions outside
+            the map get NO_TAG and ROLE_NONE.
+        """
+        row = np.floor_divide(z, self.tile_size).astype(np.int64)
+        col = np.floor_divide(x, self.tile_size).astype(np.int64)
+        inside = (row >= 0) & (row < self.shape[0]) & (col >= 0) & (col < self.shape[1])
+        r = np.where(inside, row, 0)
+        c = np.where(inside, col, 0)
+        tag = np.where(inside, self.tag[r, c], NO_TAG)
+        role = np.where(inside, self.role[r, c], ROLE_NONE)
+        return row, col, tag, role
+
+    def lookup_one(self, x, z):
+        """
+        Scalar version of lookup() for a single robot, returning Python ints.
+        Much cheaper than lookup() when called once per frame.
+        """
+        row = int(z // self.tile_size)
+        col = int(x // self.tile_size)
+        if 0 <= row < self.shape[0] and 0 <= col < self.shape[1]:
+            return row, col, self._tag_rows[row][col], self._role_rows[row][col]
+        return row, col, NO_TAG, ROLE_NONE
+
+    def tiles_with_role(self, role):
+        """Returns the (row, col) tiles that have the given role."""
+        return [tuple(int(i) for i in tile) for tile in np.argwhere(self.role == role)]
+
+    def tile_of_tag(self, tag):
+        """Returns the (row, col) tile carrying the given tag id."""
+        row, col = np.argwhere(self.tag == tag)[0]
+        return int(row), int(col)
+
+    def terminal_tiles(self):
+        """Returns a dict tag id -> (row, col) of the terminal tiles."""
+        return {int(self.tag[tile]): tile for tile in self.tiles_with_role(ROLE_TERMINAL)}
+
+
+def parse_tile(name):
+    """
+    Splits a tile name such as 'straight/S' into (kind code, orientation code).
+    """
+    kind, _, orientation = name.partition('/')
+    if kind not in TILE_KINDS:
+        raise ValueError(f"Unknown tile kind '{kind}'")
+    return TILE_KINDS.index(kind), ORIENTATIONS.index(orientation) if orientation else -1
+
+
+def compile_map(path=PLUS_MAP):
+    """
+    Reads a map YAML (`tiles`, `tile_size`, `start_tile`, `start_pose`, `objects`
+    and `signal_tags`) into a TileMap.
+    """
+    import yaml
+
+    with open(path) as f:
+        map_data = yaml.safe_load(f)
+    return compile_map_data(map_data)
+
+
+def compile_map_data(map_data):
+    """
+    Same as compile_map, for an already parsed map dict.
+    """
+    tiles = map_data['tiles']
+    n_rows, n_cols = len(tiles), len(tiles[0])
+    kind = np.zeros((n_rows, n_cols), dtype=np.int8)
+    orientation = np.full((n_rows, n_cols), -1, dtype=np.int8)
+    for i, row in enumerate(tiles):
+        if len(row) != n_cols:
+            raise ValueError(f"Map row {i} has {len(row)} tiles, expected {n_cols}")
+        for j, name in enumerate(row):
+            kind[i, j], orientation[i, j] = parse_tile(name)
+
+    tag = np.full((n_rows, n_cols), NO_TAG, dtype=np.int8)
+    role = np.full((n_rows, n_cols), ROLE_NONE, dtype=np.int8)
+    for entry in map_data.get('signal_tags', []):
+        row, col = entry['tile']
+        tag[row, col] = entry['tag_id']
+        role[row, col] = ROLES[entry['role']]
+
+    objects = np.zeros(len(map_data.get('objects') or []), dtype=OBJECT_DTYPE)
+    for i, obj in enumerate(map_data.get('objects') or []):
+        code = OBJECT_KINDS.index(obj['kind']) if obj['kind'] in OBJECT_KINDS else OBJECT_OTHER
+        objects[i] = (code, obj['pos'][0], obj['pos'][1],
+                      obj.get('rotate', 0), obj.get('height', 0) or 0)
+
+    return TileMap(kind, orientation, tag, role, float(map_data['tile_size']),
+                   start_tile=map_data.get('start_tile'), objects=objects,
+                   start_pose=map_data.get('start_pose'))
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+import numpy as np
+
+from tile_map import OBJECT_KINDS, TILE_KINDS
+
+# RGB colours of the static layer
+TILE_COLORS = {
+    'empty': (0, 0, 0),
+    'grass': (76, 140, 60),
+    'floor': (150, 150, 150),
+    'asphalt': (90, 90, 90),
+}
+ROAD_COLOR = (60, 60, 64)
+LANE_COLOR = (230, 200, 40)     # Yellow centre line
+EDGE_COLOR = (235, 235, 235)    # White road edge
+OBJECT_COLORS = {'tree': (30, 90, 30), 'duckie': (250, 220, 0), 'duckiebot': (200, 40, 40),
+                 'cone': (255, 120, 0), 'house': (150, 90, 50), 'building': (130, 130, 140)}
+OBJECT_COLOR = (110, 110, 110)  # Other object kinds
+
+# Highlight colours of the signalling tiles
+JUNCTION_COLOR = (255, 255, 255)
+REWARD_COLORS = {1: (0, 255, 0), -1: (255, 0, 0), 0: (255, 255, 255)}
+
+ROBOT_COLOR = (220, 40, 40)
+HEADING_COLOR = (255, 255, 255)
+
+# Unit steps (drow, dcol) to the north, east, south and west neighbours
+NEIGHBOURS = ((-1, 0), (0, 1), (1, 0), (0, -1))
+
+
+def _tile_layer(tile_map, pixels_per_tile):
+    """
+    Rasterizes the tiles: ground colours, and on road tiles the road with a
+    white edge and a yellow centre line joining the sides that connect to
+    neighbouring road tiles (an arc around the shared corner for curves).
+    """
+    n = pixels_per_tile
+    rows, cols = tile_map.shape
+    image = np.zeros((rows * n, cols * n, 3), dtype=np.uint8)
+
+    # Pixel centres within a tile, in tile units: v down (z), u right (x)
+    v, u = (np.mgrid[0:n, 0:n] + 0.5) / n
+    line = max(1.0, n / 32) / n # Half width of the painted lines
+    edge = 0.06                 # Road edge inset
+
+    for row in range(rows):
+        for col in range(cols):
+            tile = image[row * n:(row + 1) * n, col * n:(col + 1) * n]
+            if not tile_map.drivable[row, col]:
+                tile[:] = TILE_COLORS.get(TILE_KINDS[tile_map.kind[row, col]], TILE_COLORS['empty'])
+                continue
+
+            connected = [0 <= row + dr < rows and 0 <= col + dc < cols and tile_map.drivable[row + dr, col + dc]
+                         for dr, dc in NEIGHBOURS]
+            # Road edges on the sides without a connection
+            tile[:] = ROAD_COLOR
+            sides = (v < edge, u > 1 - edge, v > 1 - edge, u < edge)
+            for side, is_connected in zip(sides, connected):
+                if not is_connected:
+                    tile[side] = EDGE_COLOR
+
+            north, east, south, west = connected
+            if sum(connected) == 2 and not (north and south) and not (east and west):
+                # Curve: quarter circle of radius 1/2 around the corner between the two sides
+                cu = 1.0 if east else 0.0
+                cv = 0.0 if north else 1.0
+                lane = np.abs(np.hypot(u - cu, v - cv) - 0.5) < line
+            else:
+                # Straight lines from the centre to every connected side
+                lane = np.zeros((n, n), dtype=bool)
+                vertical = np.abs(u - 0.5) < line
+                horizontal = np.abs(v - 0.5) < line
+                if north:
+                    lane |= vertical & (v <= 0.5 + line)
+                if south:
+                    lane |= vertical & (v >= 0.5 - line)
+                if east:
+                    lane |= horizontal & (u >= 0.5 - line)
+                if west:
+                    lane |= horizontal & (u <= 0.5 + line)
+            tile[lane] = LANE_COLOR
+    return image
+
+
+def _draw_objects(image, tile_map, pixels_per_tile):
+    """Draws the map objects as discs at their positions (in tile units)."""
+    n = pixels_per_tile
+    height, width = image.shape[:2]
+    radius = max(1.0, 0.15 * n)
+    for obj in tile_map.objects:
+        color = OBJECT_COLORS.get(OBJECT_KINDS[obj['kind']], OBJECT_COLOR)
+        cx, cy = obj['x'] * n, obj['z'] * n
+        r0, r1 = int(max(0, cy - radius)), int(min(height, cy + radius + 1))
+        c0, c1 = int(max(0, cx - radius)), int(min(width, cx + radius + 1))
+        yy, xx = np.mgrid[r0:r1, c0:c1] + 0.5
+        image[r0:r1, c0:c1][np.hypot(yy - cy, xx - cx) <= radius] = color
+
+
+def _disc_offsets(radius):
+    """(drow, dcol) pixel offsets of a filled disc."""
+    r = int(np.ceil(radius))
+    dy, dx = np.mgrid[-r:r + 1, -r:r + 1]
+    inside = dy ** 2 + dx ** 2 <= radius ** 2
+    return dy[inside], dx[inside]
+
+
+class TopDownRenderer:
+    """
+    Pure NumPy top-down view of a compiled map, for runs without a GL context
+    (headless runs, remote machines, thumbnails, videos of vectorized fleets).
+
+    The static layer (tiles, road markings and map objects) is rasterized
+    once, in __init__. render() copies it into a reused frame buffer and only
+    draws what changes per frame: tile highlights (e.g. the junction while a
+    signal is active, a terminal in the colour of its reward) and the robots,
+    as discs with a heading mark, all robots at once with fancy indexing.
+
+    An instance is also a HeadlessEnv renderer: renderer(env) draws env's pose.
+    """
+    def __init__(self, tile_map=None, pixels_per_tile=16, robot_radius=0.2):
+        """
+        Args:
+            tile_map (TileMap): Map to draw. Defaults to the (cached) plus map.
+            pixels_per_tile (int): Resolution; the frame is shape * pixels_per_tile.
+            robot_radius (float): Robot disc radius, in tiles.
+        """
+        if tile_map is None:
+            from map_cache import load_map
+            tile_map = load_map(verbose=False)
+        self.tile_map = tile_map
+        self.pixels_per_tile = pixels_per_tile
+        self.scale = pixels_per_tile / tile_map.tile_size # Pixels per metre
+
+        self.static = _tile_layer(tile_map, pixels_per_tile)
+        _draw_objects(self.static, tile_map, pixels_per_tile)
+        self.static.flags.writeable = False
+        self.frame = np.empty_like(self.static)
+        self.shape = self.static.shape
+
+        self.robot_offsets = _disc_offsets(max(1.0, robot_radius * pixels_per_tile))
+        # Heading mark: pixels from the centre to the edge of the disc
+        self.heading_steps = np.arange(1, max(2, int(robot_radius * pixels_per_tile) + 1))
+        self.highlights = [] # (tile, color) pairs drawn by __call__
+
+    def highlight(self, frame, tile, color):
+        """Blends `color` 50/50 into the pixels of a (row, col) tile of `frame`."""
+        n = self.pixels_per_tile
+        row, col = tile
+        if not (0 <= row < self.tile_map.shape[0] and 0 <= col < self.tile_map.shape[1]):
+            return
+        region = frame[row * n:(row + 1) * n, col * n:(col + 1) * n]
+        region >>= 1
+        region += np.asarray(color, dtype=np.uint8) >> 1
+
+    def render(self, poses, highlights=(), colors=None, out=None):
+        """
+        Draws one frame.
+
+        Args:
+            poses (array): (N, 3) robot poses (x, z, angle), e.g. SubprocVecEnv.poses,
+                           or a single (x, z, angle).
+            highlights: (tile, color) pairs of tiles to highlight.
+            colors (array): (N, 3) uint8 robot colours, or None for ROBOT_COLOR.
+            out (np.ndarray): Frame to draw into. Defaults to a buffer reused by
+                              every call (copy it to keep it).
+
+        Returns:
+            The (rows * pixels_per_tile, cols * pixels_per_tile, 3) uint8 frame.
+        """
+        frame = self.frame if out is None else out
+        np.copyto(frame, self.static)
+        for tile, color in highlights:
+            self.highlight(frame, tile, color)
+
+        poses = np.asarray(poses, dtype=np.float64).reshape(-1, 3)
+        if not len(poses):
+            return frame
+        height, width = frame.shape[:2]
+        x = poses[:, 0] * self.scale
+        y = poses[:, 1] * self.scale
+        angle = poses[:, 2]
+
+        # Bodies: every disc offset around every robot centre
+        dy, dx = self.robot_offsets
+        rows = (y[:, None] + dy).astype(np.intp)
+        cols = (x[:, None] + dx).astype(np.intp)
+        inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+        body_colors = ROBOT_COLOR if colors is None else np.repeat(np.asarray(colors, np.uint8),
+                                                                   inside.sum(axis=1), axis=0)
+        frame[rows[inside], cols[inside]] = body_colors
+
+        # Headings: direction vector (cos a, -sin a) in (x, z), see get_dir_vec
+        steps = self.heading_steps
+        rows = (y[:, None] - np.sin(angle)[:, None] * steps).astype(np.intp)
+        cols = (x[:, None] + np.cos(angle)[:, None] * steps).astype(np.intp)
+        inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+        frame[rows[inside], cols[inside]] = HEADING_COLOR
+        return frame
+
+    def __call__(self, env):
+        """
+        Renders the pose of a (Headless)Env with the current `highlights`, for
+        HeadlessEnv(renderer=...).
+        """
+        sim = env.unwrapped
+        return self.render((sim.cur_pos[0], sim.cur_pos[2], sim.cur_angle), self.highlights)
+
+
+if __name__ == "__main__":
+    import time
+
+    from map_cache import load_map
+    from tile_map import ROLE_JUNCTION, ROLE_TERMINAL
+
+    tile_map = load_map(verbose=False)
+    junction = tile_map.tiles_with_role(ROLE_JUNCTION)[0]
+    terminal = tile_map.tiles_with_role(ROLE_TERMINAL)[0]
+    rng = np.random.default_rng(0)
+    for pixels_per_tile in (8, 16, 32):
+        start = time.perf_counter()
+        renderer = TopDownRenderer(tile_map, pixels_per_tile)
+        built = time.perf_counter() - start
+        for n_robots in (1, 100, 1000):
+            extent = np.array(tile_map.shape[::-1]) * tile_map.tile_size
+            poses = np.column_stack((rng.uniform(0, extent[0], n_robots), rng.uniform(0, extent[1], n_robots),
+                                     rng.uniform(-np.pi, np.pi, n_robots)))
+            highlights = [(junction, JUNCTION_COLOR), (terminal, REWARD_COLORS[1])]
+            n_frames = 500
+            start = time.perf_counter()
+            for _ in range(n_frames):
+                frame = renderer.render(poses, highlights)
+            elapsed = time.perf_counter() - start
+            print(f"{frame.shape[1]}x{frame.shape[0]} ({pixels_per_tile} px/tile, static layer "
+                  f"{built * 1000:.1f} ms), {n_robots} robots: {n_frames / elapsed:.0f} frames/s")
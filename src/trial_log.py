@@ -0,0 +1,173 @@
+# trial_log.py
+
+import atexit
+import copy
+import csv
+import os
+import queue
+import threading
+import time
+
+# Header of the per-trial CSV log.
+# Make sure these strings exactly match your desired column names
+CSV_HEADER = [
+    'Trial Number',
+    'Total Time',
+    'Time from Signal to Termination',
+    'Action Taken',
+    'Type of Action', # This might be 'Explore', 'Exploit' or 'Fixed'
+    'Termination Location',
+    'Termination Reward',
+    'Q History Index' # Row of the Q-table snapshot in the QHistory file
+]
+
+
+def log_single_row(filepath, data_row, header=None):
+    """
+    Logs a single row of data to a CSV file.
+    If the file doesn't exist, it creates it and writes the header (if provided).
+    """
+    file_exists = os.path.exists(filepath)
+
+    with open(filepath, 'a', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+
+        if not file_exists and header:
+            writer.writerow(header) # Write header only if file is new
+
+        writer.writerow(data_row)
+
+
+class TrialLogger:
+    """
+    Buffered CSV logger that writes rows from a background thread.
+
+    The file is opened once and kept open. log() only copies the row onto a
+    queue, so it never blocks the caller (e.g. the pyglet update callback) on
+    disk I/O. The writer thread flushes queued rows in batches, when
+    `batch_size` rows are pending or `flush_interval` seconds after the oldest
+    pending row, whichever comes first. Pending rows are always written on
+    close(), which is also registered with atexit so sys.exit() flushes the log.
+    """
+    _STOP = object()
+
+    def __init__(self, filepath, header=None, batch_size=16, flush_interval=1.0):
+        """
+        Args:
+            filepath (str): CSV file to append to.
+            header (list): Written first if the file does not exist yet.
+            batch_size (int): Number of pending rows that triggers a flush.
+            flush_interval (float): Maximum time (in seconds) a row waits before being flushed.
+        """
+        self.filepath = filepath
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        file_exists = os.path.exists(filepath)
+        self._file = open(filepath, 'a', newline='')
+        self._writer = csv.writer(self._file)
+        if not file_exists and header:
+            self._writer.writerow(header) # Write header only if file is new
+            self._file.flush()
+
+        self.rows_written = 0
+        self.flushes = 0
+        self.last_flush_latency = 0.0  # Seconds spent in the most recent flush
+        self.max_flush_latency = 0.0   # Longest flush so far
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='TrialLogger', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, data_row):
+        """
+        Queues one row for writing. The row is copied, so later changes to
+        mutable values in it (e.g. the Q-table) do not affect what is logged.
+
+        Raises:
+            ValueError: If the logger is closed, so the row would be lost.
+        """
+        if self._closed:
+            raise ValueError(f"Trial log {self.filepath} is closed; row {data_row} was not logged")
+        self._queue.put(copy.deepcopy(data_row))
+
+    def flush(self):
+        """
+        Blocks until every row queued so far has been written to disk. Returns
+        immediately after close(), which already wrote every row.
+        """
+        if self._closed or not self._thread.is_alive():
+            return # No writer thread left to wait for
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        """
+        Writes all pending rows, stops the writer thread and closes the file.
+        Safe to call more than once.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self._file.close()
+        atexit.unregister(self.close)
+
+    @property
+    def queue_depth(self):
+        """Number of rows waiting to be picked up by the writer thread."""
+        return self._queue.qsize()
+
+    def stats(self):
+        """
+        Returns the current queue depth and flush statistics as a dict.
+        """
+        return {
+            'queue_depth': self.queue_depth,
+            'rows_written': self.rows_written,
+            'flushes': self.flushes,
+            'last_flush_latency': self.last_flush_latency,
+            'max_flush_latency': self.max_flush_latency,
+        }
+
+    def _run(self):
+        pending = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is self._STOP:
+                self._write(pending)
+                return
+            elif isinstance(item, threading.Event):
+                self._write(pending)
+                pending, deadline = [], None
+                item.set()
+                continue
+            elif item is not None:
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if len(pending) >= self.batch_size or (pending and time.monotonic() >= deadline):
+                self._write(pending)
+                pending, deadline = [], None
+
+    def _write(self, rows):
+        if not rows:
+            return
+        start = time.perf_counter()
+        self._writer.writerows(rows)
+        self._file.flush()
+        self.last_flush_latency = time.perf_counter() - start
+        self.max_flush_latency = max(self.max_flush_latency, self.last_flush_latency)
+        self.rows_written += len(rows)
+        self.flushes += 1
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+import functools
+import multiprocessing
+
+import numpy as np
+
+# Per-environment pose written by the workers next to the observation
+POSE_FIELDS = ('x', 'z', 'angle')
+
+
+def make_headless_env(seed, **kwargs):
+    """Environment factory for SubprocVecEnv: a HeadlessEnv (no GL context)."""
+    from headless_env import HeadlessEnv
+    return HeadlessEnv(seed=seed, **kwargs)
+
+
+def make_simulator(seed, **kwargs):
+    """Environment factory for SubprocVecEnv: a gym_duckietown Simulator on the plus map."""
+    from gym_duckietown.simulator import Simulator
+    options = dict(map_name="plus_map", max_steps=10000, camera_width=640, camera_height=480,
+                   full_transparency=False, distortion=False, domain_rand=0, frame_skip=1,
+                   camera_rand=False, dynamics_rand=False)
+    options.update(kwargs)
+    return Simulator(seed=seed, **options)
+
+
+def _shared_array(ctx, dtype, shape):
+    """Allocates a process-shared buffer and returns (raw buffer, NumPy view of it)."""
+    dtype = np.dtype(dtype)
+    raw = ctx.RawArray('b', max(1, int(np.prod(shape)) * dtype.itemsize))
+    return raw, np.frombuffer(raw, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+
+def _worker(index, env_fn, conn, buffers, obs_shape):
+    """
+    Worker process loop: steps one environment, reading its action from and
+    writing its observation, reward, done flag and pose into the shared arrays.
+    Only the command and (on episode ends) a small info dict go through the pipe.
+    """
+    obs = np.frombuffer(buffers['obs'], dtype=np.uint8).reshape((-1,) + obs_shape)[index]
+    actions = np.frombuffer(buffers['actions'], dtype=np.float32).reshape(-1, 2)
+    rewards = np.frombuffer(buffers['rewards'], dtype=np.float32)
+    dones = np.frombuffer(buffers['dones'], dtype=np.bool_)
+    poses = np.frombuffer(buffers['poses'], dtype=np.float64).reshape(-1, len(POSE_FIELDS))
+
+    env = env_fn()
+    episode_steps = 0
+    try:
+        while True:
+            command = conn.recv()
+            if command == 'step':
+                frame, reward, done, info = env.step(actions[index])
+                episode_steps += 1
+                if done:
+                    # Auto-reset: obs holds the first frame of the next episode
+                    info = dict(info, episode_steps=episode_steps)
+                    final_pose = _pose(env)
+                    frame = env.reset()
+                    episode_steps = 0
+                    info['final_pose'] = final_pose
+                obs[...] = frame
+                rewards[index] = reward
+                dones[index] = done
+                poses[index] = _pose(env)
+                conn.send(info if done else None)
+            elif command == 'reset':
+                obs[...] = env.reset()
+                episode_steps = 0
+                poses[index] = _pose(env)
+                conn.send(None)
+            elif command == 'close':
+                break
+    finally:
+        env.close()
+        conn.close()
+
+
+def _pose(env):
+    x, _, z = env.unwrapped.cur_pos
+    return (x, z, env.unwrapped.cur_angle)
+
+
+class SubprocVecEnv:
+    """
+    Runs N environments in worker processes and steps them as a batch.
+
+    Actions, observations, rewards, done flags and poses live in shared memory
+    (multiprocessing.RawArray viewed as NumPy arrays), so frames are never
+    pickled: step() writes the actions, tells every worker to step, and waits
+    for all of them; each worker writes its results straight into its slot.
+    Environments whose episode ended are reset automatically; their info has
+    the reason, episode_steps and final_pose of the finished episode.
+
+    The arrays returned by step() and reset() are views of the shared memory
+    and are overwritten by the next call; copy them to keep them.
+    """
+    def __init__(self, env_fns, obs_shape=(480, 640, 3), start_method='spawn'):
+        """
+        Args:
+            env_fns (list): One picklable, argument-less environment factory per
+                            worker, e.g. functools.partial(make_simulator, seed).
+            obs_shape (tuple): Shape of the uint8 observations the environments return.
+            start_method (str): multiprocessing start method. 'spawn' keeps GL
+                                contexts and other state out of the workers.
+        """
+        ctx = multiprocessing.get_context(start_method)
+        self.num_envs = len(env_fns)
+        self.obs_shape = tuple(obs_shape)
+        n = self.num_envs
+
+        buffers = {}
+        buffers['obs'], self.obs = _shared_array(ctx, np.uint8, (n,) + self.obs_shape)
+        buffers['actions'], self.actions = _shared_array(ctx, np.float32, (n, 2))
+        buffers['rewards'], self.rewards = _shared_array(ctx, np.float32, (n,))
+        buffers['dones'], self.dones = _shared_array(ctx, np.bool_, (n,))
+        buffers['poses'], self.poses = _shared_array(ctx, np.float64, (n, len(POSE_FIELDS)))
+
+        self.conns = []
+        self.processes = []
+        for index, env_fn in enumerate(env_fns):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=_worker, args=(index, env_fn, child_conn, buffers, self.obs_shape),
+                                  daemon=True)
+            process.start()
+            child_conn.close()
+            self.conns.append(parent_conn)
+            self.processes.append(process)
+        self.closed = False
+
+    @classmethod
+    def headless(cls, num_envs, seed=0, **kwargs):
+        """N HeadlessEnv workers with seeds seed, seed + 1, ..."""
+        obs_shape = kwargs.get('obs_shape', (480, 640, 3))
+        return cls([functools.partial(make_headless_env, seed + i, **kwargs) for i in range(num_envs)],
+                   obs_shape=obs_shape)
+
+    def reset(self):
+        """
+        Resets all environments.
+
+        Returns:
+            The (N, *obs_shape) shared observation array.
+        """
+        for conn in self.conns:
+            conn.send('reset')
+        for conn in self.conns:
+            conn.recv()
+        return self.obs
+
+    def step(self, actions):
+        """
+        Steps all environments with an (N, 2) array of wheel velocities.
+
+        Returns:
+            (obs, rewards, dones, infos): the shared (N, *obs_shape), (N,) and (N,)
+            arrays, and a list with an info dict for each environment whose
+            episode ended (None for the others).
+        """
+        self.actions[:] = actions
+        for conn in self.conns:
+            conn.send('step')
+        infos = [conn.recv() for conn in self.conns]
+        return self.obs, self.rewards, self.dones, infos
+
+    def close(self):
+        """Stops the workers. Safe to call more than once."""
+        if self.closed:
+            return
+        self.closed = True
+        for conn in self.conns:
+            try:
+                conn.send('close')
+            except (BrokenPipeError, EOFError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+if __name__ == "__main__":
+    import time
+
+    obs_shape = (120, 160, 3)
+    rng = np.random.default_rng(0)
+    for num_envs in (1, 2, 4):
+        vec_env = SubprocVecEnv.headless(num_envs, obs_shape=obs_shape)
+        vec_env.reset()
+        n_steps = 2000
+        start = time.perf_counter()
+        for _ in range(n_steps):
+            obs, rewards, dones, infos = vec_env.step(rng.uniform(0.2, 0.4, (num_envs, 2)))
+        elapsed = time.perf_counter() - start
+        print(f"{num_envs} workers: {num_envs * n_steps / elapsed:.0f} env steps/s, "
+              f"poses {np.round(vec_env.poses[:2], 2).tolist()}")
+        vec_env.close()
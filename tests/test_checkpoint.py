@@ -0,0 +1,137 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from checkpoint import Checkpointer, journal_path, load_checkpoint, read_header
+from Q_learning import DenseQAgent, QAgent, make_state_index, q_table_to_array
+
+
+def make_agent(dense=False):
+    cls = DenseQAgent if dense else QAgent
+    return cls(epsilon=0.2, rng=random.Random(0), np_rng=np.random.default_rng(0))
+
+
+def train(agent, episodes, rng):
+    """A few random updates per episode, so each save changes only some Q rows."""
+    for _ in range(episodes):
+        agent.reset()
+        for _ in range(2):
+            agent.update(int(rng.integers(3)), int(rng.integers(-1, 4)))
+        agent.prev_episodes += 1
+
+
+def dense_Q(agent):
+    if isinstance(agent.Q, dict):
+        return q_table_to_array(agent.Q, make_state_index(3, 4), agent.nA)
+    return np.asarray(agent.Q)
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_journal_round_trip(tmp_path, background):
+    path = str(tmp_path / 'learner.qckpt')
+    agent = make_agent()
+    checkpointer = Checkpointer(path, compact_every=100, background=background)
+    rng = np.random.default_rng(1)
+    for _ in range(5):
+        train(agent, 3, rng)
+        agent.epsilon *= 0.9
+        checkpointer.save(agent)
+    checkpointer.close()
+
+    assert os.path.exists(journal_path(path)) # One full checkpoint, then four journal records
+    state = load_checkpoint(path)
+    np.testing.assert_array_equal(state['Q'], dense_Q(agent))
+    assert state['episode'] == agent.prev_episodes == 15
+    assert state['epsilon'] == agent.epsilon
+
+
+def test_compaction(tmp_path):
+    path = str(tmp_path / 'learner.qckpt')
+    agent = make_agent()
+    checkpointer = Checkpointer(path, compact_every=3)
+    rng = np.random.default_rng(2)
+    generations = []
+    for _ in range(8):
+        train(agent, 1, rng)
+        checkpointer.save(agent)
+        generations.append(checkpointer.generation)
+    # Full saves 0 and 4, each followed by 3 incremental ones
+    assert len(set(generations)) == 2
+    assert generations[:4] == [generations[0]] * 4
+    assert read_header(path)['generation'] == generations[-1]
+    np.testing.assert_array_equal(load_checkpoint(path)['Q'], dense_Q(agent))
+
+
+def test_torn_journal_record_is_ignored(tmp_path):
+    path = str(tmp_path / 'learner.qckpt')
+    agent = make_agent()
+    checkpointer = Checkpointer(path)
+    rng = np.random.default_rng(3)
+    train(agent, 2, rng)
+    checkpointer.save(agent)
+    train(agent, 2, rng)
+    checkpointer.save(agent)
+    saved = dense_Q(agent).copy()
+    size = os.path.getsize(journal_path(path))
+    train(agent, 2, rng)
+    checkpointer.save(agent)
+
+    # Cut the last record short, as an interrupted write would
+    with open(journal_path(path), 'r+b') as f:
+        f.truncate(size + 10)
+    state = load_checkpoint(path)
+    np.testing.assert_array_equal(state['Q'], saved)
+    assert state['episode'] == 4
+
+    # A corrupt (rather than short) last record is dropped the same way
+    with open(journal_path(path), 'r+b') as f:
+        f.truncate(size)
+    train(agent, 2, rng)
+    checkpointer.save(agent)
+    with open(journal_path(path), 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+    np.testing.assert_array_equal(load_checkpoint(path)['Q'], saved)
+
+
+def test_background_matches_synchronous(tmp_path):
+    results = []
+    for background in (False, True):
+        path = str(tmp_path / f"learner-{background}.qckpt")
+        agent = make_agent()
+        checkpointer = Checkpointer(path, compact_every=4, background=background)
+        rng = np.random.default_rng(4)
+        for _ in range(10):
+            train(agent, 2, rng) # Keeps training while a background save may still be queued
+            checkpointer.save(agent)
+        checkpointer.close()
+        results.append(load_checkpoint(path, mmap=False))
+    np.testing.assert_array_equal(results[0]['Q'], results[1]['Q'])
+    assert results[0]['episode'] == results[1]['episode'] == 20
+
+
+@pytest.mark.parametrize('saved_dense', [False, True])
+@pytest.mark.parametrize('restored_dense', [False, True])
+def test_restore(tmp_path, saved_dense, restored_dense):
+    path = str(tmp_path / 'learner.qckpt')
+    agent = make_agent(saved_dense)
+    checkpointer = Checkpointer(path)
+    rng = np.random.default_rng(5)
+    for _ in range(3):
+        train(agent, 2, rng)
+        checkpointer.save(agent)
+    agent.epsilon = 0.05
+    agent.policy = agent.make_policy() # The policy captures epsilon
+    checkpointer.save(agent)
+
+    restored = make_agent(restored_dense)
+    Checkpointer(path).restore(restored)
+    np.testing.assert_array_equal(dense_Q(restored), dense_Q(agent))
+    assert restored.prev_episodes == 6
+    assert restored.epsilon == 0.05
+    for state in [(row, col) for row in range(3) for col in range(4)]:
+        np.testing.assert_allclose(restored.policy(state), agent.policy(state))
@@ -0,0 +1,61 @@
+import os
+import shutil
+
+import numpy as np
+
+from map_cache import GRIDS, load_map, map_hash
+from tile_map import PLUS_MAP, compile_map
+
+
+def entries(cache_dir):
+    return sorted(os.listdir(cache_dir))
+
+
+def test_miss_then_hit(tmp_path, capsys):
+    path = str(tmp_path / 'plus_map.yaml')
+    shutil.copy(PLUS_MAP, path)
+    cache_dir = str(tmp_path / 'cache')
+
+    first = load_map(path, cache_dir)
+    assert 'miss' in capsys.readouterr().out
+    assert entries(cache_dir) == [f"plus_map-{map_hash(path)}"]
+
+    second = load_map(path, cache_dir)
+    assert 'hit' in capsys.readouterr().out
+    assert isinstance(second.kind, np.memmap)
+    compiled = compile_map(path)
+    for tile_map in (first, second):
+        for grid in GRIDS:
+            np.testing.assert_array_equal(getattr(tile_map, grid), getattr(compiled, grid))
+        np.testing.assert_array_equal(tile_map.objects, compiled.objects)
+        assert tile_map.tile_size == compiled.tile_size
+        assert tile_map.start_tile == compiled.start_tile
+        assert tile_map.start_pose == compiled.start_pose
+        assert tile_map.terminal_tiles() == compiled.terminal_tiles()
+
+
+def test_changed_map_replaces_entry(tmp_path, capsys):
+    path = str(tmp_path / 'plus_map.yaml')
+    shutil.copy(PLUS_MAP, path)
+    cache_dir = str(tmp_path / 'cache')
+    load_map(path, cache_dir, verbose=False)
+    old_entry = entries(cache_dir)
+
+    with open(path) as f:
+        text = f.read()
+    assert 'tile_size: 0.585' in text
+    with open(path, 'w') as f:
+        f.write(text.replace('tile_size: 0.585', 'tile_size: 0.6'))
+
+    tile_map = load_map(path, cache_dir)
+    assert 'miss' in capsys.readouterr().out
+    assert tile_map.tile_size == 0.6
+    assert entries(cache_dir) == [f"plus_map-{map_hash(path)}"] != old_entry
+
+
+def test_other_maps_are_kept(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    for name in ('plus_map', 'plus_map_copy'):
+        shutil.copy(PLUS_MAP, str(tmp_path / f"{name}.yaml"))
+        load_map(str(tmp_path / f"{name}.yaml"), cache_dir, verbose=False)
+    assert len(entries(cache_dir)) == 2
@@ -0,0 +1,64 @@
+import random
+
+import numpy as np
+import pytest
+
+from Q_learning import DenseQAgent, QAgent, make_state_index, q_table_to_array
+
+STATES = [(row, col) for row in range(3) for col in range(4)]
+
+
+def make_agents(Q_values, epsilon=0.1, seed=0):
+    """A QAgent and a DenseQAgent with the same Q values and epsilon."""
+    agent = QAgent(epsilon=epsilon, rng=random.Random(seed), np_rng=np.random.default_rng(seed))
+    dense = DenseQAgent(epsilon=epsilon, rng=random.Random(seed), np_rng=np.random.default_rng(seed))
+    for state in STATES:
+        agent.Q[state][:] = Q_values[dense.encode(state)]
+    dense.Q[:] = Q_values
+    return agent, dense
+
+
+@pytest.mark.parametrize('epsilon', [0.0, 0.1, 0.5])
+def test_policies_match(epsilon):
+    Q_values = np.random.default_rng(1).integers(-1, 2, size=(12, 3)).astype(float) # Plenty of ties
+    agent, dense = make_agents(Q_values, epsilon)
+    for state in STATES:
+        expected = agent.policy(state)
+        np.testing.assert_allclose(dense.policy(state), expected)
+        np.testing.assert_allclose(dense.policy(dense.encode(state)), expected)
+
+
+@pytest.mark.parametrize('q_row', [[0.0, 0.0, 0.0], [0.0, 1.0, 0.0], [1.0, 1.0, -1.0]])
+def test_select_action_distributions_match(q_row):
+    n = 20000
+    Q_values = np.tile(q_row, (12, 1))
+    agent, dense = make_agents(Q_values, epsilon=0.3)
+    counts = {}
+    for name, learner in (('dict', agent), ('dense', dense)):
+        learner.state = (1, 0)
+        counts[name] = np.bincount([learner.select_action() for _ in range(n)], minlength=3) / n
+    expected = agent.policy((1, 0))
+    np.testing.assert_allclose(counts['dict'], expected, atol=0.015)
+    np.testing.assert_allclose(counts['dense'], expected, atol=0.015)
+
+
+def test_updates_match():
+    agent, dense = make_agents(np.zeros((12, 3)), seed=3)
+    rng = np.random.default_rng(4)
+    for _ in range(200):
+        start = agent.reset()
+        assert dense.reset() == start
+        for _ in range(3):
+            action = int(rng.integers(3))
+            tagid = int(rng.integers(-1, 4)) # Includes tagids that send the agent back to (0, 0)
+            assert dense.update(action, tagid) == agent.update(action, tagid)
+            assert dense.state == agent.state
+            assert dense.q_value(agent.state, action) == agent.q_value(agent.state, action)
+    np.testing.assert_array_equal(dense.Q, q_table_to_array(agent.Q, make_state_index(3, 4), 3))
+
+
+def test_tagid_transitions_match():
+    agent, dense = make_agents(np.zeros((12, 3)))
+    for state in STATES:
+        for tagid in (0, 1, 2, 3, 2000):
+            assert dense.tagid_to_state(tagid, state) == agent.tagid_to_state(tagid, state)
@@ -0,0 +1,98 @@
+import pytest
+
+from headless_env import HeadlessEnv
+from map_cache import load_map
+from tile_events import EVENTS, TileEvents
+from tile_map import NO_TAG, ROLE_JUNCTION, ROLE_NONE, ROLE_TERMINAL
+
+# Driving straight from the start pose of the plus map: through the junction,
+# over the terminal with tag 1 and off the road
+EXPECTED = [
+    ('on_enter_tile', (3, 5), NO_TAG, ROLE_NONE),
+    ('on_exit_tile', (3, 5), NO_TAG, ROLE_NONE),
+    ('on_enter_tile', (3, 4), NO_TAG, ROLE_NONE),
+    ('on_exit_tile', (3, 4), NO_TAG, ROLE_NONE),
+    ('on_enter_tile', (3, 3), 3, ROLE_JUNCTION),
+    ('on_junction', (3, 3), 3),
+    ('on_exit_tile', (3, 3), 3, ROLE_JUNCTION),
+    ('on_enter_tile', (3, 2), NO_TAG, ROLE_NONE),
+    ('on_exit_tile', (3, 2), NO_TAG, ROLE_NONE),
+    ('on_enter_tile', (3, 1), 1, ROLE_TERMINAL),
+    ('on_terminal', (3, 1), 1),
+    ('on_exit_tile', (3, 1), 1, ROLE_TERMINAL),
+    ('on_enter_tile', (3, 0), NO_TAG, ROLE_NONE),
+]
+
+
+class Recorder:
+    """Handler object with a method per event, appending (event, *args) to log."""
+    def __init__(self):
+        self.log = []
+        for name in EVENTS:
+            setattr(self, name, lambda *args, name=name: self.log.append((name,) + args))
+
+
+@pytest.fixture(scope='module')
+def tile_map():
+    return load_map(verbose=False)
+
+
+def drive(tile_map, events, seed=0):
+    """Drives straight until the episode ends, updating events every frame."""
+    env = HeadlessEnv(tile_map=tile_map, seed=seed)
+    env.reset()
+    done = False
+    while not done:
+        _, _, done, _ = env.step((0.5, 0.5))
+        x, _, z = env.cur_pos
+        events.update(x, z)
+
+
+def test_events_in_order(tile_map):
+    events = TileEvents(tile_map)
+    recorder = Recorder()
+    events.push_handlers(recorder)
+    drive(tile_map, events)
+    assert recorder.log == EXPECTED
+    assert events.stats()['transitions'] == 6
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_max_step_skipping_matches_every_frame(tile_map, seed):
+    logs = []
+    for max_step in (None, 1.2 / 30 * 0.5): # Wheel action 0.5 at 1.2 m/s, 30 fps
+        events = TileEvents(tile_map, max_step=max_step)
+        recorder = Recorder()
+        events.push_handlers(recorder)
+        drive(tile_map, events, seed)
+        logs.append((recorder.log, events.stats()))
+    (every_frame, every_stats), (skipping, skip_stats) = logs
+    assert skipping == every_frame
+    assert every_stats['skipped'] == 0
+    assert skip_stats['skipped'] > 0
+    assert skip_stats['checks'] + skip_stats['skipped'] == every_stats['checks']
+
+
+def test_reset_reenters_tile(tile_map):
+    events = TileEvents(tile_map)
+    recorder = Recorder()
+    events.push_handlers(recorder)
+    x, z = 1.5 * tile_map.tile_size, 3.5 * tile_map.tile_size # The terminal with tag 1
+    assert events.update(x, z)
+    assert not events.update(x, z)
+    events.reset()
+    assert events.update(x, z)
+    assert recorder.log == [('on_enter_tile', (3, 1), 1, ROLE_TERMINAL), ('on_terminal', (3, 1), 1)] * 2
+
+
+def test_handlers(tile_map):
+    events = TileEvents(tile_map)
+    recorder = Recorder()
+    junctions = []
+    events.push_handlers(recorder, on_junction=lambda tile, tag: junctions.append(tile))
+    events.remove_handlers(recorder)
+    drive(tile_map, events)
+    assert recorder.log == []
+    assert junctions == [(3, 3)]
+    with pytest.raises(ValueError):
+        events.push_handlers(on_tile=print)
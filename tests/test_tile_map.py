@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from tile_map import (NO_TAG, OBJECT_KINDS, OBJECT_OTHER, ROLE_JUNCTION, ROLE_NONE, ROLE_TERMINAL,
+                      TILE_KINDS, compile_map, compile_map_data)
+
+
+@pytest.fixture(scope='module')
+def plus_map():
+    return compile_map()
+
+
+def test_plus_map_roles(plus_map):
+    assert plus_map.shape == (7, 7)
+    assert plus_map.tiles_with_role(ROLE_JUNCTION) == [(3, 3)]
+    assert plus_map.tag[3, 3] == 3
+    assert plus_map.terminal_tiles() == {0: (5, 3), 1: (3, 1), 2: (1, 3)}
+    assert plus_map.tile_of_tag(1) == (3, 1)
+    assert plus_map.kind[3, 3] == TILE_KINDS.index('4way')
+    assert plus_map.drivable.sum() == 9 # The junction and its four two-tile arms
+
+
+def test_plus_map_start(plus_map):
+    assert plus_map.start_tile == [5, 3] # [col, row]
+    (x, _, z), angle = plus_map.start_pose
+    assert 0 <= x < plus_map.tile_size and 0 <= z < plus_map.tile_size
+
+
+def test_lookup_matches_lookup_one(plus_map):
+    rng = np.random.default_rng(0)
+    size = plus_map.tile_size
+    x = rng.uniform(-2 * size, 9 * size, 2000)
+    z = rng.uniform(-2 * size, 9 * size, 2000)
+    rows, cols, tags, roles = plus_map.lookup(x, z)
+    for i in range(len(x)):
+        assert plus_map.lookup_one(x[i], z[i]) == (rows[i], cols[i], tags[i], roles[i])
+    outside = (rows < 0) | (rows >= 7) | (cols < 0) | (cols >= 7)
+    assert outside.any()
+    assert (tags[outside] == NO_TAG).all() and (roles[outside] == ROLE_NONE).all()
+
+
+def test_lookup_one_roles(plus_map):
+    size = plus_map.tile_size
+    assert plus_map.lookup_one(3.5 * size, 3.5 * size) == (3, 3, 3, ROLE_JUNCTION)
+    assert plus_map.lookup_one(1.5 * size, 3.5 * size) == (3, 1, 1, ROLE_TERMINAL)
+    assert plus_map.lookup_one(-0.1, 3.5 * size) == (3, -1, NO_TAG, ROLE_NONE)
+
+
+def make_map_data(**overrides):
+    map_data = {
+        'tiles': [['straight/E', '4way'], ['grass', 'straight/N']],
+        'tile_size': 0.5,
+        'signal_tags': [{'tile': [0, 1], 'tag_id': 3, 'role': 'junction'},
+                        {'tile': [1, 1], 'tag_id': 0, 'role': 'terminal'}],
+    }
+    map_data.update(overrides)
+    return map_data
+
+
+def test_compile_map_data():
+    tile_map = compile_map_data(make_map_data())
+    assert tile_map.orientation.tolist() == [[1, -1], [-1, 0]]
+    assert tile_map.drivable.tolist() == [[True, True], [False, True]]
+    assert tile_map.terminal_tiles() == {0: (1, 1)}
+    assert tile_map.start_tile is None and tile_map.start_pose is None
+    assert len(tile_map.objects) == 0
+
+
+def test_unknown_object_kind_is_other():
+    objects = [{'kind': 'duckie', 'pos': [1.0, 2.0]},
+               {'kind': 'sign_left_T_intersect', 'pos': [0.5, 0.5], 'rotate': 90, 'height': None}]
+    tile_map = compile_map_data(make_map_data(objects=objects))
+    assert tile_map.objects['kind'].tolist() == [OBJECT_KINDS.index('duckie'), OBJECT_OTHER]
+    assert tile_map.objects['rotate'].tolist() == [0, 90]
+    assert tile_map.objects['height'].tolist() == [0, 0]
+
+
+def test_invalid_maps():
+    with pytest.raises(ValueError, match='row 1'):
+        compile_map_data(make_map_data(tiles=[['straight/E', '4way'], ['grass']]))
+    with pytest.raises(ValueError, match='tile kind'):
+        compile_map_data(make_map_data(tiles=[['road', '4way'], ['grass', 'grass']]))